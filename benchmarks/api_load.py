@@ -0,0 +1,214 @@
+"""
+Load-test the read-only HTTP API (python src/main.py serve) on a synthetic
+jobs table, with and without the response cache, while a writer keeps
+updating jobs the way a crawl does.
+
+Clients request the first pages of a handful of popular filters (the
+dashboard's hot queries, revalidated with If-None-Match), and walk deep
+into the listings with keyset cursors. Reported: requests/sec, latency
+percentiles, 304s, the cache hit rate, and the slowest write commit during
+the load, which shows whether readers held up the writer. Keyset paging is
+also compared with OFFSET paging at the same depth.
+
+    python -m benchmarks.api_load --rows 1000000 --duration 20
+"""
+from benchmarks.fts_search import build_descriptions
+from benchmarks.sqlite_queries import build_database
+from src.api import LISTED_COLUMNS, POSTED_KEY, after_cursor
+from src.models.job import Job
+from src.utils.database import create_readonly_engine, create_tuned_engine, migrate_db, normalize_salaries
+from sqlalchemy import select, text
+import aiohttp
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+HOT_QUERIES = [
+    '', 'visa_only=1', 'relocation_only=1', 'days=7', 'days=30&source=linkedin', 'source=jobinja',
+    'tech=python', 'min_salary=4000', 'min_salary=3000&days=30', 'search=react', 'search=kubernetes&visa_only=1',
+]
+DEEP_QUERIES = ['', 'source=jobvision', 'days=90', 'min_salary=2000']
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)] if values else 0
+
+
+async def wait_until_up(session, base, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f'{base}/health') as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError('The API did not start')
+
+
+async def client(session, base, deadline, deep_share, rng, results):
+    etags = {}
+    cursors = {}
+    while time.monotonic() < deadline:
+        deep = rng.random() < deep_share
+        if deep:
+            query = rng.choice(DEEP_QUERIES)
+            cursor = cursors.get(query)
+            url = f'{base}/jobs?{query}' + (f'&cursor={cursor}' if cursor else '')
+            headers = {}
+        else:
+            url = f'{base}/jobs?{rng.choice(HOT_QUERIES)}'
+            headers = {'If-None-Match': etags[url]} if url in etags else {}
+
+        start = time.perf_counter()
+        async with session.get(url, headers=headers) as response:
+            body = await response.read()
+            results['latencies'].append(time.perf_counter() - start)
+            results['statuses'][response.status] = results['statuses'].get(response.status, 0) + 1
+            if response.status != 200:
+                continue
+            if deep:
+                # Start over at the end of the listing
+                cursors[query] = json.loads(body)['next_cursor']
+            else:
+                etags[url] = response.headers['ETag']
+
+
+async def run_load(base, clients, duration, deep_share, seed):
+    results = {'latencies': [], 'statuses': {}}
+    connector = aiohttp.TCPConnector(limit=clients)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await wait_until_up(session, base)
+        deadline = time.monotonic() + duration
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            client(session, base, deadline, deep_share, random.Random(seed + i), results)
+            for i in range(clients)
+        ))
+        results['seconds'] = time.perf_counter() - start
+        async with session.get(f'{base}/health') as response:
+            results['health'] = await response.json()
+    return results
+
+
+def writer(path, stop, commits):
+    """Touch a batch of jobs every 50 ms, as the storage pipeline does, timing each commit"""
+    engine = create_tuned_engine(f'sqlite:///{path}')
+    rng = random.Random(1)
+    with engine.connect() as conn:
+        max_id = conn.execute(text('SELECT max(id) FROM jobs')).scalar()
+    while not stop.is_set():
+        ids = [rng.randint(1, max_id) for _ in range(100)]
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(
+                text('UPDATE jobs SET updated_at = CURRENT_TIMESTAMP, benefits = :benefits WHERE id = :id'),
+                [{'id': job_id, 'benefits': f'revision {rng.random()}'} for job_id in ids],
+            )
+        commits.append(time.perf_counter() - start)
+        time.sleep(0.05)
+    engine.dispose()
+
+
+def serve(path, port, cache_ttl, workers):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    return subprocess.Popen(
+        [sys.executable, '-m', 'src.main', 'serve', '--port', str(port), '--cache-ttl', str(cache_ttl),
+         '--workers', str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def compare_paging(path, depth, page_size=50):
+    """Seconds to fetch the page `depth` jobs deep with OFFSET and with a keyset cursor"""
+    engine = create_readonly_engine(f'sqlite:///{path}')
+    query = select(*LISTED_COLUMNS).order_by(Job.posted_date.desc(), Job.id.desc())
+    try:
+        with engine.connect() as conn:
+            start = time.perf_counter()
+            conn.execute(query.offset(depth).limit(page_size)).all()
+            offset = time.perf_counter() - start
+
+            cursor = tuple(conn.execute(
+                select(POSTED_KEY, Job.id).order_by(Job.posted_date.desc(), Job.id.desc()).offset(depth - 1).limit(1)
+            ).one())
+            start = time.perf_counter()
+            conn.execute(query.where(after_cursor(cursor)[0]).limit(page_size)).all()
+            keyset = time.perf_counter() - start
+    finally:
+        engine.dispose()
+    return offset, keyset
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP API load test')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--words', type=int, default=50, help='Words per synthetic description')
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent connections')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds per run')
+    parser.add_argument('--deep-share', type=float, default=0.2,
+                        help='Share of requests paging deep into a listing')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--path', default='/tmp/jobs_api_benchmark.db')
+    parser.add_argument('--keep', action='store_true', help='Keep (and reuse) the benchmark database')
+    args = parser.parse_args()
+
+    if not (args.keep and os.path.exists(args.path)):
+        start = time.perf_counter()
+        build_database(args.path, args.rows, 0, descriptions=build_descriptions(5000, args.words))
+        engine = create_tuned_engine(f'sqlite:///{args.path}')
+        migrate_db(engine)
+        normalize_salaries(engine)
+        engine.dispose()
+        print(f"Built and migrated {args.rows:,} rows in {time.perf_counter() - start:.0f}s\n")
+
+    depth = min(args.rows // 2, 500_000)
+    offset, keyset = compare_paging(args.path, depth)
+    print(f"Page {depth:,} jobs deep: OFFSET {offset * 1000:,.1f} ms, keyset cursor {keyset * 1000:,.1f} ms\n")
+
+    print(f"{'cache':>8} {'req/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'304s':>6} "
+          f"{'hit rate':>8} {'errors':>6} {'max write ms':>12}")
+    for cache_ttl in (0, 10):
+        server = serve(args.path, args.port, cache_ttl, args.workers)
+        stop = threading.Event()
+        commits = []
+        thread = threading.Thread(target=writer, args=(args.path, stop, commits))
+        thread.start()
+        try:
+            results = asyncio.run(run_load(
+                f'http://127.0.0.1:{args.port}', args.clients, args.duration, args.deep_share, 0
+            ))
+        finally:
+            stop.set()
+            thread.join()
+            server.terminate()
+            server.wait()
+
+        latencies = results['latencies']
+        statuses = results['statuses']
+        health = results['health']
+        lookups = health['cache_hits'] + health['cache_misses']
+        errors = sum(count for status, count in statuses.items() if status >= 400)
+        print(f"{f'{cache_ttl}s':>8} {len(latencies) / results['seconds']:>8,.0f} "
+              f"{percentile(latencies, 0.5) * 1000:>7.1f} {percentile(latencies, 0.95) * 1000:>7.1f} "
+              f"{percentile(latencies, 0.99) * 1000:>7.1f} {statuses.get(304, 0):>6,} "
+              f"{health['cache_hits'] / lookups if lookups else 0:>8.0%} {errors:>6} "
+              f"{max(commits) * 1000 if commits else 0:>12.1f}")
+
+    if not args.keep:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.path + suffix):
+                os.remove(args.path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Measure moving job descriptions out of the jobs table into compressed
+job_descriptions rows: database size, the display and stats queries (which
+never read descriptions but used to page through them), and the cost of
+loading one description.
+
+A synthetic jobs table is built the way older databases store it, with the
+display indexes already in place so only the description storage differs,
+then migrated with migrate_db().
+
+    python -m benchmarks.description_storage --rows 200000
+    python -m benchmarks.description_storage --pool jobs.db   # real descriptions
+"""
+from benchmarks.fts_search import build_descriptions
+from benchmarks.sqlite_queries import build_database
+from src.main import results_query, results_stats
+from src.models.job import Job, JobDescription
+from src.utils.compression import compress_text, decompress_text
+from src.utils.database import create_tuned_engine, migrate_db
+from sqlalchemy import inspect, select, text
+from sqlalchemy.orm import sessionmaker
+from argparse import Namespace
+import argparse
+import os
+import random
+import sqlite3
+import time
+
+LISTING = Namespace(visa_only=False, relocation_only=False, days=30, search=None)
+STATS = Namespace(visa_only=False, relocation_only=False, days=None, search=None)
+
+
+def load_pool(path):
+    """Descriptions stored in an existing jobs database, migrated or not"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    conn.create_function('decompress_text', 1, decompress_text)
+    try:
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+        sql = ('SELECT description FROM jobs' if 'description' in columns
+               else 'SELECT decompress_text(body) FROM job_descriptions')
+        return [row[0] for row in conn.execute(sql) if row[0]]
+    finally:
+        conn.close()
+
+
+def table_sizes(path):
+    """Bytes of pages used per table and index, and the file size"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        sizes = dict(conn.execute('SELECT name, sum(pgsize) FROM dbstat GROUP BY name').fetchall())
+    finally:
+        conn.close()
+    return sizes, os.path.getsize(path)
+
+
+def search_index_bytes(sizes):
+    return sum(size for name, size in sizes.items() if name.startswith('jobs_fts'))
+
+
+def best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def time_queries(engine, description_of, ids, repeat):
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        listing, count = best_of(repeat, lambda: len(results_query(db, LISTING).all()))
+        stats, _ = best_of(repeat, lambda: results_stats(db, STATS))
+        with engine.connect() as conn:
+            detail, _ = best_of(repeat, lambda: [description_of(conn, job_id) for job_id in ids])
+    finally:
+        db.close()
+    return {'listing': listing, 'listing_rows': count, 'stats': stats, 'detail': detail / len(ids)}
+
+
+def legacy_description(conn, job_id):
+    return conn.execute(text('SELECT description FROM jobs WHERE id = :id'), {'id': job_id}).scalar()
+
+
+def stored_description(conn, job_id):
+    return conn.execute(select(JobDescription.body).where(JobDescription.job_id == job_id)).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compressed description storage benchmark')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--words', type=int, default=300, help='Words per synthetic description')
+    parser.add_argument('--pool', help='Draw descriptions from this jobs database instead')
+    parser.add_argument('--details', type=int, default=1000, help='Descriptions loaded one by one')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--path', default='/tmp/jobs_descriptions_benchmark.db')
+    args = parser.parse_args()
+
+    pool = load_pool(args.pool) if args.pool else build_descriptions(5000, args.words)
+    raw = sum(len(d.encode('utf-8')) for d in pool)
+    stored = sum(len(compress_text(d)) for d in pool)
+    print(f"Description pool: {len(pool):,} texts, {raw / len(pool):,.0f} bytes on average, "
+          f"compressed {raw / stored:.1f}x")
+
+    start = time.perf_counter()
+    build_database(args.path, args.rows, 0, descriptions=pool)
+    engine = create_tuned_engine(f'sqlite:///{args.path}')
+    existing = {index['name'] for index in inspect(engine).get_indexes('jobs')}
+    for index in Job.__table__.indexes:
+        if index.name not in existing:
+            index.create(bind=engine)
+    print(f"Built {args.rows:,} rows in {time.perf_counter() - start:.1f}s\n")
+
+    ids = random.Random(0).sample(range(1, args.rows + 1), min(args.details, args.rows))
+    before_sizes, before_file = table_sizes(args.path)
+    before = time_queries(engine, legacy_description, ids, args.repeat)
+
+    start = time.perf_counter()
+    migrate_db(engine)
+    migrated = time.perf_counter() - start
+    after_sizes, after_file = table_sizes(args.path)
+    after = time_queries(engine, stored_description, ids, args.repeat)
+    engine.dispose()
+
+    print(f"Migrated in {migrated:.1f}s (including the search index and VACUUM)\n")
+    print(f"{'':>26}  {'before':>10}  {'after':>10}")
+    rows = [
+        ('jobs table', before_sizes.get('jobs', 0) / 1e6, after_sizes.get('jobs', 0) / 1e6, 'MB'),
+        ('descriptions', 0, after_sizes.get('job_descriptions', 0) / 1e6, 'MB'),
+        ('search index', 0, search_index_bytes(after_sizes) / 1e6, 'MB'),
+        ('file', before_file / 1e6, after_file / 1e6, 'MB'),
+        (f"listing ({before['listing_rows']:,} rows)", before['listing'] * 1000, after['listing'] * 1000, 'ms'),
+        ('stats over all jobs', before['stats'] * 1000, after['stats'] * 1000, 'ms'),
+        ('one description', before['detail'] * 1e6, after['detail'] * 1e6, 'us'),
+    ]
+    for label, old, new, unit in rows:
+        print(f"{label:>26}  {old:>7,.1f} {unit}  {new:>7,.1f} {unit}")
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.path + suffix):
+            os.remove(args.path + suffix)
+
+
+if __name__ == '__main__':
+    main()
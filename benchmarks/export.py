@@ -0,0 +1,143 @@
+"""
+Measure the export subcommand's streaming export against loading the whole
+table first, on synthetic jobs tables of growing size: peak memory (which
+should stay flat when streaming) and rows/sec. An incremental export after a
+small batch of updates is timed as well.
+
+Each export runs in its own process so its peak memory is its own (Linux only).
+
+    python -m benchmarks.export --rows 50000 200000 800000
+"""
+from benchmarks.sqlite_queries import build_database
+from src.utils.database import create_tuned_engine, migrate_db, normalize_salaries
+from sqlalchemy import text
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def loaded_export(output):
+    """The export as it would be written without streaming: every job loaded, then written"""
+    from src.main import job_to_json
+    from src.models.job import Job
+    from src.utils.database import SessionLocal
+
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        jobs = db.query(Job).all()
+        with open(output, 'w', encoding='utf-8') as f:
+            for job in jobs:
+                f.write(json.dumps(job_to_json(job), ensure_ascii=False))
+                f.write('\n')
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+    return {'rows': len(jobs), 'seconds': elapsed, 'rows_per_second': len(jobs) / elapsed}
+
+
+def peak_memory_mb():
+    """This process's peak RSS; unlike ru_maxrss, VmHWM isn't inherited from the benchmark process"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+
+
+def child(args):
+    """Runs in the subprocess: one export, reported as JSON on stdout"""
+    # Import the CLI in both modes so they start from the same baseline
+    import src.main  # noqa: F401
+    from src.export import export_jobs
+    from src.utils.database import SQLITE_PRAGMAS, engine
+
+    # Pages read through mmap count towards RSS though they're the OS's page
+    # cache, not the export's memory
+    SQLITE_PRAGMAS['mmap_size'] = 0
+
+    if args.child == 'loaded':
+        report = loaded_export(args.output)
+    else:
+        report = export_jobs(engine, args.output, fmt=args.format, watermark=args.watermark,
+                             chunk_size=args.chunk_size)
+    print(json.dumps({
+        'rows': report['rows'],
+        'rows_per_second': report['rows_per_second'],
+        'peak_memory_mb': peak_memory_mb(),
+    }))
+
+
+def run_child(path, mode, output, fmt='jsonl', watermark=None, chunk_size=1000):
+    command = [sys.executable, '-m', 'benchmarks.export', '--child', mode, '--output', output,
+               '--format', fmt, '--chunk-size', str(chunk_size)]
+    if watermark:
+        command += ['--watermark', watermark]
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    result = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming export benchmark')
+    parser.add_argument('--rows', type=int, nargs='+', default=[50_000, 200_000, 800_000])
+    parser.add_argument('--description-chars', type=int, default=1500)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], default='jsonl')
+    parser.add_argument('--updated', type=int, default=1000, help='Jobs touched before the incremental export')
+    parser.add_argument('--path', default='/tmp/jobs_export_benchmark.db')
+    parser.add_argument('--child', choices=['streamed', 'loaded'], help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    parser.add_argument('--watermark', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    output = f'{args.path}.export'
+    watermark = f'{args.path}.watermark'
+    print(f"{'rows':>9}  {'loaded MB':>9} {'rows/s':>9}  {'streamed MB':>11} {'rows/s':>9}  "
+          f"{'incremental rows':>16} {'seconds':>8}")
+    for rows in args.rows:
+        build_database(args.path, rows, args.description_chars)
+        engine = create_tuned_engine(f'sqlite:///{args.path}')
+        migrate_db(engine)
+        normalize_salaries(engine)
+        # The synthetic jobs were all last updated over a day ago
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE jobs SET updated_at = datetime(updated_at, '-1 day')"))
+
+        loaded = run_child(args.path, 'loaded', output)
+        if os.path.exists(watermark):
+            os.remove(watermark)
+        streamed = run_child(args.path, 'streamed', output, args.format, watermark, args.chunk_size)
+
+        # Touch a few jobs, and move the watermark back to just before them
+        with engine.begin() as conn:
+            conn.execute(text(
+                "UPDATE jobs SET updated_at = datetime('now', '-2 minutes') WHERE id IN "
+                "(SELECT id FROM jobs ORDER BY random() LIMIT :n)"
+            ), {'n': args.updated})
+            cutoff = conn.execute(text("SELECT datetime('now', '-3 minutes')")).scalar()
+        with open(watermark, encoding='utf-8') as f:
+            state = json.load(f)
+        state['updated_before'] = cutoff
+        with open(watermark, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        engine.dispose()
+        start = time.perf_counter()
+        incremental = run_child(args.path, 'streamed', output, args.format, watermark, args.chunk_size)
+        incremental_seconds = time.perf_counter() - start
+
+        print(f"{rows:>9,}  {loaded['peak_memory_mb']:>9,.0f} {loaded['rows_per_second']:>9,.0f}  "
+              f"{streamed['peak_memory_mb']:>11,.0f} {streamed['rows_per_second']:>9,.0f}  "
+              f"{incremental['rows']:>16,} {incremental_seconds:>8.2f}")
+
+    for path in (args.path, f'{args.path}-wal', f'{args.path}-shm', output, watermark):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Crawl one query set with 1, 2, 4 and 8 worker processes sharing a crawl
+frontier (FRONTIER_ENABLED), against a local job site with a fixed latency
+per page: pages/sec, pages fetched more than once (should be none), and
+pages never fetched (should be none).
+
+The site answers on several loopback addresses (127.0.0.1, 127.0.0.2, ...),
+which are separate domains to Scrapy and to the frontier's per-domain budget.
+Each worker fetches one page at a time per domain, so throughput should grow
+with the workers until FRONTIER_DOMAIN_DELAY, the politeness limit, caps it
+at domains / delay pages/sec. With --kill, one worker is killed mid-crawl and
+the others pick up its leases once they expire.
+
+    python -m benchmarks.frontier --workers 1 2 4 8
+"""
+from src.spiders.base_spider import BaseJobSpider
+from src.utils.queries import SearchQuery
+from scrapy import Request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import Counter
+from urllib.parse import parse_qs, urlparse
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+JOBS_PER_PAGE = 10
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """
+    /search?q=<keywords>&page=<n>: a listing page linking to JOBS_PER_PAGE
+    jobs and to the next page; /job/<id>: a job. Queries on one domain share
+    most of their jobs, as real searches do.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        site = self.server.site
+        host = self.headers.get('Host', '').split(':')[0]
+        url = urlparse(self.path)
+        with site['lock']:
+            site['hits'][(host, url.path, url.query)] += 1
+            site['times'].append(time.monotonic())
+        time.sleep(site['latency'])
+
+        if url.path == '/search':
+            params = parse_qs(url.query)
+            keywords, page = params['q'][0], int(params['page'][0])
+            rng = random.Random(f'{host}-{keywords}-{page}')
+            links = [f'<a class="job" href="/job/{rng.randrange(site["jobs"])}">job</a>' for _ in range(JOBS_PER_PAGE)]
+            if page + 1 < site['pages']:
+                links.append(f'<a class="next" href="/search?q={keywords}&page={page + 1}">next</a>')
+            body = ''.join(links)
+        else:
+            body = f'<h1>{url.path}</h1>'
+        body = f'<html><body>{body}</body></html>'.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        try:
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The worker killed with --kill
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BenchmarkSpider(BaseJobSpider):
+    """A job spider for the local site; queries' locations are its domains"""
+    name = 'frontier_benchmark'
+    port = None
+
+    def search_url(self, query):
+        return f'http://{query.location}:{self.port}/search?q={query.keywords}&page=0'
+
+    def parse(self, response):
+        for href in response.css('a.job::attr(href)').getall():
+            url = response.urljoin(href)
+            if self.should_follow_job(response, url):
+                yield Request(url, callback=self.parse_job)
+        next_page = response.css('a.next::attr(href)').get()
+        if next_page:
+            yield response.follow(next_page, callback=self.parse, meta={'search_query': response.meta['search_query']})
+
+    def parse_job(self, response):
+        yield {'url': response.url, 'title': response.css('h1::text').get()}
+
+
+def benchmark_queries(domains, queries):
+    return [SearchQuery(f'q{i}', f'127.0.0.{domain + 1}') for domain in range(domains) for i in range(queries)]
+
+
+def child(args):
+    """Runs in a worker subprocess: crawl the query set until the frontier is empty"""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    settings.update({
+        'FRONTIER_ENABLED': True,
+        'FRONTIER_PATH': args.frontier,
+        'FRONTIER_DOMAIN_DELAY': args.domain_delay,
+        'FRONTIER_LEASE_TIMEOUT': args.lease_timeout,
+        # Just the frontier: no cache, storage, telemetry or adaptive throttling
+        'HTTPCACHE_ENABLED': False,
+        'ITEM_PIPELINES': {},
+        'TELEMETRY_ENABLED': False,
+        'MEMORY_GUARD_ENABLED': False,
+        'SEEN_URLS_ENABLED': False,
+        'ADAPTIVE_THROTTLE_ENABLED': False,
+        'DOWNLOAD_DELAY': 0,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        'LOG_LEVEL': 'WARNING',
+    })
+    BenchmarkSpider.port = args.port
+    process = CrawlerProcess(settings)
+    process.crawl(BenchmarkSpider, queries=benchmark_queries(args.domains, args.queries))
+    process.start()
+
+
+def expected_pages(args):
+    """Every (host, path, query) a complete crawl fetches"""
+    pages = set()
+    for query in benchmark_queries(args.domains, args.queries):
+        for page in range(args.pages):
+            pages.add((query.location, '/search', f'q={query.keywords}&page={page}'))
+            rng = random.Random(f'{query.location}-{query.keywords}-{page}')
+            pages.update((query.location, f'/job/{rng.randrange(args.jobs)}', '') for _ in range(JOBS_PER_PAGE))
+    return pages
+
+
+def run(args, workers, kill=False):
+    """Crawl with workers processes; returns the site's hits and the seconds from first to last"""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.path + suffix):
+            os.remove(args.path + suffix)
+    site = {'hits': Counter(), 'times': [], 'lock': threading.Lock(), 'latency': args.latency,
+            'pages': args.pages, 'jobs': args.jobs}
+    server = ThreadingHTTPServer(('', 0), SiteHandler)
+    server.daemon_threads = True
+    server.site = site
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    command = [sys.executable, '-m', 'benchmarks.frontier', '--child', '--port', str(server.server_address[1]),
+               '--frontier', args.path, '--domains', str(args.domains), '--queries', str(args.queries),
+               '--domain-delay', str(args.domain_delay), '--lease-timeout', str(args.lease_timeout)]
+    processes = [subprocess.Popen(command, stderr=subprocess.DEVNULL) for _ in range(workers)]
+    if kill:
+        # Kill a worker, leases and all, once the crawl is under way
+        while sum(site['hits'].values()) < 50 and processes[0].poll() is None:
+            time.sleep(0.05)
+        processes[0].send_signal(signal.SIGKILL)
+    for process in processes:
+        process.wait()
+    server.shutdown()
+    server.server_close()
+    return site['hits'], site['times'][-1] - site['times'][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared crawl frontier benchmark')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--domains', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=5, help='Queries per domain')
+    parser.add_argument('--pages', type=int, default=4, help='Listing pages per query')
+    parser.add_argument('--jobs', type=int, default=150, help='Distinct jobs per domain')
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds the site takes per page')
+    parser.add_argument('--domain-delay', type=float, default=0.05,
+                        help='FRONTIER_DOMAIN_DELAY: seconds between requests to a domain, across workers')
+    parser.add_argument('--lease-timeout', type=float, default=5, help='FRONTIER_LEASE_TIMEOUT')
+    parser.add_argument('--kill', action='store_true', help='Also run with a worker killed mid-crawl')
+    parser.add_argument('--path', default='/tmp/jobs_frontier_benchmark.sqlite')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--frontier', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    expected = expected_pages(args)
+    limit = args.domains / args.domain_delay
+    print(f"{len(expected):,} pages on {args.domains} domains, {args.latency * 1000:.0f} ms each; "
+          f"politeness limit {limit:,.0f} pages/s\n")
+    print(f"{'workers':>8} {'pages/s':>8} {'speedup':>8} {'fetched':>8} {'duplicates':>10} {'missing':>8}")
+    runs = [(workers, False) for workers in args.workers]
+    if args.kill:
+        runs.append((max(max(args.workers), 2), True))
+    baseline = None
+    for workers, kill in runs:
+        hits, seconds = run(args, workers, kill)
+        rate = sum(hits.values()) / seconds
+        baseline = baseline or rate
+        label = f'{workers}{" -1" if kill else ""}'
+        print(f"{label:>8} {rate:>8,.1f} {rate / baseline:>7.1f}x {len(hits):>8,} "
+              f"{sum(count - 1 for count in hits.values()):>10,} {len(expected - set(hits)):>8,}")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.path + suffix):
+            os.remove(args.path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Time --search style keyword queries with the FTS5 index against the LIKE
+'%...%' scans they replace, on synthetic jobs tables of increasing size.
+
+    python -m benchmarks.fts_search --rows 100000 1000000
+"""
+from benchmarks.sqlite_queries import build_database
+from src.utils.database import create_tuned_engine, migrate_db
+from src.utils.search import normalize_query
+from sqlalchemy import text
+import argparse
+import os
+import random
+import time
+
+COMMON = (
+    'we are looking for an experienced engineer to join our team and work on product '
+    'features with strong ownership good communication skills and attention to detail '
+    'ما به دنبال همکار متخصص با روحیه کار تیمی و مسئولیت پذیری برای توسعه محصول هستیم '
+).split()
+RARE = (
+    'react vue angular django flask laravel spring kubernetes docker terraform kafka '
+    'postgresql mongodb redis graphql typescript golang rust remote hybrid visa relocation '
+    'ری‌اکت جنگو لاراول دورکاری پایتون جاوااسکریپت داکر لینوکس'
+).split()
+
+# (label, FTS5 query, equivalent LIKE conditions on description)
+QUERIES = [
+    ('single term', 'kubernetes', ['kubernetes']),
+    ('react AND remote', 'react AND remote', ['react', 'remote']),
+    ('phrase', '"spring kafka"', ['spring kafka']),
+    ('persian', 'جنگو AND دورکاری', ['جنگو', 'دورکاری']),
+]
+
+
+def build_descriptions(count, words, seed=0):
+    """Mostly common filler with a few technology terms, so matches are selective"""
+    rng = random.Random(seed)
+    descriptions = []
+    for _ in range(count):
+        text_words = [rng.choice(COMMON) for _ in range(words)]
+        for _ in range(rng.randint(1, 4)):
+            text_words.insert(rng.randrange(len(text_words)), rng.choice(RARE))
+        descriptions.append(' '.join(text_words))
+    return descriptions
+
+
+def best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark(rows, args):
+    build_database(args.path, rows, 0, descriptions=build_descriptions(5000, args.words))
+    engine = create_tuned_engine(f'sqlite:///{args.path}')
+
+    # A LIKE scan can't rank, so it has to visit every row to count or order
+    # matches; time it on the descriptions as they were stored before migrating
+    like_times = {}
+    with engine.connect() as conn:
+        for label, _, terms in QUERIES:
+            like = ' AND '.join(f"description LIKE '%{term}%'" for term in terms)
+            like_times[label], _ = best_of(args.repeat, lambda: conn.execute(text(
+                f'SELECT count(*) FROM jobs WHERE {like}'
+            )).scalar())
+
+    start = time.perf_counter()
+    migrate_db(engine)
+    print(f"{rows:,} rows: indexes and FTS built in {time.perf_counter() - start:.1f}s, "
+          f"database {os.path.getsize(args.path) / 1e6:,.0f} MB")
+
+    print(f"{'query':>18}  {'matches':>8}  {'LIKE count':>10}  {'FTS top 20':>10}  {'FTS count':>10}")
+    with engine.connect() as conn:
+        for label, match, terms in QUERIES:
+            top_time, _ = best_of(args.repeat, lambda: conn.execute(text(
+                "SELECT jobs.id, jobs.title, snippet(jobs_fts, -1, '[', ']', '...', 16) "
+                'FROM jobs_fts JOIN jobs ON jobs.id = jobs_fts.rowid '
+                'WHERE jobs_fts MATCH :q ORDER BY bm25(jobs_fts, 10.0, 5.0, 1.0) LIMIT 20'
+            ), {'q': normalize_query(match)}).all())
+            count_time, count = best_of(args.repeat, lambda: conn.execute(text(
+                'SELECT count(*) FROM jobs_fts WHERE jobs_fts MATCH :q'
+            ), {'q': normalize_query(match)}).scalar())
+            print(f"{label:>18}  {count:>8,}  {like_times[label] * 1000:>8.1f}ms  "
+                  f"{top_time * 1000:>8.1f}ms  {count_time * 1000:>8.1f}ms")
+    engine.dispose()
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Full-text search benchmark')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--words', type=int, default=150, help='Words per synthetic description')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--path', default='/tmp/jobs_fts_benchmark.db')
+    args = parser.parse_args()
+
+    try:
+        for rows in args.rows:
+            benchmark(rows, args)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.path + suffix):
+                os.remove(args.path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Time JobinjaSpider's callbacks with the precompiled selectors against the
+per-call CSS queries they replaced (one :contains() document scan per meta
+field, six description selectors), on the saved pages in benchmarks/fixtures.
+
+    python -m benchmarks.jobinja_selectors --iterations 50
+"""
+import os
+
+# The callbacks never touch the database; keep the engine off jobs.db
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from benchmarks.parsers import load_fixtures, make_response, make_spider
+from src.spiders.jobinja import JobinjaSpider
+from src.utils.tech_stack import detect_tech_stack
+from scrapy.utils.reactor import install_reactor
+from datetime import datetime
+import argparse
+import logging
+import time
+
+
+class LegacyJobinjaSpider(JobinjaSpider):
+    """The callbacks as they were before the selector layer"""
+
+    current_page = 1
+
+    def parse(self, response):
+        self.logger.debug(f"Parsing page: {response.url}")
+        self.logger.debug(f"Response status: {response.status}")
+
+        # Extract job listings
+        job_items = response.css('div.o-listView__itemWrap.c-jobListView__itemWrap')
+        self.logger.debug(f"Found {len(job_items)} job listings")
+
+        if not job_items:
+            self.logger.error("No jobs found with any selector")
+            self.logger.debug("Page content preview:")
+            self.logger.debug(response.css('body').get()[:1000])
+            return
+
+        # One reference time per page so relative dates agree with each other
+        now = datetime.now()
+
+        for job_item in job_items:
+            try:
+                # Get the job info container
+                info_container = job_item.css('div.o-listView__itemInfo')
+                
+                # Extract basic job information with error checking
+                title_element = info_container.css('h2.o-listView__itemTitle a.c-jobListView__titleLink')
+                if not title_element:
+                    continue
+                    
+                title = title_element.css('::text').get('').strip()
+                url = title_element.css('::attr(href)').get('')
+
+                if not (title and url):
+                    continue
+
+                # Extract company name
+                company = info_container.css('span:contains("‌")::text, .c-jobListView__metaItem span::text').get('').strip()
+                
+                # Extract location
+                location = info_container.css('.c-jobListView__metaItem span::text').getall()
+                location = next((loc.strip() for loc in location if 'تهران' in loc or 'مشهد' in loc), 'تهران')
+                
+                # Extract posted date
+                date_span = info_container.css('span.c-jobListView__passedDays::text').get()
+                posted_date = self.parse_posted_date(date_span, now)
+
+                job_data = {
+                    'title': title,
+                    'company': company,
+                    'location': location,
+                    'url': response.urljoin(url),
+                    'source': self.source,
+                    'posted_date': posted_date
+                }
+
+                self.logger.info(f"Successfully parsed job: {job_data['title']} at {job_data['company']}")
+
+                if self.is_known_job(job_data['url']):
+                    self.logger.debug(f"Skipping known job: {job_data['url']}")
+                    continue
+                
+                yield response.follow(
+                    url=job_data['url'],
+                    callback=self.parse_job_details,
+                    cb_kwargs={'job_data': job_data},
+                    errback=self.handle_error
+                )
+
+            except Exception as e:
+                self.logger.error(f"Error parsing job listing: {str(e)}")
+                self.logger.debug(f"Problem job HTML: {job_item.get()}")
+                continue
+
+        # Handle pagination
+        next_page_url = response.css('a.c-pagination__next::attr(href), a[rel="next"]::attr(href)').get()
+        
+        if next_page_url and self.current_page < self.max_pages:
+            self.current_page += 1
+            self.logger.debug(f"Following next page: {next_page_url} (Page {self.current_page} of {self.max_pages})")
+            yield response.follow(
+                url=next_page_url,
+                callback=self.parse,
+                errback=self.handle_error
+            )
+        else:
+            self.logger.info(f"Reached maximum page limit ({self.max_pages})")
+
+    def parse_job_details(self, response, job_data):
+        try:
+            self.logger.debug(f"Parsing job details from {response.url}")
+
+            # Extract job description
+            description_texts = []
+            description_selectors = [
+                'div.o-box__text::text',
+                'div.o-box__text p::text',
+                'div.s-jobDesc::text',
+                'div.s-jobDesc p::text',
+                '.c-jobView__description *::text',
+                '.o-box.c-jobView__section *::text'
+            ]
+            
+            for selector in description_selectors:
+                texts = response.css(selector).getall()
+                if texts:
+                    description_texts.extend(texts)
+            
+            description = ' '.join(text.strip() for text in description_texts if text.strip())
+            
+            if not description:
+                self.logger.warning(f"No description found for job at {response.url}")
+                description = "توضیحات در دسترس نیست"
+
+            # Extract additional metadata
+            metadata = {
+                'employment_type': response.css('div.c-jobView__metaItem:contains("نوع همکاری") span::text').get('').strip(),
+                'experience': response.css('div.c-jobView__metaItem:contains("سابقه") span::text').get('').strip(),
+                'education': response.css('div.c-jobView__metaItem:contains("تحصیلات") span::text').get('').strip(),
+                'category': response.css('div.c-jobView__metaItem:contains("دسته‌بندی") a::text').get('').strip(),
+                'salary': self.extract_salary_range(response),
+                'tech_stack': detect_tech_stack(description)
+            }
+
+            # Update job data with new information
+            job_data.update({
+                'description': description,
+                'metadata': metadata
+            })
+
+        except Exception as e:
+            self.logger.error(f"Error parsing job details: {str(e)}")
+
+        yield job_data
+
+    def extract_salary_range(self, response):
+        """Extract salary information if available"""
+        salary_selectors = [
+            'div.c-jobView__metaItem:contains("حقوق") span::text',
+            'div:contains("حقوق") span.black::text',
+            '.c-jobView__metaItem--salaryType span::text'
+        ]
+        
+        for selector in salary_selectors:
+            salary = response.css(selector).get()
+            if salary:
+                return salary.strip()
+        return None
+
+
+def run(callback, response, kind):
+    # Each pass should follow the page's jobs again rather than skip them as already requested
+    callback.__self__.query_matches.clear()
+    if kind == 'listing':
+        return list(callback(response))
+    return list(callback(response, job_data={'title': 'Senior Developer', 'url': response.url}))
+
+
+def best_per_page(callback, pages, kind, iterations, repeat, fresh):
+    """Best ms per page; fresh=False reuses parsed responses to time extraction alone"""
+    responses = [make_response(url, body) for url, body in pages]
+    for response in responses:
+        response.selector
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for (url, body), response in zip(pages, responses):
+                run(callback, make_response(url, body) if fresh else response, kind)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / (iterations * len(pages)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Jobinja selector benchmark')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    install_reactor('twisted.internet.asyncioreactor.AsyncioSelectorReactor')
+    logging.disable(logging.INFO)
+    pages = load_fixtures()['jobinja']
+    legacy = make_spider(LegacyJobinjaSpider)
+    current = make_spider(JobinjaSpider)
+
+    print(f"{'callback':<18} {'timing':<12} {'legacy ms':>10} {'compiled ms':>12} {'speedup':>8}")
+    for kind, name in (('listing', 'parse'), ('detail', 'parse_job_details')):
+        for fresh, label in ((False, 'extraction'), (True, 'with lxml')):
+            before = best_per_page(getattr(legacy, name), pages[kind], kind, args.iterations, args.repeat, fresh)
+            after = best_per_page(getattr(current, name), pages[kind], kind, args.iterations, args.repeat, fresh)
+            print(f"{name:<18} {label:<12} {before:>10.2f} {after:>12.2f} {before / after:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Compare JobvisionSpider's JSON API mode with its HTML pages.
+
+Offline, both modes parse the saved pages in benchmarks/fixtures/jobvision
+and the saved API responses in benchmarks/fixtures/jobvision-api (the same
+jobs), checking that they produce the same job fields and reporting bytes and
+CPU time per job. With --crawl, a local stand-in server serves the same
+fixtures and real crawls are run in HTML mode, API mode, and API mode with
+the API failing, for every request or only for job details (each failed
+request falls back to HTML); the fallback crawls must yield the same jobs as
+the HTML crawl.
+
+    python -m benchmarks.jobvision_api
+    python -m benchmarks.jobvision_api --crawl
+"""
+import os
+
+# Nothing here touches the database (--crawl runs without the storage pipeline);
+# keep the engine off jobs.db
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from benchmarks.parsers import load_fixtures, make_response, make_spider
+from src.spiders.jobvision import JobvisionSpider
+from scrapy.http import Request, TextResponse
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.reactor import install_reactor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import logging
+import threading
+import time
+
+# Fields both modes must agree on; the URL and the posted date (absolute in
+# the API, relative on the pages) are expected to differ
+COMPARED_FIELDS = (
+    'title', 'company', 'location', 'description', 'min_salary', 'max_salary', 'currency',
+    'salary_period', 'tech_stack', 'work_type', 'company_size', 'industry',
+)
+
+
+def make_json_response(url, body):
+    return TextResponse(url=url, body=body, encoding='utf-8', request=Request(url))
+
+
+def run_mode(spider, mode, fixtures):
+    """Parse the listing and every detail page once; returns (jobs from the details, detail requests)"""
+    spider.query_matches.clear()
+    listing_url, listing_body = fixtures['listing'][0]
+    if mode == 'api':
+        response = make_json_response(listing_url, listing_body)
+        response.meta.update({'search_query': spider.queries[0], 'page': 1})
+        requests = [r for r in spider.parse_api(response) if r.callback == spider.parse_api_details]
+    else:
+        requests = [r for r in spider.parse(make_response(listing_url, listing_body))
+                    if r.callback == spider.parse_job_details]
+
+    jobs = []
+    for url, body in fixtures['detail']:
+        job_data = dict(requests[len(jobs)].cb_kwargs['job_data'])
+        if mode == 'api':
+            jobs.extend(spider.parse_api_details(make_json_response(url, body), job_data=job_data))
+        else:
+            jobs.extend(spider.parse_job_details(make_response(url, body), job_data=job_data))
+    return jobs, requests
+
+
+def time_mode(spider, mode, fixtures, iterations):
+    """Bytes and CPU ms per job: the listing's share per job plus one detail page"""
+    _, requests = run_mode(spider, mode, fixtures)
+    start = time.process_time()
+    for _ in range(iterations):
+        run_mode(spider, mode, fixtures)
+    elapsed = (time.process_time() - start) / iterations
+
+    listing_bytes = len(fixtures['listing'][0][1])
+    details = fixtures['detail']
+    return {
+        'bytes_per_job': listing_bytes / len(requests) + sum(len(body) for _, body in details) / len(details),
+        # One run parses the listing and each detail page once
+        'cpu_ms_per_job': elapsed * 1000 / len(details),
+    }
+
+
+def compare_jobs(html_jobs, api_jobs):
+    differences = []
+    for html_job, api_job in zip(html_jobs, api_jobs):
+        for field in COMPARED_FIELDS:
+            if html_job.get(field) != api_job.get(field):
+                differences.append(f"{html_job['title']}: {field} {html_job.get(field)!r} != {api_job.get(field)!r}")
+    return differences
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves the fixtures for the site's pages and API endpoints"""
+
+    fixtures = None
+    # None, 'details' (the search endpoint still works) or 'all'
+    fail_api = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        query = json.loads(self.rfile.read(length) or b'{}')
+        if self.fail_api == 'all' or not self.path.endswith(JobvisionSpider.API_SEARCH):
+            return self.send_body(b'{"message": "unavailable"}', 'application/json', 503)
+
+        listing = json.loads(self.fixtures['jobvision-api']['listing'][0][1])
+        posts = listing['data']['jobPosts']
+        listing['data']['jobPostCount'] = len(posts)
+        # Only the first page has results
+        if query.get('requestedPage', 1) > 1:
+            listing['data']['jobPosts'] = []
+        self.send_body(json.dumps(listing, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith(JobvisionSpider.API_DETAIL):
+            if self.fail_api:
+                return self.send_body(b'{"message": "unavailable"}', 'application/json', 503)
+            job_id = int(parse_qs(url.query)['jobPostId'][0])
+            body = self.fixtures['jobvision-api']['detail'][job_id % 2][1]
+            return self.send_body(body, 'application/json')
+        if url.path.startswith('/jobs/'):
+            job_id = int(url.path.split('/')[2])
+            return self.send_body(self.fixtures['jobvision']['detail'][job_id % 2][1], 'text/html')
+        if url.path == '/jobs':
+            return self.send_body(self.fixtures['jobvision']['listing'][0][1], 'text/html')
+        self.send_body(b'not found', 'text/plain', 404)
+
+
+def run_crawls(fixtures, fail_api_modes):
+    """Run the modes one after another on one reactor; returns stats per mode"""
+    from scrapy import signals
+    from scrapy.crawler import CrawlerRunner
+    from twisted.internet import defer, reactor
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    StandInHandler.fixtures = fixtures
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    class StandInSpider(JobvisionSpider):
+        allowed_domains = ['127.0.0.1']
+        site_url = base
+        api_url = f'{base}/api/v1'
+
+    settings = get_project_settings()
+    settings.update({
+        'ITEM_PIPELINES': {},
+        'HTTPCACHE_ENABLED': False,
+        'TELEMETRY_ENABLED': False,
+        'SEEN_URLS_ENABLED': False,
+        'JOB_DEDUP_ENABLED': False,
+        'DOWNLOAD_DELAY': 0,
+        'ADAPTIVE_THROTTLE_ENABLED': False,
+        'RETRY_ENABLED': False,
+        'LOG_LEVEL': 'WARNING',
+    }, priority='cmdline')
+    runner = CrawlerRunner(settings)
+    results = {}
+
+    @defer.inlineCallbacks
+    def crawl_all():
+        for label, api, fail_api in fail_api_modes:
+            StandInHandler.fail_api = fail_api
+            crawler = runner.create_crawler(StandInSpider)
+            items = []
+            crawler.signals.connect(lambda item, **kwargs: items.append(dict(item)), signal=signals.item_scraped,
+                                    weak=False)
+            start = time.process_time()
+            yield runner.crawl(crawler, keywords='python', location='tehran', api=api)
+            stats = crawler.stats.get_stats()
+            results[label] = {
+                'jobs': len(items),
+                'requests': stats.get('downloader/request_count', 0),
+                'bytes_per_job': stats.get('downloader/response_bytes', 0) / max(len(items), 1),
+                'cpu_ms_per_job': (time.process_time() - start) * 1000 / max(len(items), 1),
+                'fallbacks': stats.get('jobvision/api_fallbacks', 0),
+                'items': sorted(items, key=lambda item: item['url']),
+            }
+        reactor.stop()
+
+    reactor.callWhenRunning(crawl_all)
+    reactor.run()
+    server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Jobvision JSON API vs HTML benchmark')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--crawl', action='store_true',
+                        help='Also crawl a local stand-in server in each mode')
+    args = parser.parse_args()
+
+    install_reactor('twisted.internet.asyncioreactor.AsyncioSelectorReactor')
+    logging.disable(logging.WARNING)
+    fixtures = load_fixtures()
+    spider = make_spider(JobvisionSpider)
+
+    html_jobs, _ = run_mode(spider, 'html', fixtures['jobvision'])
+    api_jobs, _ = run_mode(spider, 'api', fixtures['jobvision-api'])
+    differences = compare_jobs(html_jobs, api_jobs)
+    print(f"Compared {len(api_jobs)} jobs field by field: "
+          + ('identical' if not differences else f"{len(differences)} differences"))
+    for difference in differences:
+        print(f"  {difference}")
+
+    html = time_mode(spider, 'html', fixtures['jobvision'], args.iterations)
+    api = time_mode(spider, 'api', fixtures['jobvision-api'], args.iterations)
+    print(f"\n{'offline':<10} {'bytes/job':>10} {'cpu ms/job':>11}")
+    for label, row in (('html', html), ('api', api)):
+        print(f"{label:<10} {row['bytes_per_job']:>10,.0f} {row['cpu_ms_per_job']:>11.2f}")
+    print(f"{'ratio':<10} {html['bytes_per_job'] / api['bytes_per_job']:>9.1f}x "
+          f"{html['cpu_ms_per_job'] / api['cpu_ms_per_job']:>10.1f}x")
+
+    if args.crawl:
+        logging.disable(logging.NOTSET)
+        results = run_crawls(fixtures, [
+            ('html', False, None),
+            ('api', True, None),
+            ('api down', True, 'all'),
+            ('no detail', True, 'details'),
+        ])
+        print(f"\n{'crawl':<10} {'jobs':>5} {'requests':>9} {'bytes/job':>10} {'cpu ms/job':>11} {'fallbacks':>10}")
+        for label, row in results.items():
+            print(f"{label:<10} {row['jobs']:>5} {row['requests']:>9} {row['bytes_per_job']:>10,.0f} "
+                  f"{row['cpu_ms_per_job']:>11.2f} {row['fallbacks']:>10}")
+
+        # With the API down, jobs come through the HTML fallback, which must
+        # yield what an HTML-only crawl does. Job URLs from the API's search
+        # have no slug, so only the crawl that fell back for the search too
+        # must match the URLs.
+        html_items = results['html']['items']
+        failed = False
+        for label in ('api down', 'no detail'):
+            fallback_items = results[label]['items']
+            differences = compare_jobs(html_items, fallback_items)
+            if label == 'api down':
+                differences += [f"{html_item['url']} != {fallback_item['url']}"
+                                for html_item, fallback_item in zip(html_items, fallback_items)
+                                if html_item['url'] != fallback_item['url']]
+            print(f"\n{label} vs html: {len(fallback_items)} vs {len(html_items)} jobs, "
+                  + ('identical' if not differences else f"{len(differences)} differences"))
+            for difference in differences:
+                print(f"  {difference}")
+            failed = failed or bool(differences) or len(html_items) != len(fallback_items) or not html_items
+        if failed:
+            raise SystemExit('The HTML fallback yielded different jobs')
+
+
+if __name__ == '__main__':
+    main()
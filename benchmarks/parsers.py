@@ -0,0 +1,277 @@
+"""
+Time each spider's parse and parse_job_details offline on the saved pages in
+benchmarks/fixtures, and the individual Jobinja selectors they are built from.
+
+The Jobinja pages were recorded from the site. The LinkedIn and Jobvision pages
+are rebuilt from the markup the spiders select on, as no recorded copies exist.
+Every call gets a fresh HtmlResponse, so the lxml parse is part of the time
+like it is in a crawl. Allocations are measured in a separate tracemalloc pass.
+tracemalloc only sees Python objects, so the lxml tree itself is not included.
+Results are written as JSON so runs can be compared:
+
+    python -m benchmarks.parsers --output before.json
+    python -m benchmarks.parsers --compare before.json
+"""
+import os
+
+# The parsers never touch the database, but importing the spiders builds the
+# engine; keep it off jobs.db
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from src.spiders.jobinja import JobinjaSpider
+from src.spiders.jobvision import JobvisionSpider
+from src.spiders.linkedin import LinkedinSpider
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.reactor import install_reactor
+from scrapy.utils.test import get_crawler
+from datetime import datetime
+import argparse
+import gc
+import gzip
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+SPIDERS = {
+    'linkedin': LinkedinSpider,
+    'jobinja': JobinjaSpider,
+    'jobvision': JobvisionSpider,
+}
+
+# The selectors JobinjaSpider runs on every detail page
+JOBINJA_DETAIL_SELECTORS = [
+    ('description', 'div.o-box__text::text'),
+    ('description', 'div.o-box__text p::text'),
+    ('description', 'div.s-jobDesc::text'),
+    ('description', 'div.s-jobDesc p::text'),
+    ('description', '.c-jobView__description *::text'),
+    ('description', '.o-box.c-jobView__section *::text'),
+    ('metadata', 'div.c-jobView__metaItem:contains("نوع همکاری") span::text'),
+    ('metadata', 'div.c-jobView__metaItem:contains("سابقه") span::text'),
+    ('metadata', 'div.c-jobView__metaItem:contains("تحصیلات") span::text'),
+    ('metadata', 'div.c-jobView__metaItem:contains("دسته‌بندی") a::text'),
+    ('salary', 'div.c-jobView__metaItem:contains("حقوق") span::text'),
+    ('salary', 'div:contains("حقوق") span.black::text'),
+    ('salary', '.c-jobView__metaItem--salaryType span::text'),
+]
+# And once per job card on listing pages
+JOBINJA_LISTING_SELECTORS = [
+    ('company', 'span:contains("‌")::text, .c-jobListView__metaItem span::text'),
+]
+
+
+def load_fixtures():
+    """Return {spider: {'listing': [(url, body)], 'detail': [(url, body)]}}"""
+    with open(os.path.join(FIXTURES_DIR, 'index.json'), encoding='utf-8') as f:
+        index = json.load(f)
+
+    fixtures = {}
+    for spider, pages in index.items():
+        fixtures[spider] = {'listing': [], 'detail': []}
+        for filename, url in pages.items():
+            with gzip.open(os.path.join(FIXTURES_DIR, spider, filename)) as f:
+                body = f.read()
+            kind = 'listing' if filename.startswith('listing') else 'detail'
+            fixtures[spider][kind].append((url, body))
+    return fixtures
+
+
+def make_spider(spidercls):
+    settings = get_project_settings().copy_to_dict()
+    settings['SEEN_URLS_ENABLED'] = False
+    crawler = get_crawler(spidercls, settings)
+    spider = spidercls.from_crawler(crawler)
+    crawler.spider = spider
+    return spider
+
+
+def make_response(url, body):
+    return HtmlResponse(url=url, body=body, encoding='utf-8', request=Request(url))
+
+
+def run_callback(spider, kind, url, body):
+    """Parse one page and return the number of jobs it produced"""
+    response = make_response(url, body)
+    # Every pass should follow the page's jobs again rather than skip them as already requested
+    spider.query_matches.clear()
+    if kind == 'listing':
+        results = spider.parse(response)
+    else:
+        job_data = {'title': 'Senior Developer', 'url': url, 'source': spider.source}
+        results = spider.parse_job_details(response, job_data=job_data)
+
+    jobs = 0
+    for result in results:
+        if isinstance(result, Request):
+            jobs += result.callback == spider.parse_job_details
+        else:
+            jobs += 1
+    return jobs
+
+
+def time_pages(spider, kind, pages, iterations, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        jobs = 0
+        for _ in range(iterations):
+            for url, body in pages:
+                jobs += run_callback(spider, kind, url, body)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # The share of that spent building the lxml tree
+    html_start = time.perf_counter()
+    for _ in range(iterations):
+        for url, body in pages:
+            make_response(url, body).selector
+    html_seconds = time.perf_counter() - html_start
+
+    count = iterations * len(pages)
+    return {
+        'pages': len(pages),
+        'ms_per_page': best / count * 1000,
+        'html_parse_ms_per_page': html_seconds / count * 1000,
+        'pages_per_sec': count / best,
+        'jobs_per_page': jobs / count,
+        'jobs_per_sec': jobs / best,
+    }
+
+
+def measure_allocations(spider, kind, pages, iterations):
+    """Average peak and retained (leaked) traced memory per page, after one warm-up page"""
+    run_callback(spider, kind, *pages[0])
+    tracemalloc.start()
+    peak = retained = 0
+    try:
+        for _ in range(iterations):
+            for url, body in pages:
+                gc.collect()
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                run_callback(spider, kind, url, body)
+                page_peak = tracemalloc.get_traced_memory()[1]
+                # Responses and selectors form reference cycles; only count what outlives them
+                gc.collect()
+                current = tracemalloc.get_traced_memory()[0]
+                peak += page_peak - before
+                retained += current - before
+    finally:
+        tracemalloc.stop()
+    count = iterations * len(pages)
+    return {'peak_kb_per_page': peak / count / 1024, 'retained_kb_per_page': retained / count / 1024}
+
+
+def time_selectors(selectors, pages, iterations):
+    """Time individual selectors on already parsed pages"""
+    responses = [make_response(url, body) for url, body in pages]
+    results = []
+    for group, query in selectors:
+        for response in responses:
+            response.css(query).getall()  # translate the CSS once, as a crawl would
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for response in responses:
+                matches = len(response.css(query).getall())
+        elapsed = time.perf_counter() - start
+        results.append({
+            'group': group,
+            'selector': query,
+            'us_per_page': elapsed / (iterations * len(responses)) * 1e6,
+            'matches_last_page': matches,
+        })
+    return results
+
+
+def environment():
+    import lxml.etree
+    import parsel
+    import scrapy
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'scrapy': scrapy.__version__,
+        'parsel': parsel.__version__,
+        'lxml': '.'.join(map(str, lxml.etree.LXML_VERSION)),
+        'machine': platform.machine(),
+    }
+
+
+def compare(results, previous):
+    old = {(r['spider'], r['callback']): r for r in previous['callbacks']}
+    print(f"\nCompared with {previous['environment'].get('commit')} ({previous['created_at']}):")
+    for r in results['callbacks']:
+        before = old.get((r['spider'], r['callback']))
+        if before:
+            print(f"{r['spider']:>10} {r['callback']:<18} {before['ms_per_page']:>8.2f}ms -> "
+                  f"{r['ms_per_page']:>8.2f}ms  ({before['ms_per_page'] / r['ms_per_page']:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline spider parser benchmark')
+    parser.add_argument('--spiders', nargs='+', choices=list(SPIDERS), default=list(SPIDERS))
+    parser.add_argument('--iterations', type=int, default=20, help='Passes over each page per timing run')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing runs; the best one is reported')
+    parser.add_argument('--alloc-iterations', type=int, default=3)
+    parser.add_argument('--selector-iterations', type=int, default=200)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='A previous --output file to compare against')
+    args = parser.parse_args()
+
+    # Crawlers expect the project's reactor even though nothing is downloaded
+    install_reactor('twisted.internet.asyncioreactor.AsyncioSelectorReactor')
+    fixtures = load_fixtures()
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'iterations': args.iterations,
+        'callbacks': [],
+        'selectors': [],
+    }
+
+    print(f"{'spider':>10} {'callback':<18} {'ms/page':>8} {'html ms':>8} {'pages/s':>8} "
+          f"{'jobs/s':>8} {'peak KB':>8} {'kept KB':>8}")
+    for name in args.spiders:
+        spider = make_spider(SPIDERS[name])
+        for kind, callback in (('listing', 'parse'), ('detail', 'parse_job_details')):
+            pages = fixtures[name][kind]
+            row = {'spider': name, 'callback': callback}
+            row.update(time_pages(spider, kind, pages, args.iterations, args.repeat))
+            row.update(measure_allocations(spider, kind, pages, args.alloc_iterations))
+            results['callbacks'].append(row)
+            print(f"{name:>10} {callback:<18} {row['ms_per_page']:>8.2f} {row['html_parse_ms_per_page']:>8.2f} "
+                  f"{row['pages_per_sec']:>8.0f} {row['jobs_per_sec']:>8.0f} "
+                  f"{row['peak_kb_per_page']:>8.0f} {row['retained_kb_per_page']:>8.1f}")
+
+    if 'jobinja' in args.spiders:
+        print(f"\nJobinja selectors ({args.selector_iterations} runs per page, page already parsed):")
+        for kind, selectors in (('listing', JOBINJA_LISTING_SELECTORS), ('detail', JOBINJA_DETAIL_SELECTORS)):
+            for row in time_selectors(selectors, fixtures['jobinja'][kind], args.selector_iterations):
+                row['page'] = kind
+                results['selectors'].append(row)
+                print(f"{row['us_per_page']:>9.0f}us  {row['matches_last_page']:>4} matches  "
+                      f"{row['group']:<11} {row['selector']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
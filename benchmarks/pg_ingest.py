@@ -0,0 +1,149 @@
+"""
+Compare the storage pipeline's ingestion on SQLite and PostgreSQL: rows/sec
+for a first crawl (all inserts) and a recrawl of part of it (updates), at a
+few batch sizes. PostgreSQL is measured with the executemany upsert SQLite
+uses and with COPY into a staging table followed by a merge.
+
+Each run is its own process on a fresh schema; the PostgreSQL database's
+tables are dropped and recreated, so give it a scratch database.
+Deduplication is off: it costs the same on both backends.
+
+    python -m benchmarks.pg_ingest --postgres-url postgresql+psycopg://user@localhost/jobs_benchmark
+"""
+from sqlalchemy import text
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+SOURCES = ['LinkedIn', 'Jobinja', 'Jobvision']
+TECH_STACKS = [
+    {'languages': ['python'], 'frameworks': ['django'], 'databases': ['postgresql']},
+    {'languages': ['javascript', 'typescript'], 'frameworks': ['react']},
+    {'languages': ['go'], 'tools': ['docker', 'kubernetes']},
+    {'languages': ['java'], 'frameworks': ['spring']},
+    None,
+]
+WORDS = ['python', 'backend', 'team', 'remote', 'experience', 'design', 'systems', 'scale', 'we', 'offer',
+         'product', 'api', 'cloud', 'data', 'senior', 'growth', 'customers', 'tests', 'review', 'ship']
+
+
+def scraped_jobs(count, seed, description_words):
+    """Jobs as the spiders yield them"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    for i in range(count):
+        yield {
+            'title': f"{rng.choice(['Senior', 'Junior', 'Lead'])} {rng.choice(['Backend', 'Frontend', 'Data'])} "
+                     f"Engineer {i}",
+            'company': f'Company {rng.randint(1, 5000)}',
+            'location': rng.choice(['Tehran', 'Berlin', 'Remote', None]),
+            'url': f'https://jobs.example.com/{i}',
+            'source': rng.choice(SOURCES),
+            'work_type': rng.choice(['fully_remote', 'hybrid', 'onsite', 'unknown']),
+            'tech_stack': rng.choice(TECH_STACKS),
+            'min_salary': rng.choice([None, 3000, 4000]),
+            'max_salary': rng.choice([None, 6000, 8000]),
+            'currency': 'USD',
+            'salary_period': 'monthly',
+            'visa_sponsorship': rng.random() < 0.1,
+            'posted_date': now - timedelta(minutes=rng.randint(0, 60 * 24 * 60)),
+            'description': ' '.join(rng.choice(WORDS) for _ in range(description_words)),
+        }
+
+
+def ingest(pipeline, items, batch_size):
+    """Rows/sec writing items through the pipeline in batches, as its flushes do"""
+    rows = [pipeline.to_row(item) for item in items]
+    start = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        result = pipeline.write_rows(rows[i:i + batch_size])
+        if result['rejected']:
+            raise RuntimeError(f"{result['rejected']} rows rejected: {result['errors'][:3]}")
+    return len(rows) / (time.perf_counter() - start)
+
+
+def child(args):
+    """Runs in the subprocess, with DATABASE_URL pointing at the backend: inserts, then updates"""
+    from src.models.job import Base
+    from src.pipelines import JobStoragePipeline
+    from src.utils.database import engine, migrate_db
+    import src.models.notification  # noqa: F401 - the Telegram tables
+    from unittest.mock import Mock
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    migrate_db(engine)
+
+    pipeline = JobStoragePipeline(Mock(), dedup_threshold=None)
+    pipeline.copy = args.child == 'copy'
+    inserts = ingest(pipeline, scraped_jobs(args.rows, 0, args.words), args.batch_size)
+    # Autovacuum would have by the time of a recrawl; without statistics
+    # PostgreSQL looks URLs up with sequential scans
+    with engine.begin() as conn:
+        conn.execute(text('ANALYZE'))
+    # A recrawl: a share of the same URLs with changed fields
+    recrawled = list(scraped_jobs(args.rows, 1, args.words))[:int(args.rows * args.recrawl)]
+    updates = ingest(pipeline, recrawled, args.batch_size)
+    with engine.connect() as conn:
+        stored = conn.execute(text('SELECT count(*) FROM jobs')).scalar()
+    engine.dispose()
+    print(json.dumps({'inserts': inserts, 'updates': updates, 'stored': stored}))
+
+
+def remove_sqlite_files(path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def run_child(url, mode, args, batch_size):
+    command = [sys.executable, '-m', 'benchmarks.pg_ingest', '--child', mode, '--rows', str(args.rows),
+               '--words', str(args.words), '--recrawl', str(args.recrawl), '--batch-size', str(batch_size)]
+    env = dict(os.environ, DATABASE_URL=url)
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite vs PostgreSQL ingestion benchmark')
+    parser.add_argument('--postgres-url', default=os.getenv('POSTGRES_URL'),
+                        help='SQLAlchemy URL of a scratch PostgreSQL database (default: $POSTGRES_URL)')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--words', type=int, default=200, help='Words per synthetic description')
+    parser.add_argument('--recrawl', type=float, default=0.3, help='Share of the jobs scraped again')
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--path', default='/tmp/jobs_ingest_benchmark.db')
+    parser.add_argument('--child', choices=['executemany', 'copy'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        args.batch_size = args.batch_size[0]
+        return child(args)
+    if not args.postgres_url:
+        parser.error('give a PostgreSQL database with --postgres-url or POSTGRES_URL')
+
+    runs = [
+        ('SQLite', f'sqlite:///{args.path}', 'executemany'),
+        ('PostgreSQL', args.postgres_url, 'executemany'),
+        ('PostgreSQL', args.postgres_url, 'copy'),
+    ]
+    print(f"{args.rows:,} jobs, then {int(args.rows * args.recrawl):,} of them scraped again\n")
+    print(f"{'backend':<11} {'write':<12} {'batch':>6} {'inserts/s':>10} {'updates/s':>10}")
+    for batch_size in args.batch_size:
+        for backend, url, mode in runs:
+            remove_sqlite_files(args.path)
+            result = run_child(url, mode, args, batch_size)
+            if result['stored'] != args.rows:
+                raise RuntimeError(f"{backend} {mode} stored {result['stored']} jobs, expected {args.rows}")
+            print(f"{backend:<11} {mode:<12} {batch_size:>6} {result['inserts']:>10,.0f} {result['updates']:>10,.0f}")
+    remove_sqlite_files(args.path)
+
+
+if __name__ == '__main__':
+    main()
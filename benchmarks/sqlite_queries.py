@@ -0,0 +1,222 @@
+"""
+Time the display_results queries on a synthetic jobs table, first the way they
+ran before (default connection settings, no indexes, full rows) and then with
+the tuned engine, the migrated indexes and the descriptions moved out of the
+jobs table. Salary filters used to mean loading every job with a salary and
+converting it in Python; now they are range scans on the normalized columns.
+
+    python -m benchmarks.sqlite_queries --rows 1000000
+"""
+from src.main import results_query
+from src.models.job import Job
+from src.utils.database import create_tuned_engine, migrate_db, normalize_salaries
+from src.utils.salary import normalized_salary
+from sqlalchemy import Column, MetaData, Table, Text, create_engine, literal_column, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+from argparse import Namespace
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+
+SOURCES = ['LinkedIn', 'Jobinja', 'Jobvision']
+WORK_TYPES = ['fully_remote', 'hybrid', 'onsite', 'unknown']
+# (share of jobs, currency, period, lowest, highest) for the synthetic salaries
+SALARIES = [
+    (0.3, 'IRT', 'monthly', 15_000_000, 120_000_000),
+    (0.1, 'USD', 'yearly', 40_000, 250_000),
+    (0.05, 'EUR', 'yearly', 35_000, 150_000),
+]
+SALARY_FIELDS = ('min_salary', 'max_salary', 'currency', 'salary_period')
+
+# The filter combinations display_results can be called with
+QUERIES = [
+    ('--visa-only', Namespace(visa_only=True, relocation_only=False, days=None)),
+    ('--relocation-only', Namespace(visa_only=False, relocation_only=True, days=None)),
+    ('--days 7', Namespace(visa_only=False, relocation_only=False, days=7)),
+    ('--visa-only --days 30', Namespace(visa_only=True, relocation_only=False, days=30)),
+    ('--min-salary 4000', Namespace(visa_only=False, relocation_only=False, days=None, min_salary=4000)),
+]
+
+
+class PostFiltered:
+    """A query whose rows are filtered in Python after loading"""
+
+    def __init__(self, query, keep):
+        self.query = query
+        self.keep = keep
+
+    def all(self):
+        return [row for row in self.query.all() if self.keep(row)]
+
+
+def legacy_query(db, args):
+    """display_results' query before tuning: every column, including description"""
+    query = db.query(Job, literal_column('jobs.description'))
+    if getattr(args, 'min_salary', None) is not None:
+        # Salaries in different currencies and periods can only be compared
+        # after converting each one
+        query = query.filter((Job.min_salary != None) | (Job.max_salary != None))
+        return PostFiltered(query, lambda row: (normalized_salary(
+            {field: getattr(row[0], field) for field in SALARY_FIELDS}
+        )['monthly_salary_max'] or 0) >= args.min_salary)
+    if args.visa_only:
+        query = query.filter(Job.visa_sponsorship == True)
+    if args.relocation_only:
+        query = query.filter(Job.relocation_support == True)
+    if args.days:
+        query = query.filter(Job.posted_date >= datetime.now() - timedelta(days=args.days))
+    return query
+
+
+def legacy_jobs_table():
+    """The jobs table as databases created before descriptions moved to job_descriptions have it"""
+    columns = []
+    for column in Job.__table__.columns:
+        columns.append(column._copy())
+        if column.name == 'location':
+            columns.append(Column('description', Text))
+    return Table('jobs', MetaData(), *columns)
+
+
+def build_database(path, rows, description_chars, seed=0, descriptions=None):
+    """
+    Create an unindexed jobs table (as old databases have) with synthetic rows,
+    drawing descriptions from the given pool or from a small generated one
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    plain = create_engine(f'sqlite:///{path}')
+    with plain.begin() as conn:
+        conn.execute(CreateTable(legacy_jobs_table()))
+    plain.dispose()
+
+    rng = random.Random(seed)
+    words = 'python django react docker remote senior backend team product api data cloud'.split()
+    descriptions = descriptions or [
+        ' '.join(rng.choice(words) for _ in range(description_chars // 6))[:description_chars]
+        for _ in range(500)
+    ]
+    now = datetime.now()
+
+    def salary():
+        pick = rng.random()
+        for share, currency, period, lowest, highest in SALARIES:
+            if pick < share:
+                low = rng.uniform(lowest, highest)
+                return (round(low, -3), round(low * rng.uniform(1, 1.5), -3), currency, period)
+            pick -= share
+        return (None, None, None, None)
+
+    def generate():
+        for i in range(rows):
+            posted = now - timedelta(minutes=rng.randrange(365 * 24 * 60))
+            yield (
+                *salary(),
+                f'Engineer {i}', f'Company {i % 5000}', 'Tehran', rng.choice(descriptions),
+                f'https://example.com/jobs/{i}', rng.choice(SOURCES), rng.choice(WORK_TYPES),
+                json.dumps({'languages': ['python']}),
+                rng.random() < 0.03, rng.random() < 0.05,
+                str(posted), str(posted), str(posted),
+            )
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.executemany(
+        'INSERT INTO jobs (min_salary, max_salary, currency, salary_period, '
+        'title, company, location, description, url, source, work_type, '
+        'tech_stack, visa_sponsorship, relocation_support, posted_date, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        generate()
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_queries(db_engine, build_query, repeat):
+    Session = sessionmaker(bind=db_engine)
+    results = {}
+    for label, args in QUERIES:
+        best = None
+        for _ in range(repeat):
+            db = Session()
+            try:
+                start = time.perf_counter()
+                count = len(build_query(db, args).all())
+                elapsed = time.perf_counter() - start
+            finally:
+                db.close()
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = (best, count)
+    return results
+
+
+def query_plans(db_engine):
+    plans = {}
+    Session = sessionmaker(bind=db_engine)
+    db = Session()
+    try:
+        for label, args in QUERIES:
+            statement = results_query(db, args).statement.compile(
+                db_engine, compile_kwargs={'literal_binds': True}
+            )
+            with db_engine.connect() as conn:
+                rows = conn.execute(text(f'EXPLAIN QUERY PLAN {statement}')).all()
+            plans[label] = '; '.join(row[-1] for row in rows)
+    finally:
+        db.close()
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite display query benchmark')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--description-chars', type=int, default=1500)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--path', default='/tmp/jobs_benchmark.db')
+    parser.add_argument('--keep', action='store_true', help='Keep the benchmark database afterwards')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_database(args.path, args.rows, args.description_chars)
+    size = os.path.getsize(args.path)
+    print(f"Built {args.rows:,} rows ({size / 1e6:,.0f} MB) in {time.perf_counter() - start:.1f}s\n")
+
+    url = f'sqlite:///{args.path}'
+    before_engine = create_engine(url)
+    before = run_queries(before_engine, legacy_query, args.repeat)
+    before_engine.dispose()
+
+    after_engine = create_tuned_engine(url)
+    start = time.perf_counter()
+    created = migrate_db(after_engine)
+    normalize_salaries(after_engine)
+    print(f"Migrated in {time.perf_counter() - start:.1f}s: {', '.join(created)}\n")
+    after = run_queries(after_engine, results_query, args.repeat)
+    plans = query_plans(after_engine)
+    after_engine.dispose()
+
+    print(f"{'query':>24}  {'rows':>7}  {'before':>8}  {'after':>8}  speedup")
+    for label, _ in QUERIES:
+        (before_time, count), (after_time, _) = before[label], after[label]
+        print(f"{label:>24}  {count:>7,}  {before_time:>7.3f}s  {after_time:>7.3f}s  "
+              f"{before_time / after_time:>6.1f}x")
+
+    print("\nQuery plans after migration:")
+    for label, plan in plans.items():
+        print(f"  {label}: {plan}")
+
+    if not args.keep:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.path + suffix):
+                os.remove(args.path + suffix)
+
+
+if __name__ == '__main__':
+    main()
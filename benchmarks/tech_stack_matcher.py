@@ -0,0 +1,112 @@
+"""
+Compare the shared compiled tech-stack matcher with the per-spider keyword loops
+it replaced.
+
+    python -m benchmarks.tech_stack_matcher --docs 5000
+"""
+from src.utils.database import engine
+from src.utils.tech_stack import detect_tech_stack, matcher, normalize_text
+from sqlalchemy import text
+import argparse
+import random
+import time
+
+# The detectors as they existed in the spiders before the shared matcher
+LEGACY_LINKEDIN = {
+    'frameworks': ['react', 'vue', 'angular', 'next.js', 'nuxt', 'svelte'],
+    'languages': ['javascript', 'typescript', 'html', 'css'],
+    'tools': ['webpack', 'vite', 'babel', 'eslint', 'jest', 'cypress'],
+    'styling': ['sass', 'less', 'tailwind', 'styled-components', 'css-in-js'],
+    'state': ['redux', 'mobx', 'zustand', 'recoil', 'vuex', 'pinia']
+}
+LEGACY_JOBVISION = {
+    'frameworks': ['django', 'flask', 'fastapi', 'laravel', 'spring', 'react', 'vue', 'angular'],
+    'languages': ['python', 'php', 'java', 'javascript', 'typescript', 'go', 'rust'],
+    'databases': ['mysql', 'postgresql', 'mongodb', 'redis', 'elasticsearch'],
+    'tools': ['docker', 'kubernetes', 'git', 'linux', 'aws', 'azure']
+}
+
+
+def legacy_detect(categories, description):
+    found_techs = {category: [] for category in categories}
+    desc_lower = description.lower()
+    for category, technologies in categories.items():
+        for tech in technologies:
+            if tech in desc_lower:
+                found_techs[category].append(tech)
+    return found_techs
+
+
+def legacy_all(description):
+    legacy_detect(LEGACY_LINKEDIN, description)
+    return legacy_detect(LEGACY_JOBVISION, description)
+
+
+def substring_full_taxonomy(description):
+    """The legacy approach scaled up to every alias in the shared taxonomy"""
+    text = normalize_text(description)
+    return [alias for alias in matcher.aliases if alias in text]
+
+
+FILLER = (
+    'we are looking for a good engineer to join our growing team and build json apis '
+    'for millions of users with strong ownership and communication skills '
+    'experience with python django react typescript docker kubernetes postgresql redis '
+    'nice to have golang rust aws ci/cd graphql tailwind redux jest cypress webpack '
+    'برنامه نویس پایتون جنگو جاوااسکریپت لاراول داکر لینوکس گیت همکاری تمام وقت '
+).split()
+
+
+def build_corpus(docs, words_per_doc, seed=0):
+    """Real descriptions from the jobs table, padded out with synthetic text"""
+    with engine.connect() as conn:
+        try:
+            corpus = [row[0] for row in conn.execute(text('SELECT description FROM jobs WHERE description IS NOT NULL'))]
+        except Exception:
+            corpus = []
+
+    rng = random.Random(seed)
+    while len(corpus) < docs:
+        corpus.append(' '.join(rng.choice(FILLER) for _ in range(words_per_doc)))
+    return corpus[:docs]
+
+
+def timed(func, corpus):
+    start = time.perf_counter()
+    for description in corpus:
+        func(description)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tech stack matcher benchmark')
+    parser.add_argument('--docs', type=int, default=5000)
+    parser.add_argument('--words', type=int, default=400, help='Words per synthetic description')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.docs, args.words)
+    total_chars = sum(len(d) for d in corpus)
+    print(f"Corpus: {len(corpus)} descriptions, {total_chars / 1e6:.1f}M characters\n")
+
+    print(f"Taxonomy: {len(matcher.aliases)} aliases; legacy loops: "
+          f"{sum(map(len, LEGACY_LINKEDIN.values())) + sum(map(len, LEGACY_JOBVISION.values()))} keywords\n")
+
+    runs = [
+        ('legacy keyword loops', legacy_all),
+        ('substring, full taxonomy', substring_full_taxonomy),
+        ('compiled matcher', detect_tech_stack),
+    ]
+    for name, func in runs:
+        best = min(timed(func, corpus) for _ in range(args.repeat))
+        print(f"{name:>24}: {best:.3f}s  ({len(corpus) / best:,.0f} docs/sec, "
+              f"{total_chars / best / 1e6:.1f}M chars/sec)")
+
+    sample = 'a good json api, go home'
+    print(f"\nOn {sample!r}:")
+    print(f"  legacy:   {legacy_all(sample)}")
+    print(f"  compiled: {detect_tech_stack(sample)}")
+
+
+if __name__ == '__main__':
+    main()
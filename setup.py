@@ -4,10 +4,15 @@ setup(
     name="job-scraper",
     version="0.1",
     packages=find_packages(),
+    package_data={'src.utils': ['*.json']},
     install_requires=[
         'scrapy>=2.13.0',
         'sqlalchemy>=2.0.41',
         'beautifulsoup4>=4.13.4',
         'python-dotenv>=1.0.0',
     ],
+    extras_require={
+        # The PostgreSQL driver (DATABASE_URL=postgresql+psycopg://...)
+        'postgres': ['psycopg[binary]>=3.1'],
+    },
 )
@@ -0,0 +1,241 @@
+from src.models.job import Job
+from src.utils.search import jobs_fts, search_match
+from aiohttp import web
+from sqlalchemy import String, and_, select, tuple_, type_coerce
+from sqlalchemy.exc import OperationalError
+from argparse import Namespace
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+# posted_date as stored, so a cursor compares exactly like the rows it came
+# from however the database formatted the timestamp
+POSTED_KEY = type_coerce(Job.posted_date, String)
+
+# Everything but the MinHash signature, which nothing shows
+LISTED_COLUMNS = [column for column in Job.__table__.columns if column.name != 'minhash']
+
+
+class TTLCache:
+    """Responses by query, kept for ttl seconds; the least recently used go first past size entries"""
+
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        if self.ttl <= 0:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+def parse_filters(query):
+    """The CLI's filter options from a request's query string; raises ValueError for bad values"""
+    def number(name, kind):
+        value = query.get(name)
+        try:
+            return kind(value) if value not in (None, '') else None
+        except ValueError:
+            raise ValueError(f"{name} must be a number, not {value!r}")
+
+    techs = [tech for value in query.getall('tech', []) for tech in value.split(',') if tech.strip()]
+    return Namespace(
+        visa_only=query.get('visa_only', '').lower() in TRUE_VALUES,
+        relocation_only=query.get('relocation_only', '').lower() in TRUE_VALUES,
+        days=number('days', int),
+        search=query.get('search') or None,
+        source=query.get('source') or None,
+        tech=techs,
+        min_salary=number('min_salary', float),
+        max_salary=number('max_salary', float),
+        salary_currency=query.get('salary_currency') or None,
+    )
+
+
+def encode_cursor(posted, job_id):
+    if isinstance(posted, datetime):
+        # PostgreSQL returns the timestamp itself; it compares the same as text
+        posted = posted.isoformat(sep=' ')
+    return base64.urlsafe_b64encode(json.dumps([posted, job_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(decoded, list) or len(decoded) != 2:
+            raise ValueError
+        posted, job_id = decoded
+        if not isinstance(job_id, int) or not isinstance(posted, (str, type(None))):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return posted, job_id
+
+
+def after_cursor(cursor, dialect_name='sqlite'):
+    """
+    The conditions for the jobs after cursor in newest-first order, to be
+    queried in turn: the dated jobs, then those without a posted date, which
+    SQLite sorts last. Separate queries rather than one OR, so each is a range
+    scan on ix_jobs_posted_date_id, and the order of NULLs, which PostgreSQL
+    sorts first, doesn't matter.
+    """
+    if cursor is None:
+        return [Job.posted_date.isnot(None), Job.posted_date.is_(None)]
+    posted, job_id = cursor
+    if posted is None:
+        return [and_(Job.posted_date.is_(None), Job.id < job_id)]
+    if dialect_name != 'sqlite':
+        # Only SQLite stores timestamps as text; elsewhere compare timestamps
+        try:
+            return [tuple_(Job.posted_date, Job.id) < (datetime.fromisoformat(posted), job_id),
+                    Job.posted_date.is_(None)]
+        except ValueError:
+            raise ValueError(f"Invalid cursor date {posted!r}")
+    return [tuple_(POSTED_KEY, Job.id) < (posted, job_id), Job.posted_date.is_(None)]
+
+
+class JobsAPI:
+    """
+    Read-only HTTP API over the jobs table. GET /jobs takes the CLI's
+    filters as query parameters and returns a page of jobs, newest first,
+    with a cursor for the next page. Responses carry an ETag and are cached
+    for cache_ttl seconds; concurrent requests for the same uncached page
+    share one query.
+
+    filters and to_json are the CLI's job_filters and job_to_json, passed in
+    so filtering and output stay the same as on the command line.
+    """
+
+    def __init__(self, bind, filters, to_json, cache_ttl=10, cache_size=1024, workers=8):
+        self.bind = bind
+        self.filters = filters
+        self.to_json = to_json
+        self.cache = TTLCache(cache_ttl, cache_size)
+        self.pending = {}
+        # Queries run on threads, so one slow page doesn't stall the others
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/jobs', self.jobs)
+        app.router.add_get('/health', self.health)
+        app.on_cleanup.append(self.close)
+        return app
+
+    async def close(self, app):
+        self.executor.shutdown(wait=False)
+
+    def page(self, args, cursor, limit):
+        """One page of matching jobs as a JSON body"""
+        filters = self.filters(args)
+        if args.search:
+            filters.append(Job.id.in_(select(jobs_fts.c.rowid).where(search_match(args.search))))
+        query = (
+            select(*LISTED_COLUMNS, POSTED_KEY.label('posted_key'))
+            .where(*filters)
+            .order_by(Job.posted_date.desc(), Job.id.desc())
+        )
+        rows = []
+        with self.bind.connect() as conn:
+            for condition in after_cursor(cursor, self.bind.dialect.name):
+                rows += conn.execute(query.where(condition).limit(limit + 1 - len(rows))).all()
+                if len(rows) > limit:
+                    break
+        # Rows have the same attributes as Job objects, without the cost of building them
+        jobs = [self.to_json(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(rows[limit - 1].posted_key, rows[limit - 1].id) if len(rows) > limit else None
+        return f'{{"jobs": [{", ".join(jobs)}], "next_cursor": {json.dumps(next_cursor)}}}'.encode('utf-8')
+
+    async def load(self, key, query):
+        """The (etag, body) of a response, from the cache or the database"""
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if key in self.pending:
+            return await asyncio.shield(self.pending[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            args = parse_filters(query)
+            if args.search and self.bind.dialect.name != 'sqlite':
+                raise ValueError("search needs SQLite's full-text index and isn't available on PostgreSQL")
+            cursor = decode_cursor(query['cursor']) if query.get('cursor') else None
+            limit = query.get('limit') or str(DEFAULT_PAGE_SIZE)
+            if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+            try:
+                body = await asyncio.get_running_loop().run_in_executor(self.executor, self.page, args, cursor, int(limit))
+            except OperationalError as e:
+                # Malformed FTS5 queries end up here
+                if not args.search:
+                    raise
+                raise ValueError(f"Invalid search query {args.search!r}: {e.orig}")
+            result = (f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', body)
+            self.cache.put(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            del self.pending[key]
+
+    async def jobs(self, request):
+        key = tuple(sorted(request.query.items()))
+        try:
+            etag, body = await self.load(key, request.query)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+        headers = {'ETag': etag, 'Cache-Control': f'max-age={max(self.cache.ttl, 0):g}'}
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match.strip() == '*' or etag in (tag.strip() for tag in if_none_match.split(',')):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type='application/json', headers=headers)
+
+    async def health(self, request):
+        return web.json_response({
+            'cache_entries': len(self.cache.entries),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+        })
+
+
+def serve_api(api, host, port):
+    logger.info(f"Serving the jobs API on http://{host}:{port}/jobs")
+    # No per-request access log: at hundreds of requests a second it costs
+    # more than the cached responses
+    web.run_app(api.app(), host=host, port=port, access_log=None, print=None)
@@ -0,0 +1,267 @@
+from scrapy.crawler import Crawler, CrawlerRunner
+from scrapy.utils.reactor import install_reactor
+from datetime import datetime
+import json
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Stats copied from each crawler into the status file after a run
+RUN_STATS = {
+    'items': 'item_scraped_count',
+    'inserted': 'jobs/inserted',
+    'updated': 'jobs/updated',
+    'duplicates': 'jobs/duplicates',
+    'rejected': 'jobs/rejected',
+    'skipped': 'seen_urls/skipped',
+}
+
+
+class ScheduledCrawl:
+    """One configured (spiders, keywords, location) query and its run history"""
+
+    def __init__(self, spider, spider_classes, keywords, location, interval, jitter):
+        self.spider = spider
+        self.spider_classes = spider_classes
+        self.keywords = keywords
+        self.location = location
+        self.interval = interval
+        self.jitter = jitter
+        self.name = f"{spider}: {keywords} in {location}"
+
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.next_run_at = None
+        self.last_started_at = None
+        self.last_finished_at = None
+        self.last_duration = None
+        self.last_error = None
+        self.last_stats = {}
+
+    def jittered(self, delay):
+        """Spread runs by +/- jitter (a fraction of the interval) so queries drift apart"""
+        spread = self.interval * self.jitter
+        return max(0.0, delay + random.uniform(-spread, spread))
+
+    def status(self):
+        return {
+            'name': self.name,
+            'spider': self.spider,
+            'keywords': self.keywords,
+            'location': self.location,
+            'interval': self.interval,
+            'running': self.running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'next_run_at': timestamp(self.next_run_at),
+            'last_started_at': timestamp(self.last_started_at),
+            'last_finished_at': timestamp(self.last_finished_at),
+            'last_duration': self.last_duration,
+            'last_error': self.last_error,
+            'last_stats': self.last_stats,
+        }
+
+
+def timestamp(value):
+    return datetime.fromtimestamp(value).isoformat(timespec='seconds') if value else None
+
+
+def load_daemon_config(path, resolve_spiders):
+    """
+    Read the daemon config file:
+
+        {
+          "status_file": "daemon_status.json",
+          "jitter": 0.1,
+          "queries": [
+            {"spider": "jobinja", "keywords": "python", "location": "تهران", "interval": 600},
+            {"spider": "linkedin,jobvision", "keywords": "react", "location": "Remote",
+             "interval": 1800, "jitter": 0.2}
+          ]
+        }
+
+    interval is in seconds. Returns the scheduled crawls and the status file path.
+    """
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+
+    default_jitter = float(config.get('jitter', 0.1))
+    crawls = []
+    names = set()
+    for entry in config.get('queries', []):
+        try:
+            spider = entry['spider']
+            keywords = entry['keywords']
+            location = entry['location']
+            interval = float(entry['interval'])
+        except KeyError as e:
+            raise ValueError(f"Query {entry} is missing {e}")
+        if interval <= 0:
+            raise ValueError(f"Query {entry} needs a positive interval")
+
+        crawl = ScheduledCrawl(
+            spider, resolve_spiders(spider), keywords, location, interval,
+            float(entry.get('jitter', default_jitter))
+        )
+        if crawl.name in names:
+            raise ValueError(f"Query '{crawl.name}' is configured twice")
+        names.add(crawl.name)
+        crawls.append(crawl)
+
+    if not crawls:
+        raise ValueError(f"No queries configured in {path}")
+    return crawls, config.get('status_file', 'daemon_status.json')
+
+
+class CrawlDaemon:
+    """
+    Runs the configured queries forever on one reactor with a CrawlerRunner.
+
+    Each query is rescheduled only once its previous run has finished, so runs
+    of the same query never overlap; different queries run side by side under
+    the usual per-domain politeness limits. A status file with a heartbeat and
+    each query's last run is rewritten after every run and every
+    heartbeat_interval seconds.
+    """
+
+    def __init__(self, crawls, settings, status_file, heartbeat_interval=30):
+        self.crawls = crawls
+        self.settings = settings
+        self.status_file = status_file
+        self.heartbeat_interval = heartbeat_interval
+        self.started_at = None
+        self.runner = None
+        self.stopping = False
+        self.calls = {}
+        self.active = set()
+
+    def run(self, on_shutdown=None):
+        """
+        Install the asyncio reactor, schedule every query and block until
+        SIGINT/SIGTERM. on_shutdown may return a Deferred to wait for.
+        """
+        install_reactor('twisted.internet.asyncioreactor.AsyncioSelectorReactor')
+        from twisted.internet import reactor, task
+
+        reactor.getThreadPool().adjustPoolsize(maxthreads=self.settings.getint('REACTOR_THREADPOOL_MAXSIZE', 10))
+        self.runner = CrawlerRunner(self.settings)
+        self.started_at = time.time()
+
+        for crawl in self.crawls:
+            # Stagger the first runs over the jitter window instead of starting everything at once
+            self.schedule(crawl, random.uniform(0, crawl.interval * crawl.jitter))
+
+        heartbeat = task.LoopingCall(self.write_status)
+        heartbeat.start(self.heartbeat_interval)
+
+        reactor.addSystemEventTrigger('before', 'shutdown', self.shutdown, heartbeat, on_shutdown)
+        logger.info(f"Daemon started with {len(self.crawls)} queries; status in {self.status_file}")
+        reactor.run()
+
+    def schedule(self, crawl, delay):
+        from twisted.internet import reactor
+        if self.stopping:
+            return
+        crawl.next_run_at = time.time() + delay
+        self.calls[crawl.name] = reactor.callLater(delay, self.start_crawl, crawl)
+
+    def crawl_settings(self, crawl):
+        settings = self.settings.copy()
+        # A listing page cached for longer than the interval would hide every new
+        # posting, so cap the listing TTL (above the spiders' custom_settings)
+        listing_ttl = settings.getint('HTTPCACHE_LISTING_TTL', 0)
+        cap = int(crawl.interval / 2)
+        if listing_ttl <= 0 or listing_ttl > cap:
+            settings.set('HTTPCACHE_LISTING_TTL', max(cap, 1), priority='cmdline')
+        return settings
+
+    def start_crawl(self, crawl):
+        from twisted.internet.defer import DeferredList
+        if crawl.running:
+            logger.warning(f"[{crawl.name}] previous run still in progress, skipping")
+            return
+
+        crawl.running = True
+        crawl.next_run_at = None
+        crawl.last_started_at = time.time()
+        logger.info(f"[{crawl.name}] starting crawl #{crawl.runs + 1}")
+
+        settings = self.crawl_settings(crawl)
+        crawlers = [Crawler(spider_class, settings) for spider_class in crawl.spider_classes]
+        d = DeferredList(
+            [self.runner.crawl(crawler, keywords=crawl.keywords, location=crawl.location) for crawler in crawlers],
+            consumeErrors=True
+        )
+        d.addCallback(self.finish_crawl, crawl, crawlers)
+        self.active.add(d)
+        d.addBoth(lambda _: self.active.discard(d))
+
+    def finish_crawl(self, results, crawl, crawlers):
+        crawl.running = False
+        crawl.runs += 1
+        crawl.last_finished_at = time.time()
+        crawl.last_duration = round(crawl.last_finished_at - crawl.last_started_at, 1)
+
+        errors = [str(failure.value) for ok, failure in results if not ok]
+        crawl.last_error = '; '.join(errors) or None
+        if errors:
+            crawl.failures += 1
+            logger.error(f"[{crawl.name}] crawl failed: {crawl.last_error}")
+
+        crawl.last_stats = {key: 0 for key in RUN_STATS}
+        for crawler in crawlers:
+            stats = crawler.stats.get_stats()
+            for key, stat in RUN_STATS.items():
+                crawl.last_stats[key] += stats.get(stat, 0)
+        logger.info(
+            f"[{crawl.name}] finished in {crawl.last_duration}s: "
+            + ', '.join(f"{value} {key}" for key, value in crawl.last_stats.items())
+        )
+
+        # The next run is counted from the start of this one, never overlapping it
+        elapsed = crawl.last_finished_at - crawl.last_started_at
+        self.schedule(crawl, crawl.jittered(max(0.0, crawl.interval - elapsed)))
+        self.write_status()
+
+    def status(self):
+        now = time.time()
+        return {
+            'pid': os.getpid(),
+            'started_at': timestamp(self.started_at),
+            'heartbeat_at': timestamp(now),
+            'uptime': round(now - self.started_at),
+            'healthy': not self.stopping and all(not crawl.last_error for crawl in self.crawls),
+            'stopping': self.stopping,
+            'queries': [crawl.status() for crawl in self.crawls],
+        }
+
+    def write_status(self):
+        # Write-then-rename so readers never see a half-written file
+        tmp_path = f"{self.status_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.status(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.status_file)
+
+    def shutdown(self, heartbeat, on_shutdown):
+        """Cancel pending runs, stop running crawls gracefully, then run on_shutdown"""
+        from twisted.internet.defer import DeferredList, maybeDeferred
+        logger.info("Daemon shutting down")
+        self.stopping = True
+        for call in self.calls.values():
+            if call.active():
+                call.cancel()
+        if heartbeat.running:
+            heartbeat.stop()
+        self.write_status()
+
+        self.runner.stop()
+        # Wait for the runs themselves so their results make it into the status file
+        d = DeferredList(list(self.active))
+        if on_shutdown:
+            d.addBoth(lambda _: maybeDeferred(on_shutdown))
+        d.addBoth(lambda _: self.write_status())
+        return d
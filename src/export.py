@@ -0,0 +1,197 @@
+from src.models.job import Job, JobDescription
+from sqlalchemy import func, select
+from datetime import datetime, timedelta
+import csv
+import json
+import os
+import resource
+import sys
+import time
+
+EXPORT_FORMATS = ('jsonl', 'csv', 'parquet')
+
+# Columns exported per job, in order; tech_stack is flattened to a list of
+# technology names and the description is only added on request
+EXPORT_COLUMNS = [
+    'id', 'title', 'company', 'location', 'url', 'source', 'job_type', 'experience_level',
+    'work_type', 'tech_stack', 'min_salary', 'max_salary', 'currency', 'salary_period',
+    'monthly_salary_min', 'monthly_salary_max', 'visa_sponsorship', 'relocation_support',
+    'benefits', 'company_size', 'industry', 'posted_date', 'created_at', 'updated_at',
+]
+
+# Rows whose updated_at is this close to the start of an export are left for
+# the next one, so a storage transaction still committing can't be skipped
+WATERMARK_LAG = timedelta(seconds=60)
+
+
+def flatten_tech_stack(tech_stack):
+    """{'languages': ['python'], 'frameworks': ['django']} -> ['django', 'python']"""
+    if not tech_stack:
+        return []
+    return sorted({tech for techs in tech_stack.values() for tech in techs or []})
+
+
+def export_query(since=None, until=None, with_descriptions=False):
+    """The jobs updated in [since, until), oldest change first"""
+    table = Job.__table__
+    columns = [table.c[name] for name in EXPORT_COLUMNS]
+    query = select(*columns)
+    if with_descriptions:
+        query = query.add_columns(JobDescription.body.label('description')).outerjoin(
+            JobDescription, JobDescription.job_id == table.c.id
+        )
+    if since is not None:
+        query = query.where(table.c.updated_at >= since)
+    if until is not None:
+        query = query.where(table.c.updated_at < until)
+    # ix_jobs_updated_at_id serves both the range and the order
+    return query.order_by(table.c.updated_at, table.c.id)
+
+
+def read_watermark(path):
+    """The updated_at cutoff the previous export stopped at, or None for a full export"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return datetime.fromisoformat(json.load(f)['updated_before'])
+
+
+def write_watermark(path, until, rows):
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump({
+            'updated_before': until.isoformat(sep=' '),
+            'rows': rows,
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+        }, f, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+
+class JsonlWriter:
+    def __init__(self, f, columns):
+        self.f = f
+
+    def write(self, rows):
+        for row in rows:
+            self.f.write(json.dumps(row, ensure_ascii=False, default=str))
+            self.f.write('\n')
+
+    def close(self):
+        pass
+
+
+class CsvWriter:
+    """One row per job; the tech_stack list is joined with '|'"""
+
+    def __init__(self, f, columns):
+        self.writer = csv.DictWriter(f, fieldnames=columns)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            row['tech_stack'] = '|'.join(row['tech_stack'])
+            self.writer.writerow(row)
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    """Each chunk becomes one row group, so only one chunk is ever held in memory"""
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+        self.pa = pa
+        types = {
+            'id': pa.int64(), 'tech_stack': pa.list_(pa.string()),
+            'min_salary': pa.float64(), 'max_salary': pa.float64(),
+            'monthly_salary_min': pa.float64(), 'monthly_salary_max': pa.float64(),
+            'visa_sponsorship': pa.bool_(), 'relocation_support': pa.bool_(),
+            'posted_date': pa.timestamp('us'), 'created_at': pa.timestamp('us'), 'updated_at': pa.timestamp('us'),
+        }
+        self.schema = pa.schema([(name, types.get(name, pa.string())) for name in columns])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        batch = self.pa.RecordBatch.from_pylist(rows, schema=self.schema)
+        self.writer.write_batch(batch)
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'jsonl': JsonlWriter, 'csv': CsvWriter, 'parquet': ParquetWriter}
+
+
+def export_jobs(bind, output, fmt='jsonl', watermark=None, chunk_size=1000, with_descriptions=False):
+    """
+    Stream the jobs table to output in chunks of chunk_size rows.
+
+    Rows are read through a streaming cursor and written chunk by chunk, so
+    memory stays flat however large the table is. With a watermark file, only
+    jobs updated since the previous export are written, and the file is
+    advanced once the output is complete. Output other than stdout is written
+    to a temporary file first, so a failed export leaves nothing half written.
+    Returns counts and timings.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(EXPORT_FORMATS)}")
+    if output == '-' and fmt == 'parquet':
+        raise ValueError("Parquet can't be written to stdout; give an output file")
+
+    start = time.perf_counter()
+    since = read_watermark(watermark)
+    with bind.connect() as conn:
+        # The database's clock, which stamped updated_at
+        now = conn.execute(select(func.now())).scalar()
+        if isinstance(now, str):
+            now = datetime.fromisoformat(now)
+        until = now.replace(tzinfo=None, microsecond=0) - WATERMARK_LAG if watermark else None
+
+        columns = EXPORT_COLUMNS + (['description'] if with_descriptions else [])
+        temporary = None if output == '-' else f'{output}.tmp'
+        f = None
+        if fmt != 'parquet':
+            f = sys.stdout if output == '-' else open(temporary, 'w', encoding='utf-8', newline='')
+        writer = WRITERS[fmt](temporary if fmt == 'parquet' else f, columns)
+
+        rows = 0
+        try:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+                export_query(since, until, with_descriptions)
+            )
+            for chunk in result.mappings().partitions():
+                chunk = [dict(row) for row in chunk]
+                for row in chunk:
+                    row['tech_stack'] = flatten_tech_stack(row['tech_stack'])
+                writer.write(chunk)
+                rows += len(chunk)
+            writer.close()
+        except BaseException:
+            if f is not None and f is not sys.stdout:
+                f.close()
+            if temporary and os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        finally:
+            if f is not None and f is not sys.stdout:
+                f.close()
+
+    if temporary:
+        os.replace(temporary, output)
+    if watermark:
+        write_watermark(watermark, until, rows)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed else 0,
+        'since': since,
+        'until': until,
+        # ru_maxrss is in KiB on Linux
+        'peak_memory_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
@@ -0,0 +1,464 @@
+from src.resume import crawl_key
+from scrapy import signals
+from scrapy.core.scheduler import Scheduler
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.request import request_from_dict
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+# Request states in the frontier table
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+# Sent by FrontierMiddleware with the request of each response it has seen
+# through the spider: the callback ran and the requests it yielded are queued
+request_handled = object()
+
+
+class Frontier:
+    """
+    A crawl's request queue and dupefilter in a SQLite file shared by its
+    worker processes.
+
+    Requests are keyed by crawl and fingerprint, so each is queued once
+    however many workers find it. A worker leases a request for
+    lease_timeout seconds and marks it done once it has been handled, its
+    callback's requests queued; leases of a worker that crashed expire and
+    the request goes back to the queue, up to max_attempts leases. Requests
+    to one domain are leased at most every domain_delay seconds across all
+    workers. All methods run in short IMMEDIATE transactions, so concurrent
+    workers never lease the same row.
+    """
+
+    def __init__(self, path, crawl, worker, lease_timeout=300.0, domain_delay=1.0, max_attempts=3,
+                 restart_delay=60.0):
+        self.path = path
+        self.crawl = crawl
+        self.worker = worker
+        self.lease_timeout = lease_timeout
+        self.domain_delay = domain_delay
+        self.max_attempts = max_attempts
+        self.restart_delay = restart_delay
+        self.db = None
+
+    def open(self):
+        """
+        Open the file. Returns 'joined' for a crawl in progress, 'finished'
+        for one whose last request was handled less than restart_delay
+        seconds ago (so a worker started late doesn't crawl it all again), or
+        'started' for a new crawl, after clearing the one before.
+        """
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('PRAGMA busy_timeout=10000')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS requests ('
+            ' id INTEGER PRIMARY KEY, crawl TEXT NOT NULL, fingerprint TEXT, domain TEXT NOT NULL,'
+            ' priority INTEGER NOT NULL, state TEXT NOT NULL, payload BLOB,'
+            ' worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, finished_at REAL)'
+        )
+        # Requests with dont_filter (other than start requests) have no
+        # fingerprint and are never deduplicated
+        self.db.execute('CREATE UNIQUE INDEX IF NOT EXISTS ix_requests_fingerprint ON requests (crawl, fingerprint)')
+        self.db.execute(
+            'CREATE INDEX IF NOT EXISTS ix_requests_next ON requests (crawl, domain, state, priority DESC, id)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS ix_requests_lease ON requests (crawl, state, lease_expires)')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS domains ('
+            ' crawl TEXT NOT NULL, domain TEXT NOT NULL, next_at REAL NOT NULL, PRIMARY KEY (crawl, domain))'
+        )
+
+        with self.transaction():
+            if self.has_pending():
+                return 'joined'
+            finished_at = self.db.execute(
+                'SELECT max(finished_at) FROM requests WHERE crawl = ?', (self.crawl,)
+            ).fetchone()[0]
+            if finished_at is not None and time.time() - finished_at < self.restart_delay:
+                return 'finished'
+            self.db.execute('DELETE FROM requests WHERE crawl = ?', (self.crawl,))
+            self.db.execute('DELETE FROM domains WHERE crawl = ?', (self.crawl,))
+            return 'started'
+
+    def close(self):
+        """Give this worker's unfinished leases back to the queue"""
+        with self.transaction():
+            released = self.db.execute(
+                'UPDATE requests SET state = ?, worker = NULL, lease_expires = NULL, attempts = attempts - 1 '
+                'WHERE crawl = ? AND state = ? AND worker = ?',
+                (PENDING, self.crawl, LEASED, self.worker)
+            ).rowcount
+        self.db.close()
+        return released
+
+    def transaction(self):
+        return _Transaction(self.db)
+
+    def add(self, fingerprint, domain, priority, payload):
+        """Queue a request; returns False if the crawl has already seen its fingerprint"""
+        with self.transaction():
+            added = self.db.execute(
+                'INSERT OR IGNORE INTO requests (crawl, fingerprint, domain, priority, state, payload) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (self.crawl, fingerprint, domain, priority, PENDING, payload)
+            ).rowcount
+            if added:
+                self.db.execute(
+                    'INSERT OR IGNORE INTO domains (crawl, domain, next_at) VALUES (?, ?, 0)', (self.crawl, domain)
+                )
+        return bool(added)
+
+    def lease(self, busy=()):
+        """
+        Lease the highest priority request of a domain whose turn it is,
+        skipping the busy domains. Returns (id, payload, expired), where
+        expired counts the leases of crashed workers just returned to the
+        queue, or (None, seconds until a domain's turn or None, expired).
+        """
+        now = time.time()
+        with self.transaction():
+            expired = self.expire(now)
+            domains = self.db.execute(
+                'SELECT domain, next_at FROM domains WHERE crawl = ? ORDER BY next_at', (self.crawl,)
+            ).fetchall()
+            best = None
+            wait = None
+            for domain, next_at in domains:
+                if domain in busy:
+                    continue
+                row = self.db.execute(
+                    'SELECT id, priority, payload FROM requests WHERE crawl = ? AND domain = ? AND state = ? '
+                    'ORDER BY priority DESC, id LIMIT 1',
+                    (self.crawl, domain, PENDING)
+                ).fetchone()
+                if row is None:
+                    continue
+                if next_at > now:
+                    wait = next_at - now if wait is None else min(wait, next_at - now)
+                elif best is None or row[1] > best[1][1]:
+                    best = (domain, row)
+            if best is None:
+                return None, wait, expired
+
+            domain, (request_id, _, payload) = best
+            self.db.execute(
+                'UPDATE requests SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?',
+                (LEASED, self.worker, now + self.lease_timeout, request_id)
+            )
+            self.db.execute(
+                'UPDATE domains SET next_at = ? WHERE crawl = ? AND domain = ?',
+                (now + self.domain_delay, self.crawl, domain)
+            )
+        return request_id, payload, expired
+
+    def expire(self, now):
+        """Requeue expired leases, or fail requests leased max_attempts times"""
+        self.db.execute(
+            'UPDATE requests SET state = ?, payload = NULL, finished_at = ? '
+            'WHERE crawl = ? AND state = ? AND lease_expires < ? AND attempts >= ?',
+            (FAILED, now, self.crawl, LEASED, now, self.max_attempts)
+        )
+        return self.db.execute(
+            'UPDATE requests SET state = ?, worker = NULL, lease_expires = NULL '
+            'WHERE crawl = ? AND state = ? AND lease_expires < ?',
+            (PENDING, self.crawl, LEASED, now)
+        ).rowcount
+
+    def done(self, request_ids):
+        # The rows stay, fingerprints and all, so the requests aren't queued again
+        with self.transaction():
+            self.db.executemany(
+                'UPDATE requests SET state = ?, payload = NULL, lease_expires = NULL, finished_at = ? '
+                'WHERE id = ? AND worker = ? AND state = ?',
+                [(DONE, time.time(), request_id, self.worker, LEASED) for request_id in request_ids]
+            )
+
+    def has_pending(self, other_workers=False):
+        """
+        True while requests are queued or leased, by any worker or with
+        other_workers by workers other than this one
+        """
+        if other_workers:
+            return self.db.execute(
+                'SELECT EXISTS (SELECT 1 FROM requests WHERE crawl = ? AND (state = ? OR state = ? AND worker != ?))',
+                (self.crawl, PENDING, LEASED, self.worker)
+            ).fetchone()[0] == 1
+        return self.db.execute(
+            'SELECT EXISTS (SELECT 1 FROM requests WHERE crawl = ? AND state IN (?, ?))',
+            (self.crawl, PENDING, LEASED)
+        ).fetchone()[0] == 1
+
+    def count(self, state=PENDING):
+        return self.db.execute(
+            'SELECT count(*) FROM requests WHERE crawl = ? AND state = ?', (self.crawl, state)
+        ).fetchone()[0]
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on errors; takes the write lock up front"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+class FrontierScheduler(Scheduler):
+    """
+    Scrapy's scheduler, or with FRONTIER_ENABLED a shared Frontier in
+    FRONTIER_PATH in place of its queues and dupefilter, so several worker
+    processes (`python src/main.py` started more than once with the same
+    spiders and queries) split one crawl between them.
+
+    A worker only leases requests its downloader can start right away, one
+    per domain slot with room, so no worker sits on requests others could be
+    fetching. A lease is marked done once the request has been handled, so a
+    worker dying mid-callback loses nothing, and other workers wait for the
+    requests its callback yields instead of finishing early. Handled means,
+    as told by public signals:
+
+    - its response went through the callback and the requests it yielded are
+      queued (request_handled, from FrontierMiddleware);
+    - its retry or redirect is queued as a request of its own;
+    - its download failed (request_left_downloader without
+      response_downloaded), and its errback is about to run;
+    - or the engine is idle apart from this worker's leases (spider_idle).
+
+    When every domain with queued requests is waiting for its turn, the
+    engine is woken when the first one's comes.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        scheduler = super().from_crawler(crawler)
+        settings = crawler.settings
+        scheduler.frontier = None
+        scheduler.wakeup = None
+        # Ids of the requests this worker leased and hasn't handled, of those
+        # downloaded, and of those handled but not yet marked done
+        scheduler.outstanding = set()
+        scheduler.downloaded = set()
+        scheduler.handled = []
+        if settings.getbool('FRONTIER_ENABLED', False):
+            scheduler.frontier = Frontier(
+                settings.get('FRONTIER_PATH'), None, f'{socket.gethostname()}:{os.getpid()}',
+                lease_timeout=settings.getfloat('FRONTIER_LEASE_TIMEOUT', 300.0),
+                domain_delay=settings.getfloat('FRONTIER_DOMAIN_DELAY', 1.0),
+                max_attempts=settings.getint('FRONTIER_MAX_ATTEMPTS', 3),
+                restart_delay=settings.getfloat('FRONTIER_RESTART_DELAY', 60.0),
+            )
+            crawler.signals.connect(scheduler.request_handled, signal=request_handled)
+            crawler.signals.connect(scheduler.response_downloaded, signal=signals.response_downloaded)
+            crawler.signals.connect(scheduler.request_left_downloader, signal=signals.request_left_downloader)
+            crawler.signals.connect(scheduler.spider_idle, signal=signals.spider_idle)
+        return scheduler
+
+    def open(self, spider):
+        if self.frontier is None:
+            return super().open(spider)
+        self.spider = spider
+        # Workers share a frontier when they run the same spider on the same queries
+        self.frontier.crawl = crawl_key(spider)
+        state = self.frontier.open()
+        if state == 'finished':
+            logger.info(
+                f"Crawl {self.frontier.crawl} in {self.frontier.path} has just finished; it starts over "
+                f"{self.frontier.restart_delay:g}s after its last request (FRONTIER_RESTART_DELAY)"
+            )
+        else:
+            logger.info(
+                f"{'Joining' if state == 'joined' else 'Starting'} crawl {self.frontier.crawl} in "
+                f"{self.frontier.path} as worker {self.frontier.worker}"
+            )
+        return self.df.open()
+
+    def close(self, reason):
+        if self.frontier is None:
+            return super().close(reason)
+        if self.wakeup is not None and self.wakeup.active():
+            self.wakeup.cancel()
+        self.settle()
+        released = self.frontier.close()
+        if released:
+            logger.info(f"Returned {released} leased requests to the frontier")
+        return self.df.close(reason)
+
+    def has_pending_requests(self):
+        if self.frontier is None:
+            return super().has_pending_requests()
+        self.settle()
+        # The engine only asks once it has nothing in progress, when this
+        # worker's leases are all handled; spider_idle then marks them done
+        return self.frontier.has_pending(other_workers=True)
+
+    def enqueue_request(self, request):
+        if self.frontier is None:
+            return super().enqueue_request(request)
+        meta = request.meta
+        if meta.get('retry_times') or meta.get('redirect_times'):
+            # A retry or redirect carries the meta of the request it replaces,
+            # which is handled once this one is queued
+            self.finish(meta.get('frontier_id'))
+        data = request.to_dict(spider=self.spider)
+        data['meta'] = {key: value for key, value in data['meta'].items() if key != 'frontier_id'}
+        payload = pickle.dumps(data, protocol=4)
+        if not self.frontier.add(self.fingerprint(request), self.slot_key(request), request.priority, payload):
+            self.stats.inc_value('frontier/duplicates')
+            self.df.log(request, self.spider)
+            return False
+        self.stats.inc_value('frontier/enqueued')
+        self.stats.inc_value('scheduler/enqueued')
+        return True
+
+    def next_request(self):
+        if self.frontier is None:
+            return super().next_request()
+        self.settle()
+        request_id, payload, expired = self.frontier.lease(self.busy_slots())
+        if expired:
+            self.stats.inc_value('frontier/expired_leases', expired)
+            logger.warning(f"Requeued {expired} requests whose lease expired (a worker stopped?)")
+        if request_id is None:
+            # payload is then the seconds until a domain's turn
+            self.wake_in(payload)
+            return None
+        request = request_from_dict(pickle.loads(payload), spider=self.spider)
+        request.meta['frontier_id'] = request_id
+        self.outstanding.add(request_id)
+        self.stats.inc_value('frontier/leased')
+        self.stats.inc_value('scheduler/dequeued')
+        return request
+
+    def __len__(self):
+        if self.frontier is None:
+            return super().__len__()
+        return self.frontier.count()
+
+    def fingerprint(self, request):
+        """
+        The request's fingerprint, or None for requests never deduplicated.
+        Every worker yields the start requests, so they are deduplicated even
+        with dont_filter; their retries and redirects are not.
+        """
+        meta = request.meta
+        if not request.dont_filter:
+            return self.crawler.request_fingerprinter.fingerprint(request).hex()
+        if meta.get('is_start_request') and not meta.get('retry_times') and not meta.get('redirect_times'):
+            return 'start:' + self.crawler.request_fingerprinter.fingerprint(request).hex()
+        return None
+
+    def finish(self, request_id):
+        """Note a leased request as handled; settle() marks it done"""
+        if request_id in self.outstanding:
+            self.outstanding.remove(request_id)
+            self.downloaded.discard(request_id)
+            self.handled.append(request_id)
+
+    def settle(self):
+        """Mark done the leases handled since the last call, in one transaction"""
+        if not self.handled:
+            return
+        self.frontier.done(self.handled)
+        self.stats.inc_value('frontier/done', len(self.handled))
+        self.handled = []
+
+    def request_handled(self, request):
+        self.finish(request.meta.get('frontier_id'))
+
+    def response_downloaded(self, response, request):
+        request_id = request.meta.get('frontier_id')
+        if request_id in self.outstanding:
+            self.downloaded.add(request_id)
+
+    def request_left_downloader(self, request):
+        request_id = request.meta.get('frontier_id')
+        if request_id in self.downloaded:
+            # The response is on its way to the callback
+            self.downloaded.remove(request_id)
+        else:
+            # The download failed: a retry is queued as a request of its own,
+            # or the errback runs next
+            self.finish(request_id)
+
+    def spider_idle(self, spider):
+        # Nothing is in progress, so every lease left has been handled
+        for request_id in list(self.outstanding):
+            self.finish(request_id)
+        self.settle()
+
+    def slot_key(self, request):
+        """The downloader slot a request goes to: its download_slot, or its host"""
+        return request.meta.get('download_slot') or urlparse_cached(request).hostname or ''
+
+    def busy_slots(self):
+        """Domains this worker can't start another request for yet"""
+        engine = self.crawler.engine
+        if engine is None:
+            return set()
+        return {key for key, slot in engine.downloader.slots.items() if len(slot.active) >= slot.concurrency}
+
+    def wake_in(self, seconds):
+        """Have the engine ask for a request again in seconds instead of at its next 5s heartbeat"""
+        from twisted.internet import reactor
+
+        if seconds is None or (self.wakeup is not None and self.wakeup.active()):
+            return
+        self.wakeup = reactor.callLater(max(seconds, 0.01), self.wake)
+
+    def wake(self):
+        # Scrapy has no public way to do this; without the engine's slot (it
+        # is internal and may change) the next heartbeat asks anyway
+        nextcall = getattr(getattr(self.crawler.engine, '_slot', None), 'nextcall', None)
+        if nextcall is not None:
+            nextcall.schedule()
+
+
+class FrontierMiddleware:
+    """
+    Spider middleware sending request_handled for each response once its
+    callback's output has been through the engine, or the callback failed.
+    Sits closest to the engine (lowest SPIDER_MIDDLEWARES order), so every
+    request the callback yields has been queued by then.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('FRONTIER_ENABLED', False):
+            raise NotConfigured
+        return cls(crawler)
+
+    def handled(self, response):
+        self.crawler.signals.send_catch_log(request_handled, request=response.request)
+
+    def process_spider_output(self, response, result, spider=None):
+        try:
+            yield from result
+        finally:
+            self.handled(response)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        try:
+            async for output in result:
+                yield output
+        finally:
+            self.handled(response)
+
+    def process_spider_exception(self, response, exception, spider=None):
+        self.handled(response)
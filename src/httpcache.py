@@ -0,0 +1,179 @@
+from scrapy.extensions.httpcache import DummyPolicy
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from time import time
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+import logging
+import os
+import sqlite3
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Callbacks whose requests are job detail pages; everything else is a listing
+DETAIL_CALLBACKS = {'parse_job_details', 'parse_api_details'}
+
+
+def page_type(request):
+    """Classify a request as 'listing' or 'detail' (request.meta['page_type'] wins)"""
+    if 'page_type' in request.meta:
+        return request.meta['page_type']
+    callback = getattr(request.callback, '__name__', None)
+    return 'detail' if callback in DETAIL_CALLBACKS else 'listing'
+
+
+class PageTypeCachePolicy(DummyPolicy):
+    """
+    Cache policy with separate TTLs for listing and detail pages.
+
+    Listing pages change as jobs are posted, so they expire quickly
+    (HTTPCACHE_LISTING_TTL); detail pages rarely change and are kept for
+    HTTPCACHE_DETAIL_TTL. A TTL of 0 never expires. Spiders set both in
+    custom_settings. Stale entries are refetched and replaced, never served.
+    """
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.ttls = {
+            'listing': settings.getint('HTTPCACHE_LISTING_TTL', 3600),
+            'detail': settings.getint('HTTPCACHE_DETAIL_TTL', 7 * 24 * 3600),
+        }
+        self.default_ttl = settings.getint('HTTPCACHE_EXPIRATION_SECS', 0)
+
+    def should_cache_response(self, response, request):
+        return super().should_cache_response(response, request) and response.status < 400
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        ttl = self.ttls.get(page_type(request), self.default_ttl)
+        stored_at = request.meta.get('cache_timestamp', 0)
+        return ttl <= 0 or time() - stored_at < ttl
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        # The cached copy was stale; the fresh download replaces it
+        return False
+
+
+class SqliteCacheStorage:
+    """
+    HTTP cache in a single SQLite file with zlib-compressed bodies.
+
+    All spiders share HTTPCACHE_DIR/httpcache.sqlite, keyed by spider name and
+    request fingerprint. Once the file holds more than HTTPCACHE_MAX_SIZE bytes
+    of entries, the least recently used ones are evicted down to 90% of it.
+    Expiry is left to the cache policy (see PageTypeCachePolicy).
+    """
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings['HTTPCACHE_DIR'], createdir=True)
+        self.path = os.path.join(self.cachedir, 'httpcache.sqlite')
+        self.max_size = settings.getint('HTTPCACHE_MAX_SIZE', 256 * 1024 * 1024)
+        self.compression_level = settings.getint('HTTPCACHE_COMPRESSION_LEVEL', 6)
+        self.db = None
+        self.stats = None
+        self.total_size = 0
+
+    def open_spider(self, spider):
+        self.db = sqlite3.connect(self.path, isolation_level=None)
+        # auto_vacuum only takes effect if set before the first table is created
+        self.db.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('PRAGMA busy_timeout=5000')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' spider TEXT NOT NULL, fingerprint TEXT NOT NULL,'
+            ' stored_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL,'
+            ' url TEXT NOT NULL, status INTEGER NOT NULL, headers BLOB, body BLOB,'
+            ' PRIMARY KEY (spider, fingerprint))'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)')
+
+        self.fingerprinter = spider.crawler.request_fingerprinter
+        self.stats = spider.crawler.stats
+        self.total_size = self._stored_size()
+        logger.debug(f"Using SQLite cache storage in {self.path} ({self.total_size / 1e6:.1f} MB)")
+
+    def close_spider(self, spider):
+        self.stats.set_value('httpcache/size_bytes', self._stored_size())
+        self.db.close()
+
+    def _key(self, spider, request):
+        return spider.name, self.fingerprinter.fingerprint(request).hex()
+
+    def _stored_size(self):
+        return self.db.execute('SELECT coalesce(sum(size), 0) FROM responses').fetchone()[0]
+
+    def retrieve_response(self, spider, request):
+        key = self._key(spider, request)
+        row = self.db.execute(
+            'SELECT stored_at, url, status, headers, body FROM responses '
+            'WHERE spider = ? AND fingerprint = ?', key
+        ).fetchone()
+        if row is None:
+            return None
+
+        stored_at, url, status, raw_headers, compressed = row
+        self.db.execute(
+            'UPDATE responses SET accessed_at = ? WHERE spider = ? AND fingerprint = ?',
+            (time(), *key)
+        )
+        request.meta['cache_timestamp'] = stored_at
+
+        headers = Headers(headers_raw_to_dict(raw_headers) if raw_headers else {})
+        body = zlib.decompress(compressed)
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request, response):
+        key = self._key(spider, request)
+        raw_headers = headers_dict_to_raw(response.headers)
+        compressed = zlib.compress(response.body, self.compression_level)
+        size = len(compressed) + len(raw_headers) + len(response.url)
+
+        previous = self.db.execute(
+            'SELECT size FROM responses WHERE spider = ? AND fingerprint = ?', key
+        ).fetchone()
+        now = time()
+        self.db.execute(
+            'INSERT OR REPLACE INTO responses '
+            '(spider, fingerprint, stored_at, accessed_at, size, url, status, headers, body) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (*key, now, now, size, response.url, response.status, raw_headers, compressed)
+        )
+        self.total_size += size - (previous[0] if previous else 0)
+        self.stats.inc_value('httpcache/stored_bytes', size)
+        self.stats.inc_value('httpcache/uncompressed_bytes', len(response.body))
+
+        if self.total_size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache is under 90% of its cap"""
+        # Other spiders may share the file, so start from the real total
+        self.total_size = self._stored_size()
+        target = self.max_size * 0.9
+        if self.total_size <= target:
+            return
+
+        evicted = evicted_bytes = 0
+        rows = self.db.execute(
+            'SELECT spider, fingerprint, size FROM responses ORDER BY accessed_at'
+        ).fetchall()
+        self.db.execute('BEGIN')
+        for spider_name, fingerprint, size in rows:
+            if self.total_size <= target:
+                break
+            self.db.execute(
+                'DELETE FROM responses WHERE spider = ? AND fingerprint = ?',
+                (spider_name, fingerprint)
+            )
+            self.total_size -= size
+            evicted += 1
+            evicted_bytes += size
+        self.db.execute('COMMIT')
+        self.db.execute('PRAGMA incremental_vacuum')
+
+        self.stats.inc_value('httpcache/evicted', evicted)
+        self.stats.inc_value('httpcache/evicted_bytes', evicted_bytes)
+        logger.info(f"Evicted {evicted} cached responses ({evicted_bytes / 1e6:.1f} MB)")
@@ -1,17 +1,31 @@
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
-from src.utils.database import init_db, SessionLocal, engine
+from src.api import JobsAPI, serve_api
+from src.daemon import CrawlDaemon, load_daemon_config
+from src.export import EXPORT_FORMATS, export_jobs
+from src.resume import finish_job_dir, job_dir, prepare_job_dir
+from src.utils.database import create_readonly_engine, init_db, normalize_salaries, SessionLocal, engine
 from src.models.job import Job, Base
+from sqlalchemy import case, exists, func, or_, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import OperationalError
 from src.spiders.linkedin import LinkedinSpider
 from src.spiders.jobinja import JobinjaSpider
 from src.spiders.jobvision import JobvisionSpider
-from src.utils.telegram_bot import JobTelegramBot
+from src.utils.telegram_bot import JobTelegramBot, TelegramDeliveryWorker
+from src.utils.dedup import cluster_jobs
+from src.utils.queries import expand_queries, load_queries
+from src.utils.salary import reference_currency, to_reference
+from src.utils.search import jobs_fts, search_match, search_rank, search_snippet
+from src.utils.tech_stack import load_taxonomy
+from twisted.internet.defer import Deferred
 import logging
 import argparse
 from datetime import datetime, timedelta
 import json
 import asyncio
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -24,6 +38,26 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+SPIDERS = {
+    'linkedin': LinkedinSpider,
+    'jobinja': JobinjaSpider,
+    'jobvision': JobvisionSpider,
+}
+
+def resolve_spiders(spider_arg):
+    """Map the --spider argument ('all' or a comma-separated list) to spider classes"""
+    if spider_arg.strip().lower() == 'all':
+        return list(SPIDERS.values())
+    
+    spider_classes = []
+    for name in spider_arg.split(','):
+        name = name.strip().lower()
+        if name not in SPIDERS:
+            raise ValueError(f"Spider '{name}' not found")
+        if SPIDERS[name] not in spider_classes:
+            spider_classes.append(SPIDERS[name])
+    return spider_classes
+
 def format_salary(job):
     if not job.min_salary and not job.max_salary:
         return "Not specified"
@@ -38,6 +72,12 @@ def format_salary(job):
     if job.salary_period:
         salary_str += f" per {job.salary_period}"
     
+    # What the filters compare against, when it isn't the same figure
+    reference = reference_currency()
+    if job.monthly_salary_min is not None and (job.currency != reference or job.salary_period != 'monthly'):
+        low, high = f"{job.monthly_salary_min:,.0f}", f"{job.monthly_salary_max:,.0f}"
+        salary_str += f" (~{reference} {low if low == high else f'{low} - {high}'} per month)"
+    
     return salary_str
 
 def format_tech_stack(tech_stack):
@@ -51,74 +91,286 @@ def format_tech_stack(tech_stack):
     
     return "\n".join(result) if result else "Not specified"
 
-def display_results(args):
+# Columns written per job in --format jsonl (the description is left out)
+JSONL_FIELDS = [
+    'id', 'title', 'company', 'location', 'url', 'source', 'job_type', 'experience_level',
+    'work_type', 'tech_stack', 'min_salary', 'max_salary', 'currency', 'salary_period',
+    'monthly_salary_min', 'monthly_salary_max',
+    'visa_sponsorship', 'relocation_support', 'benefits', 'company_size', 'industry',
+    'posted_date',
+]
+
+def salary_bounds(args):
+    """--min-salary and --max-salary as monthly amounts in the reference currency"""
+    currency = getattr(args, 'salary_currency', None)
+    bounds = [getattr(args, 'min_salary', None), getattr(args, 'max_salary', None)]
+    if currency:
+        bounds = [to_reference(bound, currency) if bound is not None else None for bound in bounds]
+    return bounds
+
+def source_names(source_arg):
+    """The stored source values for a --source list of spider names"""
+    return [spider_class.source for spider_class in resolve_spiders(source_arg)]
+
+def tech_filter(tech):
+    """Jobs whose tech_stack lists tech under any category"""
+    tech = tech.strip().lower()
+    if engine.dialect.name == 'postgresql':
+        # One containment test per category, each served by the GIN index on tech_stack
+        stack = type_coerce(Job.tech_stack, JSONB)
+        return or_(*(stack.contains({category: [tech]}) for category in load_taxonomy()))
+    tree = func.json_tree(Job.tech_stack).table_valued('atom')
+    return exists(select(1).select_from(tree).where(tree.c.atom == tech))
+
+def job_filters(args):
+    """SQL conditions for the --visa-only, --relocation-only, --days, source, tech and salary options"""
+    filters = []
+    if getattr(args, 'source', None):
+        filters.append(Job.source.in_(source_names(args.source)))
+    for tech in getattr(args, 'tech', None) or []:
+        filters.append(tech_filter(tech))
+    if args.visa_only:
+        filters.append(Job.visa_sponsorship == True)
+    if args.relocation_only:
+        filters.append(Job.relocation_support == True)
+    if args.days:
+        cutoff_date = datetime.now() - timedelta(days=args.days)
+        filters.append(Job.posted_date >= cutoff_date)
+    # A job matches if its range overlaps the requested one; each bound is a
+    # range scan on one indexed column
+    min_salary, max_salary = salary_bounds(args)
+    if min_salary is not None:
+        filters.append(Job.monthly_salary_max >= min_salary)
+    if max_salary is not None:
+        filters.append(Job.monthly_salary_min <= max_salary)
+    return filters
+
+def results_query(db, args):
+    """Build the filtered jobs query behind display_results, newest first"""
+    return (
+        db.query(Job)
+        .filter(*job_filters(args))
+        .order_by(Job.posted_date.desc(), Job.id.desc())
+    )
+
+def search_query(db, args, highlight=('[', ']')):
+    """
+    Full-text search for args.search combined with the other filters, best
+    bm25 match first, yielding (job, snippet) rows
+    """
+    return (
+        db.query(Job, search_snippet(*highlight))
+        .join(jobs_fts, jobs_fts.c.rowid == Job.id)
+        .filter(search_match(args.search), *job_filters(args))
+        .order_by(search_rank())
+    )
+
+def results_stats(db, args):
+    """Count matching jobs and their visa/relocation/remote subsets in one query"""
+    filters = job_filters(args)
+    if getattr(args, 'search', None):
+        filters.append(Job.id.in_(select(jobs_fts.c.rowid).where(search_match(args.search))))
+    row = db.query(
+        func.count(Job.id),
+        func.sum(case((Job.visa_sponsorship == True, 1), else_=0)),
+        func.sum(case((Job.relocation_support == True, 1), else_=0)),
+        func.sum(case((Job.work_type == 'fully_remote', 1), else_=0)),
+    ).filter(*filters).one()
+    total, visa, relocation, remote = (value or 0 for value in row)
+    return {'total': total, 'visa': visa, 'relocation': relocation, 'remote': remote}
+
+def print_job(job, snippet=None):
+    print(f"Title: {job.title}")
+    if snippet:
+        print(f"Match: {snippet}")
+    print(f"Company: {job.company}")
+    print(f"Location: {job.location}")
+    print(f"Work Type: {job.work_type.replace('_', ' ').title() if job.work_type else 'Not specified'}")
+    print(f"Industry: {job.industry or 'Not specified'}")
+    print(f"Company Size: {job.company_size or 'Not specified'}")
+    print(f"\nCompensation: {format_salary(job)}")
+    print(f"\nTechnology Stack:\n{format_tech_stack(job.tech_stack)}")
+    print(f"\nVisa Sponsorship: {'Yes' if job.visa_sponsorship else 'Not mentioned'}")
+    print(f"Relocation Support: {'Yes' if job.relocation_support else 'Not mentioned'}")
+    
+    if job.benefits:
+        print(f"\nBenefits: {job.benefits}")
+    
+    if job.posted_date:
+        print(f"\nPosted: {job.posted_date.strftime('%Y-%m-%d')}")
+        
+    print(f"\nURL: {job.url}")
+    print("=" * 80 + "\n")
+
+def job_to_json(job, snippet=None):
+    row = {field: getattr(job, field) for field in JSONL_FIELDS}
+    if row['posted_date']:
+        row['posted_date'] = row['posted_date'].isoformat()
+    if snippet:
+        row['snippet'] = snippet
+    return json.dumps(row, ensure_ascii=False)
+
+def display_results(args, batch_size=500):
+    """
+    Print the matching jobs newest first (best match first with --search),
+    streaming them from the database in batches so memory stays flat however
+    many rows match
+    """
     db = SessionLocal()
     try:
-        query = db.query(Job)
+        if args.search:
+            # Bold the matched terms on a terminal, bracket them otherwise
+            tty = args.format == 'table' and sys.stdout.isatty()
+            query = search_query(db, args, ('\033[1m', '\033[0m') if tty else ('[', ']'))
+        else:
+            query = results_query(db, args)
+        if args.offset:
+            query = query.offset(args.offset)
+        if args.limit:
+            query = query.limit(args.limit)
         
-        if args.visa_only:
-            query = query.filter(Job.visa_sponsorship == True)
-        if args.relocation_only:
-            query = query.filter(Job.relocation_support == True)
-        if args.days:
-            cutoff_date = datetime.now() - timedelta(days=args.days)
-            query = query.filter(Job.posted_date >= cutoff_date)
-            
-        jobs = query.all()
+        rows = query.yield_per(batch_size)
+        if not args.search:
+            rows = ((job, None) for job in rows)
+        
+        if args.format == 'jsonl':
+            shown = 0
+            for job, snippet in rows:
+                print(job_to_json(job, snippet))
+                shown += 1
+            stats = results_stats(db, args)
+            logger.info(f"Wrote {shown} of {stats['total']} matching jobs as JSON lines")
+            return
         
         print("\n=== Job Search Results ===\n")
+        if args.search:
+            print(f"Matching: {args.search}\n")
         if args.days:
             print(f"Showing jobs posted in the last {args.days} days\n")
-            
-        for job in jobs:
-            print(f"Title: {job.title}")
-            print(f"Company: {job.company}")
-            print(f"Location: {job.location}")
-            print(f"Work Type: {job.work_type.replace('_', ' ').title() if job.work_type else 'Not specified'}")
-            print(f"Industry: {job.industry or 'Not specified'}")
-            print(f"Company Size: {job.company_size or 'Not specified'}")
-            print(f"\nCompensation: {format_salary(job)}")
-            print(f"\nTechnology Stack:\n{format_tech_stack(job.tech_stack)}")
-            print(f"\nVisa Sponsorship: {'Yes' if job.visa_sponsorship else 'Not mentioned'}")
-            print(f"Relocation Support: {'Yes' if job.relocation_support else 'Not mentioned'}")
-            
-            if job.benefits:
-                print(f"\nBenefits: {job.benefits}")
-            
-            if job.posted_date:
-                print(f"\nPosted: {job.posted_date.strftime('%Y-%m-%d')}")
-                
-            print(f"\nURL: {job.url}")
-            print("=" * 80 + "\n")
-            
-        print(f"Total jobs found: {len(jobs)}")
+        if args.min_salary is not None or args.max_salary is not None:
+            bounds = ' - '.join('...' if bound is None else f"{bound:,.0f}" for bound in (args.min_salary, args.max_salary))
+            print(f"Paying {args.salary_currency or reference_currency()} {bounds} per month\n")
         
-        # Print some analytics
-        visa_count = sum(1 for job in jobs if job.visa_sponsorship)
-        relocation_count = sum(1 for job in jobs if job.relocation_support)
-        remote_count = sum(1 for job in jobs if job.work_type == 'fully_remote')
+        shown = 0
+        for job, snippet in rows:
+            print_job(job, snippet)
+            shown += 1
+        
+        stats = results_stats(db, args)
+        if args.limit or args.offset:
+            print(f"Showing {shown} jobs from offset {args.offset}")
+        print(f"Total jobs found: {stats['total']}")
         
+        # Print some analytics
         print("\nQuick Stats:")
-        print(f"- Jobs with visa sponsorship: {visa_count}")
-        print(f"- Jobs with relocation support: {relocation_count}")
-        print(f"- Fully remote positions: {remote_count}")
+        print(f"- Jobs with visa sponsorship: {stats['visa']}")
+        print(f"- Jobs with relocation support: {stats['relocation']}")
+        print(f"- Fully remote positions: {stats['remote']}")
         
+    except OperationalError as e:
+        # Malformed FTS5 queries (unbalanced quotes, a bare operator) end up here
+        if not args.search:
+            raise
+        logger.error(f"Invalid search query {args.search!r}: {e.orig}")
     finally:
         db.close()
 
+def display_crawl_summary(crawlers):
+    print("\n=== Crawl Summary ===\n")
+    
+    totals = {'items': 0, 'inserted': 0, 'updated': 0, 'duplicates': 0, 'rejected': 0, 'skipped': 0, 'shared': 0}
+    longest = 0
+    for crawler in crawlers:
+        stats = crawler.stats.get_stats()
+        row = {
+            'items': stats.get('item_scraped_count', 0),
+            'inserted': stats.get('jobs/inserted', 0),
+            'updated': stats.get('jobs/updated', 0),
+            'duplicates': stats.get('jobs/duplicates', 0),
+            'rejected': stats.get('jobs/rejected', 0),
+            'skipped': stats.get('seen_urls/skipped', 0),
+            'shared': stats.get('queries/shared_jobs', 0),
+        }
+        elapsed = stats.get('elapsed_time_seconds', 0)
+        longest = max(longest, elapsed)
+        for key, value in row.items():
+            totals[key] += value
+        
+        print(f"{crawler.spidercls.name}: {row['items']} jobs scraped, {row['inserted']} inserted, "
+              f"{row['updated']} updated, {row['duplicates']} duplicates, {row['rejected']} rejected, "
+              f"{row['skipped']} known jobs skipped, {row['shared']} shared between queries ({elapsed:.1f}s, "
+              f"finish reason: {stats.get('finish_reason', 'unknown')})")
+    
+    if len(crawlers) > 1:
+        print(f"\nAll spiders: {totals['items']} jobs scraped, {totals['inserted']} inserted, "
+              f"{totals['updated']} updated, {totals['duplicates']} duplicates, {totals['rejected']} rejected, "
+              f"{totals['skipped']} known jobs skipped, {totals['shared']} shared between queries "
+              f"({longest:.1f}s wall clock)")
+
+def display_duplicate_clusters(args):
+    """Cluster the stored jobs into near-duplicates and report how many there are"""
+    threshold = get_project_settings().getfloat('JOB_DEDUP_THRESHOLD', 0.8)
+    clusters, report = cluster_jobs(engine, threshold)
+    
+    print("\n=== Duplicate Clusters ===\n")
+    db = SessionLocal()
+    try:
+        for ids in clusters[:args.limit or 10]:
+            jobs = db.query(Job).filter(Job.id.in_(ids)).all()
+            print(f"{len(ids)} postings:")
+            for job in jobs:
+                print(f"  [{job.id}] {job.title} - {job.company} ({job.source}) {job.url}")
+            print()
+    finally:
+        db.close()
+    
+    jobs = report['jobs']
+    elapsed = report['sign_seconds'] + report['cluster_seconds']
+    print(f"Jobs: {jobs}, in {len(clusters)} clusters of near-duplicates "
+          f"(similarity >= {threshold:.2f})")
+    print(f"Duplicates: {report['duplicates']} "
+          f"(dedup ratio {report['duplicates'] / jobs if jobs else 0:.1%})")
+    print(f"Signed {report['signed']} jobs in {report['sign_seconds']:.1f}s, compared "
+          f"{report['pairs_compared']} candidate pairs in {report['cluster_seconds']:.1f}s "
+          f"({jobs / elapsed if elapsed else 0:,.0f} jobs/sec overall)")
+
+def run_export(args):
+    """Stream the jobs table to a file; the report goes to the log so '-o -' stays clean"""
+    report = export_jobs(
+        engine, args.output, fmt=args.export_format, watermark=args.watermark,
+        chunk_size=args.chunk_size, with_descriptions=args.with_descriptions,
+    )
+    since = f"changed since {report['since']}" if report['since'] else 'all'
+    until = f" up to {report['until']}" if report['until'] else ''
+    logger.info(f"Exported {report['rows']} jobs ({since}{until}) to {args.output} as {args.export_format} "
+                f"in {report['seconds']:.1f}s ({report['rows_per_second']:,.0f} rows/sec, "
+                f"peak memory {report['peak_memory_mb']:.0f} MB)")
+
 def get_input_with_default(prompt, default):
     user_input = input(f"{prompt} (default: {default}): ").strip()
     return user_input if user_input else default
 
-async def main():
+async def stop_telegram(telegram_bot, delivery_worker, delivery_task, drain_timeout):
+    """Deliver what is still queued, then stop the Telegram bot"""
+    delivery_worker.stop()
+    await delivery_task
+    await delivery_worker.drain(drain_timeout)
+    await telegram_bot.stop_bot()
+
+def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Job Scraper')
     parser.add_argument('--spider', type=str, default='linkedin',
-                      help='Spider to run (default: linkedin, options: linkedin, jobinja, jobvision)')
-    parser.add_argument('--keywords', type=str,
-                      help='Job keywords to search for')
-    parser.add_argument('--location', type=str,
-                      help='Job location to search in')
+                      help='Spider(s) to run: linkedin, jobinja, jobvision, a comma-separated list, '
+                           'or "all" to crawl every site concurrently (default: linkedin)')
+    parser.add_argument('--keywords', type=str, action='append',
+                      help='Job keywords to search for; repeat to search for several, '
+                           'every one in every --location')
+    parser.add_argument('--location', type=str, action='append',
+                      help='Job location to search in; can be repeated')
+    parser.add_argument('--queries', type=str, metavar='FILE',
+                      help='Crawl every keywords/location pair in a JSON file (see queries.example.json) '
+                           'in one run, fetching each job once and tagging it with every query that found it')
     parser.add_argument('--visa-only', action='store_true',
                       help='Only show jobs with visa sponsorship')
     parser.add_argument('--relocation-only', action='store_true',
@@ -127,34 +379,132 @@ async def main():
                       help='Reset the database before scraping')
     parser.add_argument('--days', type=int,
                       help='Only show jobs posted within the last N days')
+    parser.add_argument('--source', type=str,
+                      help='Only show jobs from these sites, e.g. jobinja or linkedin,jobvision')
+    parser.add_argument('--tech', type=str, action='append',
+                      help='Only show jobs mentioning this technology, e.g. python; repeat to require several')
+    parser.add_argument('--min-salary', type=float,
+                      help='Only show jobs paying at least this much per month, in the reference currency of '
+                           'src/utils/exchange_rates.json or --salary-currency (jobs without a salary are left out)')
+    parser.add_argument('--max-salary', type=float,
+                      help='Only show jobs whose pay starts at or below this much per month')
+    parser.add_argument('--salary-currency', type=str,
+                      help='Currency of --min-salary/--max-salary, e.g. EUR or IRT (toman); converted with '
+                           'the exchange rate table')
+    parser.add_argument('--normalize-salaries', action='store_true',
+                      help='Recompute the monthly salaries used by the salary filters, e.g. after editing '
+                           'src/utils/exchange_rates.json, instead of crawling')
+    parser.add_argument('--search', type=str,
+                      help='Search stored jobs instead of crawling, e.g. "react AND remote" '
+                           '(FTS5 syntax, ranked by relevance; combines with the other filters)')
+    parser.add_argument('--cluster-duplicates', action='store_true',
+                      help='Group the stored jobs into near-duplicate clusters and report the '
+                           'dedup ratio instead of crawling (signs jobs stored before deduplication)')
+    parser.add_argument('--limit', type=int,
+                      help='Show at most N jobs (newest first)')
+    parser.add_argument('--offset', type=int, default=0,
+                      help='Skip the first N matching jobs, for paging with --limit')
+    parser.add_argument('--format', choices=['table', 'jsonl'], default='table',
+                      help='Print results as a readable table or as one JSON object per line')
+    parser.add_argument('--resume', action='store_true',
+                      help='Continue the interrupted crawl of the same spiders and queries where it '
+                           'stopped instead of starting over')
+    parser.add_argument('--frontier', type=str, metavar='FILE',
+                      help='Share the crawl with every other process started with the same FILE, spiders '
+                           'and queries (see FRONTIER_* in settings.py)')
+    parser.add_argument('--daemon', type=str, metavar='CONFIG',
+                      help='Keep running and crawl the queries in a JSON config file on a schedule '
+                           '(see daemon.example.json); --spider/--keywords/--location/--queries are ignored')
     parser.add_argument('--no-telegram', action='store_true',
                       help='Disable Telegram notifications')
+    parser.add_argument('--telegram-digest', type=int, default=1,
+                      help='Coalesce up to N new jobs into one Telegram message (default: 1)')
+    parser.add_argument('--telegram-drain-timeout', type=float, default=60,
+                      help='Seconds to keep delivering queued notifications after the crawl '
+                           '(undelivered ones stay queued for the next run, default: 60)')
+    
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    export_parser = subparsers.add_parser('export', help='Stream the stored jobs to a JSONL, CSV or Parquet file')
+    export_parser.add_argument('--format', dest='export_format', choices=EXPORT_FORMATS, default='jsonl',
+                      help='Output format (default: jsonl; parquet needs pyarrow)')
+    export_parser.add_argument('-o', '--output', type=str, required=True,
+                      help='File to write, or - for stdout (not for parquet)')
+    export_parser.add_argument('--watermark', type=str, metavar='FILE',
+                      help='Only export jobs updated since the export that last wrote FILE, then advance it '
+                           '(a missing file exports everything)')
+    export_parser.add_argument('--chunk-size', type=int, default=1000,
+                      help='Rows fetched and written at a time (default: 1000)')
+    export_parser.add_argument('--with-descriptions', action='store_true',
+                      help='Include the job descriptions')
+    serve_parser = subparsers.add_parser('serve', help='Serve the stored jobs over a read-only HTTP API')
+    serve_parser.add_argument('--host', type=str, default='127.0.0.1',
+                      help='Address to listen on (default: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=8080,
+                      help='Port to listen on (default: 8080)')
+    serve_parser.add_argument('--cache-ttl', type=float, default=10,
+                      help='Seconds to cache each response; 0 disables the cache (default: 10)')
+    serve_parser.add_argument('--cache-size', type=int, default=1024,
+                      help='Responses kept in the cache (default: 1024)')
+    serve_parser.add_argument('--workers', type=int, default=8,
+                      help='Threads running database queries (default: 8)')
     
     args = parser.parse_args()
+    try:
+        salary_bounds(args)
+        if args.source:
+            source_names(args.source)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.search and engine.dialect.name != 'sqlite':
+        parser.error("--search needs SQLite's full-text index and isn't available on PostgreSQL")
     
-    # Initialize Telegram bot if enabled
-    telegram_bot = None
-    if not args.no_telegram and os.getenv('TELEGRAM_BOT_TOKEN'):
+    # Exports, the API, search and duplicate reports only query what is already stored
+    if args.command == 'export':
+        init_db()
         try:
-            telegram_bot = JobTelegramBot()
-            await telegram_bot.start_bot()
-            logger.info("Telegram bot started successfully")
-        except Exception as e:
-            logger.error(f"Failed to start Telegram bot: {e}")
-            telegram_bot = None
+            run_export(args)
+        except (ValueError, RuntimeError) as e:
+            parser.error(str(e))
+        return
+    if args.command == 'serve':
+        # Create or migrate the schema once; the API itself only reads
+        init_db()
+        api = JobsAPI(
+            create_readonly_engine(pool_size=args.workers), job_filters, job_to_json,
+            cache_ttl=args.cache_ttl, cache_size=args.cache_size, workers=args.workers,
+        )
+        serve_api(api, args.host, args.port)
+        return
+    if args.search:
+        init_db()
+        display_results(args)
+        return
+    if args.cluster_duplicates:
+        init_db()
+        display_duplicate_clusters(args)
+        return
+    if args.normalize_salaries:
+        init_db()
+        logger.info(f"Normalized the salaries of {normalize_salaries(engine)} jobs to monthly {reference_currency()}")
+        return
+    
+    # Scrapy's asyncio reactor runs on the current event loop, so the Telegram
+    # bot and the crawl share one loop instead of nesting asyncio.run()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
     
     # Interactively ask for position and location if not provided
-    if not args.keywords:
-        args.keywords = get_input_with_default(
+    if not args.daemon and not args.queries and not args.keywords:
+        args.keywords = [get_input_with_default(
             "Enter job position",
             "senior frontend developer"
-        )
+        )]
     
-    if not args.location:
-        args.location = get_input_with_default(
+    if not args.daemon and not args.queries and not args.location:
+        args.location = [get_input_with_default(
             "Enter location",
             "United States"
-        )
+        )]
     
     # Reset database if requested
     if args.reset_db:
@@ -165,49 +515,105 @@ async def main():
     logger.info("Initializing database...")
     init_db()
     
-    # Get Scrapy settings
+    # Initialize Telegram bot if enabled (it keeps its subscribers in the database)
+    telegram_bot = None
+    if not args.no_telegram and os.getenv('TELEGRAM_BOT_TOKEN'):
+        try:
+            telegram_bot = JobTelegramBot()
+            loop.run_until_complete(telegram_bot.start_bot())
+            logger.info("Telegram bot started successfully")
+        except Exception as e:
+            logger.error(f"Failed to start Telegram bot: {e}")
+            telegram_bot = None
+    
+    # New jobs are queued in the outbox by the storage pipeline and delivered
+    # by a single rate-limited worker running on the shared event loop
+    delivery_worker = None
+    delivery_task = None
+    if telegram_bot:
+        delivery_worker = TelegramDeliveryWorker(
+            telegram_bot.application.bot,
+            digest_size=args.telegram_digest
+        )
+        delivery_task = loop.create_task(delivery_worker.run())
+    
+    try:
+        if args.daemon:
+            crawls, status_file = load_daemon_config(args.daemon, resolve_spiders)
+        else:
+            spider_classes = resolve_spiders(args.spider)
+            queries = load_queries(args.queries) if args.queries else []
+            if args.keywords or args.location:
+                queries = list(dict.fromkeys(queries + expand_queries(args.keywords, args.location)))
+    except (OSError, ValueError) as e:
+        logger.error(str(e))
+        return
+    
+    # Politeness comes from per-domain limits (settings.py and each spider's
+    # custom_settings), so several sites can be crawled at the same time
     settings = get_project_settings()
     settings.update({
-        'CONCURRENT_REQUESTS': 1,
-        'DOWNLOAD_DELAY': 2,
-        'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'TELEGRAM_NOTIFICATIONS_ENABLED': telegram_bot is not None,
     })
+    if args.frontier:
+        settings.update({'FRONTIER_ENABLED': True, 'FRONTIER_PATH': args.frontier})
+    
+    if args.daemon:
+        # One reactor for the life of the process; the Telegram bot and its
+        # delivery worker keep running between crawls
+        def on_shutdown():
+            if telegram_bot:
+                return Deferred.fromFuture(loop.create_task(
+                    stop_telegram(telegram_bot, delivery_worker, delivery_task, args.telegram_drain_timeout)
+                ))
+        
+        CrawlDaemon(crawls, settings, status_file).run(on_shutdown)
+        return
     
     # Initialize crawler process
     process = CrawlerProcess(settings)
     
-    # Add spider based on argument
-    spider_class = None
-    if args.spider.lower() == 'linkedin':
-        spider_class = LinkedinSpider
-    elif args.spider.lower() == 'jobinja':
-        spider_class = JobinjaSpider
-    elif args.spider.lower() == 'jobvision':
-        spider_class = JobvisionSpider
-    else:
-        logger.error(f"Spider '{args.spider}' not found")
-        return
-
-    # Create spider instance with telegram bot
-    spider = spider_class(
-        keywords=args.keywords,
-        location=args.location
-    )
-    if telegram_bot:
-        spider.telegram_bot = telegram_bot
-
-    process.crawl(spider)
+    spider_kwargs = {
+        'queries': queries,
+    }
+    
+    # Each spider keeps its pending requests, seen requests and state in its
+    # own job directory so an interrupted crawl can be continued; with the
+    # shared frontier the queue lives there instead, and workers would delete
+    # each other's job directories
+    state_dir = settings.get('CRAWL_STATE_DIR') if not settings.getbool('FRONTIER_ENABLED') else None
+    crawlers = []
+    job_dirs = {}
+    for spider_class in spider_classes:
+        crawler = process.create_crawler(spider_class)
+        if state_dir:
+            path = job_dir(state_dir, spider_class.name, queries)
+            if prepare_job_dir(path, spider_class.name, queries, args.resume):
+                logger.info(f"Resuming the interrupted {spider_class.name} crawl from {path}")
+            crawler.settings.set('JOBDIR', path, priority='cmdline')
+            job_dirs[crawler] = path
+        process.crawl(crawler, **spider_kwargs)
+        crawlers.append(crawler)
     
-    logger.info(f"Starting {args.spider} spider...")
-    logger.info(f"Searching for: {args.keywords} in {args.location}")
+    logger.info(f"Starting spiders: {', '.join(c.name for c in spider_classes)}")
+    logger.info(f"Searching for {len(queries)} queries: "
+                + ', '.join(f"{query.keywords or 'default'} in {query.location or 'default'}" for query in queries))
     process.start()
     
+    for crawler, path in job_dirs.items():
+        finish_job_dir(path, crawler)
+    
+    display_crawl_summary(crawlers)
+    
     # Display results
     display_results(args)
 
-    # Stop the Telegram bot
+    # Deliver what is still queued, then stop the Telegram bot
     if telegram_bot:
-        await telegram_bot.stop_bot()
+        loop.run_until_complete(
+            stop_telegram(telegram_bot, delivery_worker, delivery_task, args.telegram_drain_timeout)
+        )
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
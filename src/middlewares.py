@@ -0,0 +1,123 @@
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveThrottleMiddleware:
+    """
+    Per-domain throttle driven by observed latency and status codes.
+
+    Healthy responses pull a domain's delay towards latency / target concurrency
+    and slowly open up its concurrency; 429, 403, 5xx and download errors at
+    least double the delay (never below DOWNLOAD_DELAY or Retry-After) and drop
+    concurrency back to one. Bounds and target are read from
+    the ADAPTIVE_THROTTLE_* settings, which spiders override in custom_settings.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('ADAPTIVE_THROTTLE_ENABLED', True):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.start_delay = settings.getfloat('DOWNLOAD_DELAY')
+        self.min_delay = settings.getfloat('ADAPTIVE_THROTTLE_MIN_DELAY', 0.5)
+        self.max_delay = settings.getfloat('ADAPTIVE_THROTTLE_MAX_DELAY', 60.0)
+        self.target_concurrency = settings.getint('ADAPTIVE_THROTTLE_TARGET_CONCURRENCY', 2)
+        self.backoff_codes = {int(code) for code in settings.getlist('ADAPTIVE_THROTTLE_BACKOFF_CODES', [429, 403])}
+        self.smoothing = settings.getfloat('ADAPTIVE_THROTTLE_SMOOTHING', 0.3)
+        self.healthy_streak = settings.getint('ADAPTIVE_THROTTLE_HEALTHY_STREAK', 10)
+        self.domains = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def process_response(self, request, response, spider=None):
+        if response.status in self.backoff_codes or response.status >= 500:
+            self.back_off(request, f"HTTP {response.status}", self.retry_after(response))
+        else:
+            self.speed_up(request)
+        return response
+
+    def process_exception(self, request, exception, spider=None):
+        self.back_off(request, type(exception).__name__)
+
+    def get_slot(self, request):
+        key = request.meta.get('download_slot')
+        engine = self.crawler.engine
+        if key is None or engine is None:
+            return None, None
+        return key, engine.downloader.slots.get(key)
+
+    def get_state(self, key):
+        if key not in self.domains:
+            self.domains[key] = {'latency': None, 'streak': 0, 'backoffs': 0}
+        return self.domains[key]
+
+    def speed_up(self, request):
+        key, slot = self.get_slot(request)
+        latency = request.meta.get('download_latency')
+        if slot is None or latency is None:
+            return
+
+        state = self.get_state(key)
+        if state['latency'] is None:
+            state['latency'] = latency
+        else:
+            state['latency'] += self.smoothing * (latency - state['latency'])
+
+        target_delay = state['latency'] / self.target_concurrency
+        slot.delay = self.clamp((slot.delay + target_delay) / 2.0)
+
+        state['streak'] += 1
+        if state['streak'] >= self.healthy_streak and slot.concurrency < self.target_concurrency:
+            slot.concurrency += 1
+            state['streak'] = 0
+
+        self.record(key, slot, state)
+
+    def back_off(self, request, reason, retry_after=None):
+        key, slot = self.get_slot(request)
+        if slot is None:
+            return
+
+        state = self.get_state(key)
+        state['streak'] = 0
+        state['backoffs'] += 1
+        slot.delay = self.clamp(max(slot.delay * 2.0, self.start_delay, retry_after or 0))
+        slot.concurrency = 1
+
+        logger.info(f"Backing off {key} after {reason}: delay {slot.delay:.2f}s, concurrency 1")
+        self.stats.inc_value(f'throttle/{key}/backoffs')
+        self.record(key, slot, state)
+
+    def retry_after(self, response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    def clamp(self, delay):
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def record(self, key, slot, state):
+        self.stats.set_value(f'throttle/{key}/delay', round(slot.delay, 3))
+        self.stats.set_value(f'throttle/{key}/concurrency', slot.concurrency)
+        if state['latency'] is not None:
+            self.stats.set_value(f'throttle/{key}/latency_ms', int(state['latency'] * 1000))
+
+    def spider_closed(self, spider):
+        for key, state in self.domains.items():
+            logger.info(
+                f"[{spider.name}] {key}: avg latency "
+                f"{(state['latency'] or 0) * 1000:.0f}ms, {state['backoffs']} backoffs"
+            )
@@ -1,10 +1,41 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean, Float, JSON
+from src.utils.compression import compress_text, decompress_text
+from sqlalchemy import create_engine, Column, Integer, SmallInteger, BigInteger, String, DateTime, Text, Boolean, Float, JSON, LargeBinary, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 
 Base = declarative_base()
 
+class CompressedText(TypeDecorator):
+    """
+    Text stored as a blob, compressed with src/utils/compression.py. PostgreSQL
+    compresses large values itself (TOAST), so there it is plain text.
+    """
+    impl = LargeBinary
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return Text()
+        return LargeBinary()
+    
+    def process_bind_param(self, value, dialect):
+        if dialect.name == 'postgresql':
+            return value
+        return compress_text(value)
+    
+    def process_result_value(self, value, dialect):
+        if dialect.name == 'postgresql':
+            return value
+        return decompress_text(value)
+
+# Indexes created only on one backend, by name; migrate_db skips them elsewhere
+BACKEND_INDEXES = {'ix_jobs_tech_stack': 'postgresql'}
+
 class Job(Base):
     __tablename__ = 'jobs'
     
@@ -12,7 +43,6 @@ class Job(Base):
     title = Column(String(200), nullable=False)
     company = Column(String(100), nullable=False)
     location = Column(String(100))
-    description = Column(Text)
     url = Column(String(500), unique=True)
     source = Column(String(50))
     
@@ -21,14 +51,18 @@ class Job(Base):
     experience_level = Column(String(50))
     work_type = Column(String(20))  # fully_remote, hybrid, onsite, unknown
     
-    # Stack and requirements
-    tech_stack = Column(JSON)
+    # Stack and requirements: {category: [technology, ...]}, JSONB on PostgreSQL
+    tech_stack = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql'))
     
     # Compensation
     min_salary = Column(Float)
     max_salary = Column(Float)
     currency = Column(String(3))
     salary_period = Column(String(10))
+    # The same range per month in the reference currency of
+    # src/utils/exchange_rates.json, for filtering (see src/utils/salary.py)
+    monthly_salary_min = Column(Float)
+    monthly_salary_max = Column(Float)
     
     # Benefits and perks
     visa_sponsorship = Column(Boolean, default=False)
@@ -39,10 +73,105 @@ class Job(Base):
     company_size = Column(String(100))
     industry = Column(String(100))
     
+    # Near-duplicate detection (see src/utils/dedup.py): packed MinHash signature
+    minhash = Column(LargeBinary)
+    
     # Metadata
     posted_date = Column(DateTime)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
+    # The description is kept compressed in job_descriptions and only loaded
+    # when job.description is read
+    description_row = relationship(
+        'JobDescription', uselist=False, lazy='select', cascade='all, delete-orphan', passive_deletes=True
+    )
+    description = association_proxy(
+        'description_row', 'body', creator=lambda body: JobDescription(body=body)
+    )
+    
+    # Match the display filters (flag + posted_date range, salary range) and
+    # the per-source slices; existing databases get these from migrate_db()
+    __table_args__ = (
+        Index('ix_jobs_posted_date_id', 'posted_date', 'id'),
+        Index('ix_jobs_source_posted_date', 'source', 'posted_date'),
+        Index('ix_jobs_visa_posted_date', 'visa_sponsorship', 'posted_date'),
+        Index('ix_jobs_relocation_posted_date', 'relocation_support', 'posted_date'),
+        Index('ix_jobs_monthly_salary_min', 'monthly_salary_min'),
+        Index('ix_jobs_monthly_salary_max', 'monthly_salary_max'),
+        # Incremental exports (src/export.py)
+        Index('ix_jobs_updated_at_id', 'updated_at', 'id'),
+        # --tech containment queries on PostgreSQL (see BACKEND_INDEXES)
+        Index(
+            'ix_jobs_tech_stack', 'tech_stack',
+            postgresql_using='gin', postgresql_ops={'tech_stack': 'jsonb_path_ops'},
+        ).ddl_if(dialect='postgresql'),
+    )
+    
     def __repr__(self):
         return f"<Job(title='{self.title}', company='{self.company}')>"
+
+class JobDescription(Base):
+    """
+    A job's description, compressed. It makes up most of a job's size, and
+    listing, counting and filtering jobs never needs it, so it is kept out of
+    the jobs rows.
+    """
+    __tablename__ = 'job_descriptions'
+    
+    job_id = Column(Integer, ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True)
+    body = Column(CompressedText)
+    
+    def __repr__(self):
+        return f"<JobDescription(job_id={self.job_id})>"
+
+class JobLshBand(Base):
+    """LSH band index over Job.minhash: jobs sharing a (band, bucket) are duplicate candidates"""
+    __tablename__ = 'job_lsh_bands'
+    
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    job_id = Column(Integer, ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True)
+    
+    __table_args__ = (
+        Index('ix_job_lsh_bands_job_id', 'job_id'),
+    )
+
+class JobDuplicate(Base):
+    """
+    A scraped posting recognised as a near-duplicate of a stored job (a repost
+    or the same job on another site). It is linked to the canonical job instead
+    of being stored as a job of its own.
+    """
+    __tablename__ = 'job_duplicates'
+    
+    id = Column(Integer, primary_key=True)
+    url = Column(String(500), unique=True)
+    source = Column(String(50))
+    canonical_id = Column(Integer, ForeignKey('jobs.id', ondelete='CASCADE'), index=True)
+    similarity = Column(Float)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<JobDuplicate(url='{self.url}', canonical_id={self.canonical_id})>"
+
+class JobQuery(Base):
+    """
+    A search query (keywords and location) whose results listed the job at url.
+    Keyed by URL so matches are recorded even for jobs that were already stored
+    or were linked to another job as duplicates.
+    """
+    __tablename__ = 'job_queries'
+    
+    url = Column(String(500), primary_key=True)
+    keywords = Column(String(200), primary_key=True)
+    location = Column(String(100), primary_key=True)
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index('ix_job_queries_keywords_location', 'keywords', 'location'),
+    )
+    
+    def __repr__(self):
+        return f"<JobQuery(url='{self.url}', keywords='{self.keywords}', location='{self.location}')>"
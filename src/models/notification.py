@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, JSON, Index
+from sqlalchemy.sql import func
+from src.models.job import Base
+
+class TelegramSubscriber(Base):
+    __tablename__ = 'telegram_subscribers'
+
+    chat_id = Column(BigInteger, primary_key=True)
+    created_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return f"<TelegramSubscriber(chat_id={self.chat_id})>"
+
+class TelegramOutbox(Base):
+    """
+    Pending Telegram notifications.
+
+    The storage pipeline writes one broadcast row (chat_id NULL) per new job in
+    the same transaction as the job itself; the delivery worker expands it into
+    one row per subscriber and tracks retries on those.
+    """
+    __tablename__ = 'telegram_outbox'
+
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger)  # NULL until expanded to subscribers
+    job_url = Column(String(500))
+    payload = Column(JSON)
+    status = Column(String(20), default='pending')  # pending, expanded, sent, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=func.now())
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=func.now())
+    sent_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_telegram_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f"<TelegramOutbox(job_url='{self.job_url}', chat_id={self.chat_id}, status='{self.status}')>"
@@ -0,0 +1,409 @@
+from scrapy.exceptions import DropItem
+from sqlalchemy import column, func, select, table, text
+from twisted.internet import task, threads
+from twisted.internet.defer import DeferredLock
+from src.models.job import Job, JobDescription, JobDuplicate, JobQuery
+from src.models.notification import TelegramOutbox
+from src.utils.database import copy_rows, engine, insert
+from src.utils.dedup import find_duplicate, index_signatures, is_duplicate, job_signature
+from src.utils.salary import normalized_salary
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Columns the crawler is allowed to write; the rest are managed by the database
+# or, for minhash, by the deduplication step
+SERVER_MANAGED_COLUMNS = {'id', 'created_at', 'updated_at', 'minhash'}
+# Computed from the scraped fields in to_row
+DERIVED_COLUMNS = {'monthly_salary_min', 'monthly_salary_max'}
+# Scraped fields stored outside the jobs table
+DETAIL_FIELDS = ('description',)
+REQUIRED_FIELDS = ('title', 'company', 'url')
+# Job fields copied into a Telegram outbox row; all JSON-serializable
+NOTIFICATION_FIELDS = (
+    'title', 'company', 'location', 'url', 'source', 'work_type', 'tech_stack',
+    'min_salary', 'max_salary', 'currency', 'salary_period',
+)
+
+
+class JobStoragePipeline:
+    """
+    Buffers scraped jobs and writes them to the jobs table in batches.
+
+    Each flush is a single INSERT ... ON CONFLICT(url) DO UPDATE transaction
+    run in the reactor thread pool, so the crawl never blocks on the database;
+    on PostgreSQL the batch is loaded with COPY into a staging table and
+    merged from there (see copy_upsert). Descriptions are written to
+    job_descriptions alongside. New jobs that are near-duplicates of a stored
+    job (same posting on another site, or reposted under a new URL) are
+    linked to it in job_duplicates instead. With notifications enabled, newly
+    inserted jobs are queued in the Telegram outbox within the same
+    transaction, and so are the spider's query matches (see
+    src/utils/queries.py) into job_queries.
+    """
+
+    def __init__(self, stats, batch_size=100, flush_interval=5.0, notify=False, dedup_threshold=0.8,
+                 telemetry=None):
+        self.stats = stats
+        self.telemetry = telemetry
+        self.notify = notify
+        self.dedup_threshold = dedup_threshold
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.table = Job.__table__
+        self.columns = [c.name for c in self.table.columns if c.name not in SERVER_MANAGED_COLUMNS]
+        self.fields = [name for name in self.columns if name not in DERIVED_COLUMNS] + list(DETAIL_FIELDS)
+        # Bulk load through COPY where the driver supports it (see copy_upsert)
+        self.copy = engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg'
+        self.buffer = []
+        self.query_matches = None
+        self.lock = DeferredLock()
+        self.flush_task = None
+        self.counts = {'inserted': 0, 'updated': 0, 'duplicates': 0, 'rejected': 0}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            stats=crawler.stats,
+            batch_size=crawler.settings.getint('JOB_STORAGE_BATCH_SIZE', 100),
+            flush_interval=crawler.settings.getfloat('JOB_STORAGE_FLUSH_INTERVAL', 5.0),
+            notify=crawler.settings.getbool('TELEGRAM_NOTIFICATIONS_ENABLED', False),
+            dedup_threshold=(
+                crawler.settings.getfloat('JOB_DEDUP_THRESHOLD', 0.8)
+                if crawler.settings.getbool('JOB_DEDUP_ENABLED', True) else None
+            ),
+            telemetry=getattr(crawler, 'telemetry', None),
+        )
+
+    def open_spider(self, spider):
+        self.query_matches = getattr(spider, 'query_matches', None)
+        if self.flush_interval > 0:
+            self.flush_task = task.LoopingCall(self.flush)
+            self.flush_task.start(self.flush_interval, now=False)
+
+    def close_spider(self, spider):
+        if self.flush_task and self.flush_task.running:
+            self.flush_task.stop()
+        d = self.flush()
+        d.addCallback(lambda _: self.log_summary(spider))
+        return d
+
+    def process_item(self, item, spider):
+        try:
+            row = self.to_row(dict(item))
+        except ValueError as e:
+            self.reject(1, str(e))
+            raise DropItem(f"Rejected job {item.get('url')}: {e}")
+
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_size:
+            d = self.flush()
+            d.addCallback(lambda _: item)
+            return d
+        return item
+
+    def to_row(self, data):
+        """Validate a scraped job and map it onto the jobs table columns"""
+        unknown = sorted(set(data) - set(self.fields))
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(unknown)}")
+
+        missing = [field for field in REQUIRED_FIELDS if not data.get(field)]
+        if missing:
+            raise ValueError(f"missing fields: {', '.join(missing)}")
+
+        row = {name: data.get(name) for name in DETAIL_FIELDS}
+        for name in self.columns:
+            if name in data:
+                row[name] = data[name]
+            else:
+                default = self.table.c[name].default
+                row[name] = default.arg if default is not None and default.is_scalar else None
+        row.update(normalized_salary(row))
+        return row
+
+    def reject(self, count, reason):
+        self.counts['rejected'] += count
+        self.stats.inc_value('jobs/rejected', count)
+        logger.warning(f"Rejected {count} job(s): {reason}")
+
+    def flush(self):
+        """Write the buffered rows and query matches; concurrent flushes are serialized"""
+        matches = self.query_matches.drain() if self.query_matches else []
+        if not self.buffer and not matches:
+            return self.lock.run(lambda: None)
+
+        rows, self.buffer = self.buffer, []
+        d = self.lock.run(threads.deferToThread, self.write_rows, rows, matches)
+        d.addCallback(self.record_result)
+        d.addErrback(lambda failure: logger.error(f"Failed to flush {len(rows)} jobs: {failure.value}"))
+        return d
+
+    def write_rows(self, rows, matches=()):
+        """Upsert a batch; if the batch fails, retry row by row to isolate bad rows"""
+        result = {'inserted': 0, 'updated': 0, 'duplicates': 0, 'rejected': 0, 'queued': 0, 'matches': 0,
+                  'errors': []}
+        try:
+            start = time.perf_counter()
+            with engine.begin() as conn:
+                if rows:
+                    self.upsert(conn, rows, result)
+                self.record_matches(conn, matches, result)
+                commit_start = time.perf_counter()
+            end = time.perf_counter()
+            result['timing'] = (len(rows), end - start, end - commit_start)
+            return result
+        except Exception as e:
+            logger.debug(f"Batch upsert failed, retrying row by row: {e}")
+
+        result = {'inserted': 0, 'updated': 0, 'duplicates': 0, 'rejected': 0, 'queued': 0, 'matches': 0,
+                  'errors': []}
+        for row in rows:
+            try:
+                with engine.begin() as conn:
+                    self.upsert(conn, [row], result)
+            except Exception as e:
+                result['rejected'] += 1
+                result['errors'].append(f"{row.get('url')}: {getattr(e, 'orig', None) or e}")
+        try:
+            with engine.begin() as conn:
+                self.record_matches(conn, matches, result)
+        except Exception as e:
+            logger.error(f"Failed to record {len(matches)} query matches: {getattr(e, 'orig', None) or e}")
+        return result
+
+    def record_matches(self, conn, matches, result):
+        """Tag jobs with the queries that matched them; known tags are left alone"""
+        if matches:
+            conn.execute(insert(conn, JobQuery.__table__).on_conflict_do_nothing(), list(matches))
+            result['matches'] += len(matches)
+
+    def upsert(self, conn, rows, result):
+        urls = [row['url'] for row in rows]
+        existing = set(conn.execute(
+            select(self.table.c.url).where(self.table.c.url.in_(urls))
+        ).scalars())
+
+        duplicates = []
+        signatures = {}
+        if self.dedup_threshold:
+            rows, duplicates, signatures = self.split_duplicates(conn, rows, existing)
+            result['duplicates'] += len(duplicates)
+
+        if rows and self.copy:
+            self.copy_upsert(conn, rows)
+        elif rows:
+            stmt = insert(conn, self.table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['url'],
+                set_={
+                    **{
+                        name: func.coalesce(stmt.excluded[name], self.table.c[name])
+                        for name in self.columns if name != 'url'
+                    },
+                    'updated_at': func.now(),
+                }
+            )
+            conn.execute(stmt, [{name: row[name] for name in self.columns} for row in rows])
+            self.write_descriptions(conn, rows)
+
+        new_rows = []
+        for row in rows:
+            if row['url'] in existing:
+                result['updated'] += 1
+            else:
+                result['inserted'] += 1
+                existing.add(row['url'])
+                new_rows.append(row)
+
+        if self.dedup_threshold:
+            self.index_new_jobs(conn, signatures, duplicates)
+
+        if self.notify and new_rows:
+            conn.execute(TelegramOutbox.__table__.insert(), [
+                {
+                    'job_url': row['url'],
+                    'payload': {field: row.get(field) for field in NOTIFICATION_FIELDS},
+                    'status': 'pending',
+                    'attempts': 0,
+                }
+                for row in new_rows
+            ])
+            result['queued'] += len(new_rows)
+
+    def write_descriptions(self, conn, rows):
+        """Store the rows' descriptions; a job scraped without one keeps its stored description"""
+        descriptions = {row['url']: row['description'] for row in rows if row['description'] is not None}
+        if not descriptions:
+            return
+        ids = conn.execute(
+            select(self.table.c.url, self.table.c.id).where(self.table.c.url.in_(list(descriptions)))
+        ).all()
+        stmt = insert(conn, JobDescription.__table__)
+        # Unchanged descriptions compress to the same bytes and are left alone,
+        # which also spares the search index an update
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['job_id'],
+            set_={'body': stmt.excluded.body},
+            where=JobDescription.__table__.c.body != stmt.excluded.body,
+        )
+        conn.execute(stmt, [{'job_id': job_id, 'body': descriptions[url]} for url, job_id in ids])
+
+    def copy_upsert(self, conn, rows):
+        """
+        Upsert rows on PostgreSQL: COPY them into a temporary staging table,
+        then merge it into jobs with one INSERT ... SELECT ... ON CONFLICT(url)
+        DO UPDATE, and the descriptions the same way. A statement can't update
+        a row twice, so a URL scraped twice in the batch is merged here first,
+        later values winning as they would row by row.
+        """
+        merged = {}
+        descriptions = {}
+        for row in rows:
+            values = {name: row[name] for name in self.columns}
+            earlier = merged.get(row['url'])
+            if earlier is not None:
+                values = {name: earlier[name] if value is None else value for name, value in values.items()}
+            merged[row['url']] = values
+            if row['description'] is not None:
+                descriptions[row['url']] = row['description']
+
+        # Made once per pooled connection and emptied by each commit, since
+        # creating tables for every batch costs more than COPY saves
+        conn.execute(text(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS jobs_staging ON COMMIT DELETE ROWS AS "
+            f"SELECT {', '.join(self.columns)} FROM jobs WITH NO DATA"
+        ))
+        copy_rows(conn, 'jobs_staging', self.columns, (tuple(values.values()) for values in merged.values()))
+        staging = table('jobs_staging', *(column(name) for name in self.columns))
+        stmt = insert(conn, self.table).from_select(
+            self.columns + ['created_at', 'updated_at'],
+            select(*staging.c, func.now(), func.now()),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['url'],
+            set_={
+                **{
+                    name: func.coalesce(stmt.excluded[name], self.table.c[name])
+                    for name in self.columns if name != 'url'
+                },
+                'updated_at': func.now(),
+            }
+        )
+        conn.execute(stmt)
+
+        if not descriptions:
+            return
+        ids = conn.execute(
+            select(self.table.c.url, self.table.c.id).where(self.table.c.url.in_(list(descriptions)))
+        ).all()
+        conn.execute(text(
+            "CREATE TEMPORARY TABLE IF NOT EXISTS job_descriptions_staging (job_id INTEGER, body TEXT) "
+            "ON COMMIT DELETE ROWS"
+        ))
+        copy_rows(conn, 'job_descriptions_staging', ['job_id', 'body'],
+                  ((job_id, descriptions[url]) for url, job_id in ids))
+        staging = table('job_descriptions_staging', column('job_id'), column('body'))
+        descriptions_table = JobDescription.__table__
+        stmt = insert(conn, descriptions_table).from_select(['job_id', 'body'], select(*staging.c))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['job_id'],
+            set_={'body': stmt.excluded.body},
+            where=descriptions_table.c.body != stmt.excluded.body,
+        )
+        conn.execute(stmt)
+
+    def split_duplicates(self, conn, rows, existing):
+        """
+        Separate new rows that duplicate a stored job, or an earlier row of the
+        same batch. Returns the rows to upsert, the duplicates as
+        (row, canonical job id or url, similarity), and the new rows' signatures.
+        """
+        linked = set(conn.execute(
+            select(JobDuplicate.url).where(JobDuplicate.url.in_([row['url'] for row in rows]))
+        ).scalars())
+
+        keep, duplicates, signatures = [], [], {}
+        for row in rows:
+            if row['url'] in existing:
+                keep.append(row)
+                continue
+            if row['url'] in linked:
+                duplicates.append((row, None, None))
+                continue
+
+            signature = job_signature(row.get('title'), row.get('company'), row.get('description'))
+            if signature is None:
+                keep.append(row)
+                continue
+
+            match = find_duplicate(conn, signature, row['title'], self.dedup_threshold)
+            if match is None:
+                for other in keep:
+                    if other['url'] not in signatures:
+                        continue
+                    score = is_duplicate(
+                        signature, row['title'], signatures[other['url']], other['title'], self.dedup_threshold
+                    )
+                    if score is not None:
+                        match = (other['url'], score)
+                        break
+            if match is None:
+                signatures[row['url']] = signature
+                keep.append(row)
+            else:
+                duplicates.append((row, *match))
+        return keep, duplicates, signatures
+
+    def index_new_jobs(self, conn, signatures, duplicates):
+        """Index the new jobs' signatures and link the duplicates to their canonical job"""
+        urls = list(signatures) + [canonical for _, canonical, _ in duplicates if isinstance(canonical, str)]
+        ids = dict(conn.execute(
+            select(self.table.c.url, self.table.c.id).where(self.table.c.url.in_(urls))
+        ).all()) if urls else {}
+        index_signatures(conn, {ids[url]: signature for url, signature in signatures.items()})
+
+        links = [
+            {
+                'url': row['url'],
+                'source': row.get('source'),
+                'canonical_id': ids[canonical] if isinstance(canonical, str) else canonical,
+                'similarity': score,
+            }
+            for row, canonical, score in duplicates if canonical is not None
+        ]
+        if links:
+            conn.execute(insert(conn, JobDuplicate.__table__).on_conflict_do_nothing(index_elements=['url']), links)
+
+        # Reposts already linked just count as seen again
+        seen_again = [row['url'] for row, canonical, _ in duplicates if canonical is None]
+        if seen_again:
+            conn.execute(
+                JobDuplicate.__table__.update()
+                .where(JobDuplicate.url.in_(seen_again))
+                .values(updated_at=func.now())
+            )
+
+    def record_result(self, result):
+        if self.telemetry and 'timing' in result:
+            self.telemetry.observe_storage(*result['timing'])
+        self.counts['inserted'] += result['inserted']
+        self.counts['updated'] += result['updated']
+        self.counts['duplicates'] += result['duplicates']
+        self.stats.inc_value('jobs/inserted', result['inserted'])
+        self.stats.inc_value('jobs/updated', result['updated'])
+        self.stats.inc_value('jobs/duplicates', result['duplicates'])
+        if result['queued']:
+            self.stats.inc_value('telegram/queued', result['queued'])
+        if result['matches']:
+            self.stats.inc_value('queries/matches', result['matches'])
+        if result['rejected']:
+            self.reject(result['rejected'], '; '.join(result['errors']))
+
+    def log_summary(self, spider):
+        logger.info(
+            f"[{spider.name}] Stored jobs: {self.counts['inserted']} inserted, "
+            f"{self.counts['updated']} updated, {self.counts['duplicates']} duplicates, "
+            f"{self.counts['rejected']} rejected"
+        )
@@ -0,0 +1,159 @@
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet import task
+from datetime import datetime
+import gc
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+# Reasons a crawl stops early that leave a job directory worth resuming
+RESUMABLE_REASONS = {'shutdown', 'memory_guard'}
+
+
+def job_dir(root, spider_name, queries):
+    """
+    The job directory for one spider crawling one set of queries:
+    <root>/<spider>-<digest of the queries>, so rerunning the same command
+    with --resume finds it
+    """
+    key = '\n'.join(sorted(json.dumps(list(query), ensure_ascii=False) for query in queries))
+    digest = hashlib.sha1(f"{spider_name}:{key}".encode('utf-8')).hexdigest()[:10]
+    return os.path.join(root, f"{spider_name}-{digest}")
+
+
+def crawl_key(spider):
+    """
+    <spider>-<digest of its queries>, the same for every run of one spider on
+    one set of queries; just the name for a spider without queries
+    """
+    queries = getattr(spider, 'queries', None)
+    if queries is None:
+        return spider.name
+    return os.path.basename(job_dir('', spider.name, queries))
+
+
+def prepare_job_dir(path, spider_name, queries, resume):
+    """
+    Set up a crawl's job directory. Without resume, the leftovers of an
+    earlier interrupted run are discarded. Returns True if an interrupted run
+    is being continued.
+    """
+    resuming = resume and os.path.exists(os.path.join(path, 'run.json'))
+    if not resuming:
+        if resume:
+            logger.info(f"No interrupted {spider_name} crawl for these queries, starting a new one")
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        # For humans: which crawl this directory belongs to
+        with open(os.path.join(path, 'run.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'spider': spider_name,
+                'queries': [list(query) for query in queries],
+                'started_at': datetime.now().isoformat(timespec='seconds'),
+            }, f, ensure_ascii=False, indent=2)
+    return resuming
+
+
+def finish_job_dir(path, crawler):
+    """Remove the job directory of a crawl that ran to completion; keep it if it can be resumed"""
+    reason = crawler.stats.get_value('finish_reason')
+    if reason in RESUMABLE_REASONS:
+        logger.info(f"[{crawler.spidercls.name}] crawl stopped ({reason}); continue it with --resume")
+    else:
+        shutil.rmtree(path, ignore_errors=True)
+    return reason in RESUMABLE_REASONS
+
+
+def resident_memory_mb():
+    """Current resident set size of this process in MB, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class MemoryGuard:
+    """
+    Pauses the engine while the process uses too much memory.
+
+    Above MEMORY_GUARD_PAUSE_MB no new requests are scheduled. Downloads in
+    flight finish and their items are stored, which releases their responses
+    and job dicts, and scheduling resumes once memory falls below
+    MEMORY_GUARD_RESUME_MB. The pending requests themselves stay out of memory
+    when the crawl has a JOBDIR (the scheduler keeps them in disk queues).
+    If memory is still too high after MEMORY_GUARD_MAX_PAUSE seconds, the
+    spider is closed with reason 'memory_guard' and can be continued later
+    with --resume.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('MEMORY_GUARD_ENABLED', True):
+            raise NotConfigured
+        if resident_memory_mb() is None:
+            logger.warning("MemoryGuard needs /proc to read memory usage; disabled")
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.pause_mb = settings.getfloat('MEMORY_GUARD_PAUSE_MB', 1024)
+        self.resume_mb = settings.getfloat('MEMORY_GUARD_RESUME_MB', self.pause_mb * 0.75)
+        self.max_pause = settings.getfloat('MEMORY_GUARD_MAX_PAUSE', 300)
+        self.interval = settings.getfloat('MEMORY_GUARD_INTERVAL', 5.0)
+        self.paused_at = None
+        self.check_task = None
+        self.spider = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        extension = cls(crawler)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.spider = spider
+        self.check_task = task.LoopingCall(self.check)
+        self.check_task.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.check_task and self.check_task.running:
+            self.check_task.stop()
+
+    def check(self):
+        used = resident_memory_mb()
+        stats = self.crawler.stats
+        stats.max_value('memory_guard/max_mb', round(used))
+        engine = self.crawler.engine
+
+        if self.paused_at is None:
+            if used > self.pause_mb:
+                engine.pause()
+                self.paused_at = time.monotonic()
+                stats.inc_value('memory_guard/pauses')
+                logger.warning(f"Memory at {used:.0f} MB (limit {self.pause_mb:.0f} MB), pausing new requests")
+                gc.collect()
+            return
+
+        if used < self.resume_mb:
+            paused_for = time.monotonic() - self.paused_at
+            stats.inc_value('memory_guard/paused_seconds', round(paused_for))
+            self.paused_at = None
+            engine.unpause()
+            logger.info(f"Memory down to {used:.0f} MB after {paused_for:.0f}s, resuming requests")
+        elif time.monotonic() - self.paused_at > self.max_pause:
+            logger.error(f"Memory still at {used:.0f} MB after {self.max_pause:.0f}s paused, stopping the crawl")
+            self.paused_at = None
+            engine.unpause()
+            if hasattr(engine, 'close_spider_async'):
+                deferred_from_coro(engine.close_spider_async(reason='memory_guard'))
+            else:
+                engine.close_spider(self.spider, 'memory_guard')
@@ -10,16 +10,29 @@ USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36
 # Obey robots.txt rules
 ROBOTSTXT_OBEY = False
 
-# Configure maximum concurrent requests performing at the same time
-CONCURRENT_REQUESTS = 1
+# Configure maximum concurrent requests performing at the same time.
+# Politeness is enforced per domain, so several spiders can share one process;
+# spiders tighten or relax these in their custom_settings.
+CONCURRENT_REQUESTS = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = 1
 
-# Configure a delay for requests for the same website
+# Starting delay for requests to the same website; AdaptiveThrottleMiddleware
+# adjusts it per domain from there
 DOWNLOAD_DELAY = 3
 RANDOMIZE_DOWNLOAD_DELAY = True
 
+# Adaptive per-domain throttling (see src/middlewares.py). Spiders override
+# these in custom_settings to match each site's tolerance.
+ADAPTIVE_THROTTLE_ENABLED = True
+ADAPTIVE_THROTTLE_MIN_DELAY = 0.5
+ADAPTIVE_THROTTLE_MAX_DELAY = 60.0
+ADAPTIVE_THROTTLE_TARGET_CONCURRENCY = 2
+ADAPTIVE_THROTTLE_BACKOFF_CODES = [429, 403]
+
 # Enable cookies
 COOKIES_ENABLED = True
-COOKIES_DEBUG = True
+# Logging every cookie header buries the useful output; re-enable when debugging sessions
+COOKIES_DEBUG = False
 
 # Handle redirects
 REDIRECT_ENABLED = True
@@ -35,19 +48,96 @@ DOWNLOADER_MIDDLEWARES = {
     'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None,
     'scrapy.downloadermiddlewares.retry.RetryMiddleware': 500,
     'scrapy.downloadermiddlewares.cookies.CookiesMiddleware': 700,
+    'src.middlewares.AdaptiveThrottleMiddleware': 950,
+}
+
+# Time spent in each callback, reported to the telemetry extension below;
+# and with FRONTIER_ENABLED, when a response's callback is through
+SPIDER_MIDDLEWARES = {
+    'src.frontier.FrontierMiddleware': 10,
+    'src.telemetry.CallbackTimingMiddleware': 1000,
 }
 
+# Crawl telemetry (see src/telemetry.py): TELEMETRY_DIR/<spider>-<digest of
+# the queries>.prom is rewritten every TELEMETRY_INTERVAL seconds for
+# Prometheus' textfile collector and TELEMETRY_DIR/<spider>-<digest>-summary.json
+# is written at close
+EXTENSIONS = {
+    'src.telemetry.CrawlTelemetry': 500,
+    'src.resume.MemoryGuard': 510,
+}
+TELEMETRY_ENABLED = True
+TELEMETRY_DIR = 'telemetry'
+TELEMETRY_INTERVAL = 15.0
+
+# Resumable crawls (see src/resume.py): main.py gives each spider's crawl a
+# JOBDIR under CRAWL_STATE_DIR holding its disk request queue, dupefilter and
+# spider state. A crawl stopped with one Ctrl-C or SIGTERM continues with
+# --resume; an empty value turns this off.
+CRAWL_STATE_DIR = 'crawls'
+
+# Shared crawl frontier (see src/frontier.py): with FRONTIER_ENABLED, every
+# process crawling the same spiders and queries takes its requests from one
+# queue and dupefilter in FRONTIER_PATH, so more workers can be started to
+# share a crawl. A request leased by a worker that doesn't finish it within
+# FRONTIER_LEASE_TIMEOUT seconds goes back to the queue, at most
+# FRONTIER_MAX_ATTEMPTS times; all workers together start at most one request
+# per domain every FRONTIER_DOMAIN_DELAY seconds. The frontier replaces the
+# JOBDIR above: a crawl whose workers all stopped continues when any starts.
+# A finished crawl starts over only FRONTIER_RESTART_DELAY seconds after its
+# last request, so workers started late don't crawl it again.
+SCHEDULER = 'src.frontier.FrontierScheduler'
+FRONTIER_ENABLED = False
+FRONTIER_PATH = 'crawls/frontier.sqlite'
+FRONTIER_LEASE_TIMEOUT = 300
+FRONTIER_MAX_ATTEMPTS = 3
+FRONTIER_DOMAIN_DELAY = 1.0
+FRONTIER_RESTART_DELAY = 60
+
+# Stop scheduling new requests while the process is above MEMORY_GUARD_PAUSE_MB
+# resident memory, carry on below MEMORY_GUARD_RESUME_MB, and close the spider
+# (resumable) if memory stays high for MEMORY_GUARD_MAX_PAUSE seconds
+MEMORY_GUARD_ENABLED = True
+MEMORY_GUARD_PAUSE_MB = 1024
+MEMORY_GUARD_RESUME_MB = 768
+MEMORY_GUARD_MAX_PAUSE = 300
+MEMORY_GUARD_INTERVAL = 5.0
+
 # Configure item pipelines
 ITEM_PIPELINES = {
-    # Add your pipelines here
+    'src.pipelines.JobStoragePipeline': 300,
 }
 
-# Enable and configure HTTP caching
+# Jobs are upserted in batches of this size, or every N seconds, whichever comes first
+JOB_STORAGE_BATCH_SIZE = 100
+JOB_STORAGE_FLUSH_INTERVAL = 5.0
+
+# New jobs whose title, company and description are at least this similar
+# (estimated Jaccard over word shingles) to a stored job are linked to it in
+# job_duplicates instead of being stored again
+JOB_DEDUP_ENABLED = True
+JOB_DEDUP_THRESHOLD = 0.8
+
+# Skip detail pages of jobs already stored for the spider's source.
+# With SEEN_URLS_REFRESH_DAYS > 0, jobs not updated within that window are fetched again.
+SEEN_URLS_ENABLED = True
+SEEN_URLS_REFRESH_DAYS = 0
+SEEN_URLS_ERROR_RATE = 0.001
+
+# Enable and configure HTTP caching. Responses go compressed into one SQLite
+# file (see src/httpcache.py); listing pages expire after HTTPCACHE_LISTING_TTL
+# so new jobs show up, detail pages after HTTPCACHE_DETAIL_TTL (0 = never).
+# Spiders override the TTLs in custom_settings.
 HTTPCACHE_ENABLED = True
 HTTPCACHE_EXPIRATION_SECS = 0
 HTTPCACHE_DIR = 'httpcache'
 HTTPCACHE_IGNORE_HTTP_CODES = []
-HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
+HTTPCACHE_STORAGE = 'src.httpcache.SqliteCacheStorage'
+HTTPCACHE_POLICY = 'src.httpcache.PageTypeCachePolicy'
+HTTPCACHE_LISTING_TTL = 3600
+HTTPCACHE_DETAIL_TTL = 7 * 24 * 3600
+# Least recently used responses are evicted once the cache file grows past this
+HTTPCACHE_MAX_SIZE = 256 * 1024 * 1024
 
 # Additional settings for handling Persian sites
 FEED_EXPORT_ENCODING = 'utf-8'
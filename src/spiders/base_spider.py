@@ -1,19 +1,147 @@
-from scrapy import Spider
+from scrapy import Spider, signals
+from scrapy.http import Request
+from src.utils.queries import QueryMatches, SearchQuery, load_queries
+from src.utils.seen_urls import SeenUrlIndex
+from src.utils.persian_date import parse_persian_date
+from src.utils.salary import parse_salary
 from typing import Dict, Any, List
 
 class BaseJobSpider(Spider):
     name = 'base_job_spider'
-    
-    def __init__(self, *args, **kwargs):
+    source = None  # value stored in Job.source for this spider's jobs
+    # Used for whichever part of a query is left out
+    default_keywords = None
+    default_location = None
+    # Assumed when a salary text doesn't name its currency or pay period
+    salary_currency = None
+    salary_period = None
+
+    def __init__(self, keywords=None, location=None, queries=None, *args, **kwargs):
+        """
+        Search for one keywords/location pair, or for every SearchQuery in
+        queries (a list, or the path of a query file for `scrapy crawl -a`)
+        """
         super().__init__(*args, **kwargs)
+        if isinstance(queries, str):
+            queries = load_queries(queries)
+        self.queries = list(dict.fromkeys(
+            SearchQuery(query.keywords or self.default_keywords, query.location or self.default_location)
+            for query in queries or [SearchQuery(keywords, location)]
+        ))
+        self.keywords, self.location = self.queries[0]
+        self.query_matches = QueryMatches()
         self.jobs: List[Dict[str, Any]] = []
-    
+        self.seen_urls = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.load_seen_urls, signal=signals.spider_opened)
+        return spider
+
+    def load_seen_urls(self, spider):
+        """
+        Load the index of job URLs already stored for this source so listing
+        callbacks can skip their detail pages
+        """
+        settings = self.crawler.settings
+        if not self.source or not settings.getbool('SEEN_URLS_ENABLED', True):
+            return
+
+        self.seen_urls = SeenUrlIndex(
+            self.source,
+            refresh_days=settings.getint('SEEN_URLS_REFRESH_DAYS', 0),
+            error_rate=settings.getfloat('SEEN_URLS_ERROR_RATE', 0.001)
+        )
+        loaded = self.seen_urls.load()
+        self.crawler.stats.set_value('seen_urls/loaded', loaded)
+        self.logger.info(f"Loaded {loaded} known {self.source} job URLs")
+
+    def search_url(self, query):
+        """The first results page for a SearchQuery"""
+        raise NotImplementedError
+
+    async def start(self):
+        # Scrapy 2.13+ only reads start(); the spiders build their start
+        # requests in start_requests()
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        if self.resume_state():
+            return
+        for query in self.queries:
+            yield Request(self.search_url(query), callback=self.parse, meta={'search_query': query})
+
+    def resume_state(self):
+        """
+        With a JOBDIR, keep the job URLs already requested in the persisted
+        spider state. Returns True when continuing an interrupted crawl, whose
+        start pages were requested by the earlier run (the pending requests
+        come back from the disk queue instead).
+        """
+        state = getattr(self, 'state', None)
+        if state is None:
+            return False
+        self.query_matches.seen = state.setdefault('requested_jobs', self.query_matches.seen)
+        resumed = state.get('started', False)
+        state['started'] = True
+        if resumed:
+            self.logger.info(f"Resuming crawl: {len(self.query_matches.seen)} jobs already requested")
+        return resumed
+
+    def should_follow_job(self, response, url):
+        """
+        Record that the query behind this listing page matched the job, and
+        return True if its detail page still has to be fetched: not already
+        requested for another query (or page) of this crawl, and not stored
+        """
+        if not self.query_matches.add(url, response.meta.get('search_query')):
+            self.crawler.stats.inc_value('queries/shared_jobs')
+            return False
+        return not self.is_known_job(url)
+
+    def is_known_job(self, url):
+        """Return True if the job is already stored and its detail page can be skipped"""
+        if self.seen_urls is None:
+            return False
+
+        known = url in self.seen_urls
+        stats = self.crawler.stats
+        if known:
+            stats.inc_value('seen_urls/skipped')
+        else:
+            stats.inc_value('seen_urls/new')
+        stats.set_value('seen_urls/false_positives', self.seen_urls.false_positives)
+        return known
+
+    def parse_posted_date(self, date_str, reference):
+        """
+        Parse a Persian posted-date string relative to the response's reference
+        time. Unparseable dates are counted in the stats and returned as None
+        rather than guessed.
+        """
+        posted_date = parse_persian_date(date_str, reference)
+        if posted_date is None:
+            self.crawler.stats.inc_value('dates/unparsed')
+            self.logger.debug(f"Could not parse posted date: {date_str!r}")
+        else:
+            self.crawler.stats.inc_value('dates/parsed')
+        return posted_date
+
+    def extract_salary_info(self, salary_texts):
+        """The salary fields for a job from the salary texts on its page (see src/utils/salary.py)"""
+        salary = parse_salary(' '.join(text.strip() for text in salary_texts), self.salary_currency, self.salary_period)
+        if salary['min_salary'] is None and salary['max_salary'] is None and any(text.strip() for text in salary_texts):
+            self.crawler.stats.inc_value('salary/unparsed')
+        return salary
+
     def parse(self, response):
         """
         Base parse method to be implemented by child classes
         """
         raise NotImplementedError
-    
+
     def parse_job_details(self, response):
         """
         Base method to parse individual job details
@@ -1,37 +1,86 @@
 from src.spiders.base_spider import BaseJobSpider
-from src.models.job import Job
-from src.utils.database import SessionLocal
+from src.utils.selectors import LabeledFields, Query
+from src.utils.tech_stack import detect_tech_stack
 from typing import Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
-import re
 import urllib.parse
+from lxml import etree
 from scrapy.http import Request
 import logging
-import asyncio
 
 class JobinjaSpider(BaseJobSpider):
     name = 'jobinja'
+    source = 'Jobinja'
     allowed_domains = ['jobinja.ir']
+    custom_settings = {
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 2,
+        'DOWNLOAD_DELAY': 1,
+        'ADAPTIVE_THROTTLE_MIN_DELAY': 0.25,
+        'ADAPTIVE_THROTTLE_TARGET_CONCURRENCY': 4,
+        'HTTPCACHE_LISTING_TTL': 3600,
+        'HTTPCACHE_DETAIL_TTL': 7 * 24 * 3600,
+    }
+
+    # Listing page: each job card, and fields relative to a card
+    JOB_CARDS = Query(css='div.o-listView__itemWrap.c-jobListView__itemWrap')
+    CARD_TITLE_LINK = Query(css='div.o-listView__itemInfo h2.o-listView__itemTitle a.c-jobListView__titleLink')
+    TITLE_TEXT = Query(xpath='./text()')
+    LINK_HREF = Query(xpath='./@href')
+    CARD_DATE = Query(css='span.c-jobListView__passedDays::text')
+    # Meta items are told apart by their icon: company, place, contract type
+    CARD_META = LabeledFields(
+        items=Query(css='li.c-jobListView__metaItem'),
+        label=Query(css='i::attr(class)'),
+        value=Query(xpath='./span/text()'),
+        fields={'company': 'c-icon--construction', 'location': 'c-icon--place'},
+    )
+    NEXT_PAGE = Query(css='a.c-pagination__next::attr(href), a[rel="next"]::attr(href)')
+
+    # Detail page: everything is inside the job view box
+    JOB_VIEW = Query(css='div.c-jobView')
+    # The job description, or the first text box on older layouts
+    DESCRIPTION = Query(css='div.s-jobDesc, div.c-jobView__description, div.o-box__text')
+    DESCRIPTION_TEXT = Query(xpath='.//text()')
+    JOB_META = LabeledFields(
+        items=Query(css='li.c-infoBox__item'),
+        label=Query(css='h4::text'),
+        value=Query(css='div.tags *::text'),
+        fields={
+            'category': 'دسته‌بندی',
+            'employment_type': 'نوع همکاری',
+            'experience': 'سابقه',
+            'education': 'تحصیل',
+            'salary': 'حقوق',
+            'skills': 'مهارت',
+        },
+        separator='، ',
+    )
     
-    def __init__(self, keywords=None, location=None, max_pages=10, *args, **kwargs):
+    default_keywords = 'برنامه نویس'
+    default_location = 'تهران'
+    # Salaries are quoted in toman per month
+    salary_currency = 'IRT'
+    salary_period = 'monthly'
+    
+    def __init__(self, max_pages=10, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.keywords = keywords or 'برنامه نویس'
-        self.location = location or 'تهران'
+        # Per query: every query pages through up to max_pages results pages
         self.max_pages = int(max_pages)
-        self.current_page = 1
-        
-        # Format keywords and location for URL - new format
-        encoded_keywords = urllib.parse.quote(self.keywords)
-        encoded_location = urllib.parse.quote(self.location)
-        self.start_urls = [
-            f'https://jobinja.ir/jobs?&filters[locations][0]={encoded_location}&q={encoded_keywords}'
-        ]
         self.retries = 3
         self.delay = 2
         self.logger.setLevel(logging.DEBUG)
+
+    def search_url(self, query):
+        # Format keywords and location for URL - new format
+        encoded_keywords = urllib.parse.quote(query.keywords)
+        encoded_location = urllib.parse.quote(query.location)
+        return f'https://jobinja.ir/jobs?&filters[locations][0]={encoded_location}&q={encoded_keywords}'
         
     def start_requests(self):
+        if self.resume_state():
+            return
+
         headers = {
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
             'Accept-Language': 'fa-IR,fa;q=0.9,en-US;q=0.8,en;q=0.7',
@@ -51,9 +100,9 @@ class JobinjaSpider(BaseJobSpider):
             'country': 'IR'
         }
         
-        for url in self.start_urls:
+        for query in self.queries:
             yield Request(
-                url=url,
+                url=self.search_url(query),
                 headers=headers,
                 cookies=cookies,
                 callback=self.parse,
@@ -61,94 +110,62 @@ class JobinjaSpider(BaseJobSpider):
                 meta={
                     'dont_redirect': False,  # Allow redirects
                     'handle_httpstatus_list': [301, 302],
-                    'download_timeout': 30
+                    'download_timeout': 30,
+                    'search_query': query,
                 }
             )
 
-    def parse_persian_date(self, date_str):
-        """Convert Persian date text to datetime object"""
-        if not date_str:
-            return datetime.now()
-            
-        try:
-            # Strip any extra whitespace and parentheses
-            date_str = date_str.strip('() \n\t')
-            
-            # Handle relative dates
-            if 'روز پیش' in date_str:
-                days = int(''.join(filter(str.isdigit, date_str)))
-                return datetime.now() - timedelta(days=days)
-            elif 'ساعت پیش' in date_str:
-                hours = int(''.join(filter(str.isdigit, date_str)))
-                return datetime.now() - timedelta(hours=hours)
-            elif 'هفته پیش' in date_str:
-                weeks = int(''.join(filter(str.isdigit, date_str)))
-                return datetime.now() - timedelta(weeks=weeks)
-            elif 'ماه پیش' in date_str:
-                months = int(''.join(filter(str.isdigit, date_str)))
-                return datetime.now() - timedelta(days=months*30)
-            elif 'دقیقه پیش' in date_str:
-                minutes = int(''.join(filter(str.isdigit, date_str)))
-                return datetime.now() - timedelta(minutes=minutes)
-            elif 'امروز' in date_str:
-                return datetime.now()
-            else:
-                return datetime.now()
-        except Exception as e:
-            self.logger.error(f"Error parsing Persian date '{date_str}': {e}")
-            return datetime.now()
-
     def parse(self, response):
         self.logger.debug(f"Parsing page: {response.url}")
         self.logger.debug(f"Response status: {response.status}")
 
         # Extract job listings
-        job_items = response.css('div.o-listView__itemWrap.c-jobListView__itemWrap')
+        job_items = self.JOB_CARDS.all(response)
         self.logger.debug(f"Found {len(job_items)} job listings")
 
         if not job_items:
             self.logger.error("No jobs found with any selector")
             self.logger.debug("Page content preview:")
-            self.logger.debug(response.css('body').get()[:1000])
+            self.logger.debug(response.text[:1000])
             return
 
+        # One reference time per page so relative dates agree with each other
+        now = datetime.now()
+
         for job_item in job_items:
             try:
-                # Get the job info container
-                info_container = job_item.css('div.o-listView__itemInfo')
-                
                 # Extract basic job information with error checking
-                title_element = info_container.css('h2.o-listView__itemTitle a.c-jobListView__titleLink')
-                if not title_element:
+                title_element = self.CARD_TITLE_LINK.first(job_item)
+                if title_element is None:
                     continue
                     
-                title = title_element.css('::text').get('').strip()
-                url = title_element.css('::attr(href)').get('')
+                title = self.TITLE_TEXT.text(title_element)
+                url = self.LINK_HREF.text(title_element)
 
                 if not (title and url):
                     continue
 
-                # Extract company name
-                company = info_container.css('span:contains("‌")::text, .c-jobListView__metaItem span::text').get('').strip()
-                
-                # Extract location
-                location = info_container.css('.c-jobListView__metaItem span::text').getall()
-                location = next((loc.strip() for loc in location if 'تهران' in loc or 'مشهد' in loc), 'تهران')
+                # Company and location come from the card's meta items
+                meta = self.CARD_META.extract(job_item)
                 
                 # Extract posted date
-                date_span = info_container.css('span.c-jobListView__passedDays::text').get()
-                posted_date = self.parse_persian_date(date_span)
+                date_span = self.CARD_DATE.text(job_item, None)
+                posted_date = self.parse_posted_date(date_span, now)
 
                 job_data = {
                     'title': title,
-                    'company': company,
-                    'location': location,
+                    'company': meta['company'],
+                    'location': meta['location'] or 'تهران',
                     'url': response.urljoin(url),
-                    'source': 'Jobinja',
+                    'source': self.source,
                     'posted_date': posted_date
                 }
 
                 self.logger.info(f"Successfully parsed job: {job_data['title']} at {job_data['company']}")
+
+                if not self.should_follow_job(response, job_data['url']):
+                    self.logger.debug(f"Skipping known job: {job_data['url']}")
+                    continue
                 
                 yield response.follow(
                     url=job_data['url'],
@@ -159,19 +176,20 @@ class JobinjaSpider(BaseJobSpider):
 
             except Exception as e:
                 self.logger.error(f"Error parsing job listing: {str(e)}")
-                self.logger.debug(f"Problem job HTML: {job_item.get()}")
+                self.logger.debug(f"Problem job HTML: {etree.tostring(job_item, encoding='unicode')}")
                 continue
 
         # Handle pagination
-        next_page_url = response.css('a.c-pagination__next::attr(href), a[rel="next"]::attr(href)').get()
+        next_page_url = self.NEXT_PAGE.text(response, None)
+        page = response.meta.get('page', 1)
         
-        if next_page_url and self.current_page < self.max_pages:
-            self.current_page += 1
-            self.logger.debug(f"Following next page: {next_page_url} (Page {self.current_page} of {self.max_pages})")
+        if next_page_url and page < self.max_pages:
+            self.logger.debug(f"Following next page: {next_page_url} (Page {page + 1} of {self.max_pages})")
             yield response.follow(
                 url=next_page_url,
                 callback=self.parse,
-                errback=self.handle_error
+                errback=self.handle_error,
+                meta={'search_query': response.meta.get('search_query'), 'page': page + 1}
             )
         else:
             self.logger.info(f"Reached maximum page limit ({self.max_pages})")
@@ -183,154 +201,36 @@ class JobinjaSpider(BaseJobSpider):
         try:
             self.logger.debug(f"Parsing job details from {response.url}")
 
+            # Scope every query to the job view box rather than the whole page
+            job_view = self.JOB_VIEW.first(response, response)
+
             # Extract job description
-            description_texts = []
-            description_selectors = [
-                'div.o-box__text::text',
-                'div.o-box__text p::text',
-                'div.s-jobDesc::text',
-                'div.s-jobDesc p::text',
-                '.c-jobView__description *::text',
-                '.o-box.c-jobView__section *::text'
-            ]
-            
-            for selector in description_selectors:
-                texts = response.css(selector).getall()
-                if texts:
-                    description_texts.extend(texts)
-            
-            description = ' '.join(text.strip() for text in description_texts if text.strip())
+            container = self.DESCRIPTION.first(job_view)
+            description = self.DESCRIPTION_TEXT.joined(container) if container is not None else ''
             
             if not description:
                 self.logger.warning(f"No description found for job at {response.url}")
                 description = "توضیحات در دسترس نیست"
 
-            # Extract additional metadata
-            metadata = {
-                'employment_type': response.css('div.c-jobView__metaItem:contains("نوع همکاری") span::text').get('').strip(),
-                'experience': response.css('div.c-jobView__metaItem:contains("سابقه") span::text').get('').strip(),
-                'education': response.css('div.c-jobView__metaItem:contains("تحصیلات") span::text').get('').strip(),
-                'category': response.css('div.c-jobView__metaItem:contains("دسته‌بندی") a::text').get('').strip(),
-                'salary': self.extract_salary_range(response),
-                'tech_stack': self.detect_tech_stack(description)
-            }
+            # All metadata in one pass over the info box items
+            metadata = self.JOB_META.extract(job_view)
 
             # Update job data with new information
             job_data.update({
                 'description': description,
-                'metadata': metadata
+                'job_type': metadata['employment_type'] or None,
+                'experience_level': metadata['experience'] or None,
+                'tech_stack': detect_tech_stack(f"{description} {metadata['skills']}"),
             })
-
-            # Create and save job instance
-            db = SessionLocal()
-            try:
-                job = Job(
-                    title=job_data['title'],
-                    company=job_data['company'],
-                    location=job_data['location'],
-                    description=job_data['description'],
-                    url=job_data['url'],
-                    source=job_data['source'],
-                    posted_date=job_data['posted_date'],
-                    metadata=json.dumps(metadata, ensure_ascii=False)
-                )
-                db.add(job)
-                db.commit()
-                self.logger.info(f"Successfully saved job: {job.title}")
-
-                # Send Telegram notification if bot is available
-                if hasattr(self, 'telegram_bot'):
-                    asyncio.create_task(self.telegram_bot.send_job_notification(job_data))
-
-            except Exception as e:
-                self.logger.error(f"Database error: {str(e)}")
-                db.rollback()
-            finally:
-                db.close()
-
-            return job_data
+            job_data.update(self.extract_salary_info([metadata['salary']] if metadata['salary'] else []))
 
         except Exception as e:
             self.logger.error(f"Error parsing job details: {str(e)}")
-            return job_data
-
-    def detect_tech_stack(self, text):
-        """Detect technologies mentioned in the job description"""
-        tech_keywords = {
-            'python': ['python', 'django', 'flask', 'fastapi', 'پایتون'],
-            'javascript': ['javascript', 'جاوااسکریپت', 'js', 'node', 'react', 'vue', 'angular'],
-            'database': ['sql', 'mysql', 'postgresql', 'mongodb', 'redis', 'elasticsearch'],
-            'cloud': ['aws', 'azure', 'docker', 'kubernetes', 'k8s'],
-            'other': ['git', 'rest', 'api', 'linux', 'ci/cd', 'jenkins']
-        }
-        
-        found_tech = set()
-        text_lower = text.lower()
-        
-        for category, terms in tech_keywords.items():
-            for term in terms:
-                if term.lower() in text_lower:
-                    found_tech.add(term)
-        
-        return list(found_tech)
 
-    def extract_salary_range(self, response):
-        """Extract salary information if available"""
-        salary_selectors = [
-            'div.c-jobView__metaItem:contains("حقوق") span::text',
-            'div:contains("حقوق") span.black::text',
-            '.c-jobView__metaItem--salaryType span::text'
-        ]
-        
-        for selector in salary_selectors:
-            salary = response.css(selector).get()
-            if salary:
-                return salary.strip()
-        return None
+        yield job_data
 
     def handle_error(self, failure):
         self.logger.error(f"Request failed: {failure.value}")
         if hasattr(failure.value, 'response'):
             self.logger.error(f"Response status: {failure.value.response.status}")
             self.logger.error(f"Response headers: {failure.value.response.headers}")
-
-    def detect_tech_stack(self, description):
-        tech_categories = {
-            'frameworks': ['django', 'flask', 'fastapi', 'laravel', 'spring', 'react', 'vue', 'angular'],
-            'languages': ['python', 'php', 'java', 'javascript', 'typescript', 'go', 'rust'],
-            'databases': ['mysql', 'postgresql', 'mongodb', 'redis', 'elasticsearch'],
-            'tools': ['docker', 'kubernetes', 'git', 'linux', 'aws', 'azure']
-        }
-        
-        found_techs = {category: [] for category in tech_categories}
-        desc_lower = description.lower()
-        
-        for category, technologies in tech_categories.items():
-            for tech in technologies:
-                if tech in desc_lower:
-                    found_techs[category].append(tech)
-        
-        return found_techs
-
-    def extract_salary_info(self, salary_texts):
-        salary_info = {
-            'min_salary': None,
-            'max_salary': None,
-            'currency': 'IRR',
-            'salary_period': 'monthly'
-        }
-        
-        if not salary_texts:
-            return salary_info
-            
-        salary_text = ' '.join(salary_texts)
-        numbers = re.findall(r'[\d,]+', salary_text)
-        
-        if len(numbers) >= 2:
-            try:
-                salary_info['min_salary'] = float(numbers[0].replace(',', ''))
-                salary_info['max_salary'] = float(numbers[1].replace(',', ''))
-            except (ValueError, IndexError):
-                pass
-        
-        return salary_info
@@ -1,60 +1,232 @@
 from src.spiders.base_spider import BaseJobSpider
-from src.models.job import Job
-from src.utils.database import SessionLocal
+from src.utils.selectors import Query
+from src.utils.tech_stack import detect_tech_stack
+from lxml import html
+from scrapy.http import JsonRequest, Request
 from typing import Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
-import re
+
+# orjson decodes the API responses several times faster when it is installed
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 class JobvisionSpider(BaseJobSpider):
     name = 'jobvision'
+    source = 'Jobvision'
     allowed_domains = ['jobvision.ir']
+    custom_settings = {
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 2,
+        'DOWNLOAD_DELAY': 2,
+        'ADAPTIVE_THROTTLE_MIN_DELAY': 0.5,
+        'ADAPTIVE_THROTTLE_TARGET_CONCURRENCY': 2,
+        'HTTPCACHE_LISTING_TTL': 3600,
+        'HTTPCACHE_DETAIL_TTL': 7 * 24 * 3600,
+    }
+
+    # Listing page: each job card, and fields relative to a card
+    JOB_CARDS = Query(css='div.job-card')
+    CARD_DATE = Query(css='span.job-card__date::text')
+    CARD_TITLE = Query(css='h2.job-card__title::text')
+    CARD_COMPANY = Query(css='span.job-card__company::text')
+    CARD_LOCATION = Query(css='span.job-card__location::text')
+    CARD_URL = Query(css='a.job-card__link::attr(href)')
+    NEXT_PAGE = Query(css='a.pagination__next::attr(href)')
+
+    # Detail page
+    DESCRIPTION = Query(css='div.job-detail__description ::text')
+    SALARY = Query(css='div.job-detail__salary ::text')
+    COMPANY_INFO = Query(css='div.company-info__details ::text')
+
+    # The JSON endpoints the site's own app loads its data from. The search
+    # takes a POSTed JSON body and answers {"data": {"jobPostCount", "jobPosts"}};
+    # the detail endpoint answers {"data": {...}} for one job post. The field
+    # names follow the site's app and have not been checked against live
+    # responses: the JSON in benchmarks/fixtures/jobvision-api was written by
+    # hand to match them, and anything missing falls back to the HTML pages.
+    site_url = 'https://jobvision.ir'
+    api_url = 'https://candidateapi.jobvision.ir/api/v1'
+    API_SEARCH = '/JobPost/List'
+    API_DETAIL = '/JobPost/Detail'
     
-    def __init__(self, keywords=None, location=None, *args, **kwargs):
+    default_keywords = 'برنامه نویس'
+    default_location = 'تهران'
+    # Salaries are quoted in toman per month
+    salary_currency = 'IRT'
+    salary_period = 'monthly'
+    
+    def __init__(self, api=False, page_size=30, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.keywords = keywords or 'برنامه نویس'
-        self.location = location or 'تهران'
-        self.start_urls = [
-            f'https://jobvision.ir/jobs?keyword={self.keywords}&city={self.location}'
-        ]
+        # The JSON API is opt-in with -a api=1 until its endpoints have been
+        # checked against recorded responses; any query or job it fails for
+        # falls back to the HTML pages
+        self.api = str(api).lower() in ('1', 'true', 'yes', 'on')
+        self.page_size = int(page_size)
         self.retries = 3
         self.delay = 2
 
-    def parse_persian_date(self, date_str):
-        """Convert Persian date text to datetime object"""
-        try:
-            # Handle relative dates
-            if 'روز پیش' in date_str:
-                days = int(re.search(r'\d+', date_str).group())
-                return datetime.now() - timedelta(days=days)
-            elif 'ساعت پیش' in date_str:
-                hours = int(re.search(r'\d+', date_str).group())
-                return datetime.now() - timedelta(hours=hours)
-            elif 'هفته پیش' in date_str:
-                weeks = int(re.search(r'\d+', date_str).group())
-                return datetime.now() - timedelta(weeks=weeks)
+    def search_url(self, query):
+        return f'{self.site_url}/jobs?keyword={query.keywords}&city={query.location}'
+
+    def start_requests(self):
+        if self.resume_state():
+            return
+        for query in self.queries:
+            if self.api:
+                yield self.api_search_request(query, 1)
             else:
-                return datetime.now()  # fallback to current date
-        except Exception as e:
-            self.logger.error(f"Error parsing Persian date: {e}")
-            return datetime.now()
+                yield self.html_search_request(query)
+
+    def html_search_request(self, query):
+        return Request(self.search_url(query), callback=self.parse, meta={'search_query': query})
+
+    def api_search_request(self, query, page):
+        return JsonRequest(
+            f'{self.api_url}{self.API_SEARCH}',
+            data={
+                'keyword': query.keywords,
+                'city': query.location,
+                'pageSize': self.page_size,
+                'requestedPage': page,
+                'sortBy': 1,  # newest first
+            },
+            callback=self.parse_api,
+            errback=self.api_search_failed,
+            meta={'search_query': query, 'page': page},
+        )
+
+    def api_search_failed(self, failure):
+        query = failure.request.meta['search_query']
+        self.use_html_fallback(f"search for {query.keywords} in {query.location}", failure.value)
+        yield self.html_search_request(query)
+
+    def api_details_failed(self, failure):
+        job_data = failure.request.cb_kwargs['job_data']
+        self.use_html_fallback(f"job {job_data['url']}", failure.value)
+        yield Request(job_data['url'], callback=self.parse_job_details, cb_kwargs={'job_data': job_data})
+
+    def use_html_fallback(self, what, reason):
+        self.crawler.stats.inc_value('jobvision/api_fallbacks')
+        self.logger.warning(f"JSON API failed for {what} ({reason}), using the HTML pages")
+
+    def parse_api(self, response):
+        query = response.meta['search_query']
+        page = response.meta['page']
+        try:
+            data = json_loads(response.body)['data']
+            posts = data['jobPosts']
+            total = data.get('jobPostCount') or 0
+        except (ValueError, KeyError, TypeError) as e:
+            self.use_html_fallback(f"search for {query.keywords} in {query.location}", f"bad response: {e!r}")
+            yield self.html_search_request(query)
+            return
+
+        self.crawler.stats.inc_value('jobvision/api_pages')
+        now = datetime.now()
+        for post in posts:
+            try:
+                job_data = self.api_job_summary(post, now)
+            except (KeyError, TypeError, ValueError) as e:
+                self.logger.error(f"Error parsing job post {post.get('id') if isinstance(post, dict) else post}: {e!r}")
+                continue
+
+            if not self.should_follow_job(response, job_data['url']):
+                continue
+
+            yield Request(
+                f"{self.api_url}{self.API_DETAIL}?jobPostId={post['id']}",
+                callback=self.parse_api_details,
+                errback=self.api_details_failed,
+                cb_kwargs={'job_data': job_data},
+                headers={'Accept': 'application/json'},
+            )
+
+        if posts and page * self.page_size < total:
+            yield self.api_search_request(query, page + 1)
+
+    def api_job_summary(self, post, now):
+        """The listing fields of a job dict, from one search result"""
+        activation = post.get('activationTime') or {}
+        if activation.get('date'):
+            try:
+                posted_date = datetime.fromisoformat(activation['date'])
+            except ValueError:
+                # Not ISO 8601 (e.g. a Jalali 1403/02/01); read it like the HTML dates
+                posted_date = self.parse_posted_date(activation.get('beautifyFa') or activation['date'], now)
+        else:
+            posted_date = self.parse_posted_date(activation.get('beautifyFa'), now)
+
+        location = post.get('location') or {}
+        city = (location.get('city') or location.get('province') or {}).get('titleFa')
+        region = (location.get('region') or {}).get('titleFa')
+
+        return {
+            'title': post['title'].strip(),
+            'company': company_name(post['company']),
+            'location': ' ، '.join(part for part in (city, region) if part) or None,
+            'url': f"{self.site_url}/jobs/{post['id']}",
+            'source': self.source,
+            'posted_date': posted_date,
+        }
+
+    def parse_api_details(self, response, job_data):
+        try:
+            post = json_loads(response.body)['data']
+            company = post.get('company') or {}
+            description_html = post.get('description') or ''
+        except (ValueError, KeyError, TypeError) as e:
+            self.use_html_fallback(f"job {job_data['url']}", f"bad response: {e!r}")
+            yield Request(job_data['url'], callback=self.parse_job_details, cb_kwargs={'job_data': job_data})
+            return
+
+        # The description arrives as an HTML fragment; keep its text like the HTML path does
+        description = ''
+        if description_html.strip():
+            description = ' '.join(html.fragment_fromstring(description_html, create_parent='div').itertext()).strip()
+        job_data['description'] = description
+
+        # The salary text names its unit like the page does; the numeric fields are toman
+        salary = post.get('salary') or {}
+        job_data.update(self.extract_salary_info([salary['titleFa']] if salary.get('titleFa') else []))
+        if job_data['min_salary'] is None and job_data['max_salary'] is None and not salary.get('isNegotiable'):
+            if salary.get('minSalary') or salary.get('maxSalary'):
+                job_data.update({
+                    'min_salary': float(salary['minSalary']) if salary.get('minSalary') else None,
+                    'max_salary': float(salary['maxSalary']) if salary.get('maxSalary') else None,
+                    'currency': self.salary_currency,
+                    'salary_period': self.salary_period,
+                })
+
+        job_data['tech_stack'] = detect_tech_stack(description)
+        job_data['work_type'] = self.detect_work_type(description)
+        job_data['company_size'] = company.get('sizeTitleFa') or None
+        job_data['industry'] = (company.get('industry') or {}).get('titleFa') or None
+
+        yield job_data
 
     def parse(self, response):
-        jobs = response.css('div.job-card')
+        jobs = self.JOB_CARDS.all(response)
+        # One reference time per page so relative dates agree with each other
+        now = datetime.now()
         for job in jobs:
             try:
-                posted_date_str = job.css('span.job-card__date::text').get()
-                posted_date = self.parse_persian_date(posted_date_str)
+                posted_date_str = self.CARD_DATE.first(job)
+                posted_date = self.parse_posted_date(posted_date_str, now)
                 
                 job_data = {
-                    'title': job.css('h2.job-card__title::text').get().strip(),
-                    'company': job.css('span.job-card__company::text').get().strip(),
-                    'location': job.css('span.job-card__location::text').get().strip(),
-                    'url': response.urljoin(job.css('a.job-card__link::attr(href)').get()),
-                    'source': 'Jobvision',
+                    'title': self.CARD_TITLE.first(job).strip(),
+                    'company': self.CARD_COMPANY.first(job).strip(),
+                    'location': self.CARD_LOCATION.first(job).strip(),
+                    'url': response.urljoin(self.CARD_URL.first(job)),
+                    'source': self.source,
                     'posted_date': posted_date
                 }
                 
+                if not self.should_follow_job(response, job_data['url']):
+                    continue
+                
                 yield response.follow(
                     job_data['url'],
                     self.parse_job_details,
@@ -65,41 +237,27 @@ class JobvisionSpider(BaseJobSpider):
                 continue
 
         # Handle pagination
-        next_page = response.css('a.pagination__next::attr(href)').get()
+        next_page = self.NEXT_PAGE.first(response)
         if next_page:
-            yield response.follow(next_page, self.parse)
+            yield response.follow(next_page, self.parse, meta={'search_query': response.meta.get('search_query')})
 
     def parse_job_details(self, response, job_data):
-        description = ' '.join(
-            response.css('div.job-detail__description ::text').getall()
-        ).strip()
+        description = ' '.join(self.DESCRIPTION.all(response)).strip()
         job_data['description'] = description
         
         # Extract salary information
-        salary_elem = response.css('div.job-detail__salary ::text').getall()
+        salary_elem = self.SALARY.all(response)
         salary_info = self.extract_salary_info(salary_elem)
         job_data.update(salary_info)
         
         # Extract tech stack
-        job_data['tech_stack'] = self.detect_tech_stack(description)
+        job_data['tech_stack'] = detect_tech_stack(description)
         
         # Work type detection
-        work_types = {
-            'fully_remote': ['دورکاری', 'ریموت'],
-            'hybrid': ['هیبرید', 'ترکیبی'],
-            'onsite': ['حضوری']
-        }
-        
-        job_data['work_type'] = 'unknown'
-        desc_lower = description.lower()
-        
-        for work_type, indicators in work_types.items():
-            if any(indicator in desc_lower for indicator in indicators):
-                job_data['work_type'] = work_type
-                break
+        job_data['work_type'] = self.detect_work_type(description)
         
         # Extract additional info
-        company_info = response.css('div.company-info__details ::text').getall()
+        company_info = self.COMPANY_INFO.all(response)
         job_data['company_size'] = None
         job_data['industry'] = None
         
@@ -109,57 +267,23 @@ class JobvisionSpider(BaseJobSpider):
             elif 'صنعت' in info:
                 job_data['industry'] = info.replace('صنعت:', '').strip()
         
-        # Store in database
-        db = SessionLocal()
-        try:
-            job = Job(**job_data)
-            db.add(job)
-            db.commit()
-        except Exception as e:
-            db.rollback()
-            self.logger.error(f"Error saving job: {e}")
-        finally:
-            db.close()
-        
-        return job_data
-
-    def detect_tech_stack(self, description):
-        tech_categories = {
-            'frameworks': ['django', 'flask', 'fastapi', 'laravel', 'spring', 'react', 'vue', 'angular'],
-            'languages': ['python', 'php', 'java', 'javascript', 'typescript', 'go', 'rust'],
-            'databases': ['mysql', 'postgresql', 'mongodb', 'redis', 'elasticsearch'],
-            'tools': ['docker', 'kubernetes', 'git', 'linux', 'aws', 'azure']
+        yield job_data
+
+    def detect_work_type(self, description):
+        work_types = {
+            'fully_remote': ['دورکاری', 'ریموت'],
+            'hybrid': ['هیبرید', 'ترکیبی'],
+            'onsite': ['حضوری']
         }
         
-        found_techs = {category: [] for category in tech_categories}
         desc_lower = description.lower()
-        
-        for category, technologies in tech_categories.items():
-            for tech in technologies:
-                if tech in desc_lower:
-                    found_techs[category].append(tech)
-        
-        return found_techs
-
-    def extract_salary_info(self, salary_texts):
-        salary_info = {
-            'min_salary': None,
-            'max_salary': None,
-            'currency': 'IRR',
-            'salary_period': 'monthly'
-        }
-        
-        if not salary_texts:
-            return salary_info
-            
-        salary_text = ' '.join(salary_texts)
-        numbers = re.findall(r'[\d,]+', salary_text)
-        
-        if len(numbers) >= 2:
-            try:
-                salary_info['min_salary'] = float(numbers[0].replace(',', ''))
-                salary_info['max_salary'] = float(numbers[1].replace(',', ''))
-            except (ValueError, IndexError):
-                pass
-        
-        return salary_info
+        for work_type, indicators in work_types.items():
+            if any(indicator in desc_lower for indicator in indicators):
+                return work_type
+        return 'unknown'
+
+
+def company_name(company):
+    """A search result's company name, Persian first"""
+    name = company.get('name') or {}
+    return (name.get('titleFa') or name.get('titleEn') or '').strip()
@@ -1,75 +1,62 @@
 from src.spiders.base_spider import BaseJobSpider
-from src.models.job import Job
-from src.utils.database import SessionLocal
+from src.utils.salary import detect_currency
+from src.utils.selectors import Query
+from src.utils.tech_stack import detect_tech_stack
 from typing import Dict, Any
 from datetime import datetime
 import json
 
 class LinkedinSpider(BaseJobSpider):
     name = 'linkedin'
+    source = 'LinkedIn'
     allowed_domains = ['linkedin.com']
+    custom_settings = {
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        'DOWNLOAD_DELAY': 3,
+        # LinkedIn rate limits aggressively, so stay slow and back off far
+        'ADAPTIVE_THROTTLE_MIN_DELAY': 2,
+        'ADAPTIVE_THROTTLE_MAX_DELAY': 120,
+        'ADAPTIVE_THROTTLE_TARGET_CONCURRENCY': 1,
+        # Listings churn quickly and closed postings disappear within days
+        'HTTPCACHE_LISTING_TTL': 1800,
+        'HTTPCACHE_DETAIL_TTL': 3 * 24 * 3600,
+    }
+
+    # Listing page: each job card, and fields relative to a card
+    JOB_CARDS = Query(css='div.base-card')
+    CARD_DATE = Query(css='time::attr(datetime)')
+    CARD_TITLE = Query(css='h3.base-search-card__title::text')
+    CARD_COMPANY = Query(css='h4.base-search-card__subtitle a::text')
+    CARD_LOCATION = Query(css='span.job-search-card__location::text')
+    CARD_URL = Query(css='a.base-card__full-link::attr(href)')
+    NEXT_PAGE = Query(css='a[aria-label="Next"]::attr(href)')
+
+    # Detail page
+    DESCRIPTION = Query(css='div.show-more-less-html__markup ::text')
+    SALARY_INSIGHTS = Query(css='.job-details-jobs-unified-top-card__job-insight span::text')
+    COMPANY_INFO = Query(css='.jobs-company__box ::text')
+    BENEFITS = Query(css='.jobs-benefit ::text')
     
-    def __init__(self, keywords=None, location=None, *args, **kwargs):
+    default_keywords = 'senior frontend developer'
+    default_location = 'United States'
+    # Pay insights without a period ('100K-120K USD') are annual salaries
+    salary_period = 'yearly'
+    
+    def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.keywords = keywords or 'senior frontend developer'
-        self.location = location or 'United States'
-        self.start_urls = [
-            f'https://www.linkedin.com/jobs/search/?keywords={self.keywords}&location={self.location}&f_E=4&sortBy=DD'  # f_E=4 filters for senior level, DD for most recent
-        ]
         self.retries = 3
         self.delay = 2  # seconds between requests
     
-    def detect_frontend_stack(self, description):
-        frontend_techs = {
-            'frameworks': ['react', 'vue', 'angular', 'next.js', 'nuxt', 'svelte'],
-            'languages': ['javascript', 'typescript', 'html', 'css'],
-            'tools': ['webpack', 'vite', 'babel', 'eslint', 'jest', 'cypress'],
-            'styling': ['sass', 'less', 'tailwind', 'styled-components', 'css-in-js'],
-            'state': ['redux', 'mobx', 'zustand', 'recoil', 'vuex', 'pinia']
-        }
-        
-        found_techs = {category: [] for category in frontend_techs}
-        desc_lower = description.lower()
-        
-        for category, technologies in frontend_techs.items():
-            for tech in technologies:
-                if tech in desc_lower:
-                    found_techs[category].append(tech)
-        
-        return found_techs
+    def search_url(self, query):
+        # f_E=4 filters for senior level, DD for most recent
+        return f'https://www.linkedin.com/jobs/search/?keywords={query.keywords}&location={query.location}&f_E=4&sortBy=DD'
     
-    def extract_salary_info(self, response):
-        salary_text = response.css('.job-details-jobs-unified-top-card__job-insight span::text').getall()
-        salary_info = {
-            'min_salary': None,
-            'max_salary': None,
-            'currency': None,
-            'salary_period': None
-        }
-        
-        for text in salary_text:
-            if any(word in text.lower() for word in ['$', '€', '£', 'salary', 'compensation']):
-                # Extract numbers and try to parse salary range
-                import re
-                numbers = re.findall(r'[\d,]+\.?\d*', text)
-                if len(numbers) >= 2:
-                    salary_info['min_salary'] = float(numbers[0].replace(',', ''))
-                    salary_info['max_salary'] = float(numbers[1].replace(',', ''))
-                    if '$' in text:
-                        salary_info['currency'] = 'USD'
-                    elif '€' in text:
-                        salary_info['currency'] = 'EUR'
-                    elif '£' in text:
-                        salary_info['currency'] = 'GBP'
-                    
-                    if 'year' in text.lower():
-                        salary_info['period'] = 'yearly'
-                    elif 'month' in text.lower():
-                        salary_info['period'] = 'monthly'
-                    elif 'hour' in text.lower():
-                        salary_info['period'] = 'hourly'
-        
-        return salary_info
+    def salary_texts(self, response):
+        # Only the first insight that mentions pay; the others are job type and seniority
+        return [
+            text for text in self.SALARY_INSIGHTS.all(response)
+            if detect_currency(text.lower()) or any(word in text.lower() for word in ['salary', 'compensation'])
+        ][:1]
     
     def has_visa_sponsorship(self, description):
         visa_keywords = [
@@ -98,10 +85,10 @@ class LinkedinSpider(BaseJobSpider):
         return any(keyword in description.lower() for keyword in relocation_keywords)
     
     def parse(self, response):
-        jobs = response.css('div.base-card')
+        jobs = self.JOB_CARDS.all(response)
         for job in jobs:
             try:
-                posted_date_str = job.css('time::attr(datetime)').get()
+                posted_date_str = self.CARD_DATE.first(job)
                 posted_date = datetime.fromisoformat(posted_date_str)
                 
                 # Validate the posted date is not in the future
@@ -110,14 +97,17 @@ class LinkedinSpider(BaseJobSpider):
                     posted_date = datetime.now()  # Use current date as fallback
                 
                 job_data = {
-                    'title': job.css('h3.base-search-card__title::text').get().strip(),
-                    'company': job.css('h4.base-search-card__subtitle a::text').get().strip(),
-                    'location': job.css('span.job-search-card__location::text').get().strip(),
-                    'url': job.css('a.base-card__full-link::attr(href)').get(),
-                    'source': 'LinkedIn',
+                    'title': self.CARD_TITLE.first(job).strip(),
+                    'company': self.CARD_COMPANY.first(job).strip(),
+                    'location': self.CARD_LOCATION.first(job).strip(),
+                    'url': self.CARD_URL.first(job),
+                    'source': self.source,
                     'posted_date': posted_date
                 }
                 
+                if not self.should_follow_job(response, job_data['url']):
+                    continue
+                
                 yield response.follow(
                     job_data['url'], 
                     self.parse_job_details,
@@ -131,7 +121,7 @@ class LinkedinSpider(BaseJobSpider):
                 continue
         
         # Enhanced pagination with retries
-        next_page = response.css('a[aria-label="Next"]::attr(href)').get()
+        next_page = self.NEXT_PAGE.first(response)
         if next_page:
             for _ in range(self.retries):
                 try:
@@ -140,7 +130,7 @@ class LinkedinSpider(BaseJobSpider):
                         self.parse,
                         dont_filter=True,
                         errback=self.handle_error,
-                        cb_kwargs={'retry_count': 0}
+                        meta={'search_query': response.meta.get('search_query')}
                     )
                     break
                 except Exception as e:
@@ -152,9 +142,7 @@ class LinkedinSpider(BaseJobSpider):
         self.logger.error(f"Request failed: {failure.value}")
         
     def parse_job_details(self, response, job_data):
-        description = ' '.join(
-            response.css('div.show-more-less-html__markup ::text').getall()
-        ).strip()
+        description = ' '.join(self.DESCRIPTION.all(response)).strip()
         job_data['description'] = description
         
         # Enhanced remote detection
@@ -174,10 +162,10 @@ class LinkedinSpider(BaseJobSpider):
                 break
         
         # Add tech stack detection
-        job_data['tech_stack'] = self.detect_frontend_stack(description)
+        job_data['tech_stack'] = detect_tech_stack(description)
         
         # Add salary information
-        job_data.update(self.extract_salary_info(response))
+        job_data.update(self.extract_salary_info(self.salary_texts(response)))
         
         # Existing checks
         job_data['visa_sponsorship'] = self.has_visa_sponsorship(description)
@@ -186,7 +174,7 @@ class LinkedinSpider(BaseJobSpider):
         job_data['experience_level'] = 'senior'
         
         # Extract company info
-        company_info = response.css('.jobs-company__box ::text').getall()
+        company_info = self.COMPANY_INFO.all(response)
         job_data['company_size'] = None
         job_data['industry'] = None
         
@@ -197,21 +185,7 @@ class LinkedinSpider(BaseJobSpider):
                 job_data['industry'] = info.replace('Industry', '').strip()
         
         # Extract benefits
-        benefits = []
-        if response.css('.jobs-benefit'):
-            benefits = response.css('.jobs-benefit ::text').getall()
+        benefits = self.BENEFITS.all(response)
         job_data['benefits'] = '\n'.join(benefits) if benefits else None
         
-        # Store in database
-        db = SessionLocal()
-        try:
-            job = Job(**job_data)
-            db.add(job)
-            db.commit()
-        except Exception as e:
-            db.rollback()
-            self.logger.error(f"Error saving job: {e}")
-        finally:
-            db.close()
-        
-        return job_data
+        yield job_data
@@ -0,0 +1,412 @@
+from src.resume import crawl_key
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet import task
+from bisect import bisect_left
+from datetime import datetime
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'jobscraper'
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CALLBACK_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+DB_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+# Counters the rest of the project already keeps in the crawl stats
+STATS_COUNTERS = {
+    'items_duplicate_total': ('jobs/duplicates', 'Jobs linked to a stored near-duplicate'),
+    'items_rejected_total': ('jobs/rejected', 'Jobs rejected by the storage pipeline'),
+    'jobs_inserted_total': ('jobs/inserted', 'New jobs stored'),
+    'jobs_updated_total': ('jobs/updated', 'Stored jobs updated'),
+    'detail_pages_skipped_total': ('seen_urls/skipped', 'Detail pages skipped as already stored'),
+    'detail_pages_shared_total': ('queries/shared_jobs', 'Detail pages already requested for another query'),
+    'cache_hits_total': ('httpcache/hit', 'Responses served from the HTTP cache'),
+    'frontier_leased_total': ('frontier/leased', 'Requests leased from the shared crawl frontier'),
+    'frontier_duplicates_total': ('frontier/duplicates', 'Requests the shared crawl frontier had already seen'),
+    'frontier_expired_leases_total': ('frontier/expired_leases', 'Leases of stopped workers requeued'),
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket, like histogram_quantile()"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_seconds': round(self.sum, 3),
+            'mean_ms': round(self.sum / self.count * 1000, 2) if self.count else None,
+            'p50_ms': round(self.quantile(0.5) * 1000, 2) if self.count else None,
+            'p95_ms': round(self.quantile(0.95) * 1000, 2) if self.count else None,
+            'max_ms': round(self.max * 1000, 2),
+        }
+
+
+class Metrics:
+    """Counters, gauges and histograms keyed by name and label values"""
+
+    def __init__(self):
+        self.families = {}
+
+    def _series(self, kind, name, help_text):
+        if name not in self.families:
+            self.families[name] = (kind, help_text, {})
+        return self.families[name][2]
+
+    def inc(self, name, help_text, labels, value=1):
+        series = self._series('counter', name, help_text)
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def set(self, name, help_text, labels, value, kind='gauge'):
+        self._series(kind, name, help_text)[tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, help_text, labels, value, buckets):
+        series = self._series('histogram', name, help_text)
+        key = tuple(sorted(labels.items()))
+        if key not in series:
+            series[key] = Histogram(buckets)
+        series[key].observe(value)
+
+    def get(self, name):
+        return self.families.get(name, (None, None, {}))[2]
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format"""
+        lines = []
+        for name in sorted(self.families):
+            kind, help_text, series = self.families[name]
+            full_name = f'{METRIC_PREFIX}_{name}'
+            lines.append(f'# HELP {full_name} {help_text}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            for key in sorted(series):
+                value = series[key]
+                if kind != 'histogram':
+                    lines.append(f'{full_name}{format_labels(key)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(value.buckets + ('+Inf',), value.counts):
+                    cumulative += count
+                    lines.append(f'{full_name}_bucket{format_labels(key + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{full_name}_sum{format_labels(key)} {value.sum}')
+                lines.append(f'{full_name}_count{format_labels(key)} {value.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in key) + '}'
+
+
+def write_atomic(path, text):
+    # Scrapers of the file (node_exporter's textfile collector) must never see half of it
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class CrawlTelemetry:
+    """
+    Per-crawl metrics showing where the wall-clock time goes.
+
+    Records download latency and time queued behind the per-domain throttle
+    (per domain), bytes and status codes, callback run time (through
+    CallbackTimingMiddleware), item throughput and drops, and the storage
+    pipeline's write and commit latency. TELEMETRY_DIR/<crawl>.prom is
+    rewritten every TELEMETRY_INTERVAL seconds in the Prometheus text format,
+    and TELEMETRY_DIR/<crawl>-summary.json is written when the spider closes,
+    where <crawl> is the spider and a digest of its queries (see crawl_key),
+    so concurrent crawls of one spider, like the daemon's, keep their own
+    files. The components report through crawler.telemetry.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('TELEMETRY_ENABLED', True):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.directory = settings.get('TELEMETRY_DIR', 'telemetry')
+        self.interval = settings.getfloat('TELEMETRY_INTERVAL', 15.0)
+        self.metrics = Metrics()
+        self.spider_name = None
+        self.crawl = None
+        self.started_at = None
+        self.export_task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        extension = cls(crawler)
+        crawler.telemetry = extension
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(extension.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(extension.response_received, signal=signals.response_received)
+        crawler.signals.connect(extension.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(extension.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(extension.spider_error, signal=signals.spider_error)
+        return extension
+
+    def labels(self, **labels):
+        return {'spider': self.spider_name, 'crawl': self.crawl, **labels}
+
+    def spider_opened(self, spider):
+        self.spider_name = spider.name
+        self.crawl = crawl_key(spider)
+        self.started_at = time.time()
+        os.makedirs(self.directory, exist_ok=True)
+        if self.interval > 0:
+            self.export_task = task.LoopingCall(self.export)
+            self.export_task.start(self.interval, now=False)
+
+    def request_reached_downloader(self, request):
+        request.meta['telemetry_reached_at'] = time.monotonic()
+
+    def response_received(self, response, request):
+        domain = urlparse_cached(request).hostname or ''
+        labels = self.labels(domain=domain)
+        self.metrics.inc('responses_total', 'Responses received', self.labels(domain=domain, status=response.status))
+        if 'cached' in response.flags:
+            return
+
+        self.metrics.inc('response_bytes_total', 'Response body bytes downloaded', labels, len(response.body))
+        latency = request.meta.get('download_latency')
+        if latency is None:
+            return
+        self.metrics.observe('download_latency_seconds', 'Time from sending a request to its full response',
+                             labels, latency, LATENCY_BUCKETS)
+        reached_at = request.meta.get('telemetry_reached_at')
+        if reached_at is not None:
+            # Whatever is left of the downloader's time was spent waiting for a
+            # slot: the download delay and the per-domain concurrency limit
+            wait = max(0.0, time.monotonic() - reached_at - latency)
+            self.metrics.observe('throttle_wait_seconds', 'Time a request waited for its domain slot',
+                                 labels, wait, LATENCY_BUCKETS)
+
+    def item_scraped(self, item):
+        self.metrics.inc('items_scraped_total', 'Items that passed the pipelines', self.labels())
+
+    def item_dropped(self, item, exception):
+        self.metrics.inc('items_dropped_total', 'Items dropped by a pipeline',
+                         self.labels(reason=type(exception).__name__))
+
+    def spider_error(self, failure, response):
+        self.metrics.inc('callback_errors_total', 'Exceptions raised by spider callbacks',
+                         self.labels(callback=callback_name(response.request)))
+
+    def observe_callback(self, callback, seconds):
+        self.metrics.observe('callback_seconds', 'Time spent running a spider callback for one response',
+                             self.labels(callback=callback), seconds, CALLBACK_BUCKETS)
+
+    def observe_storage(self, rows, write_seconds, commit_seconds):
+        labels = self.labels()
+        self.metrics.observe('db_write_seconds', 'Time to upsert one batch of jobs, including the commit',
+                             labels, write_seconds, DB_BUCKETS)
+        self.metrics.observe('db_commit_seconds', 'Time to commit one batch of jobs',
+                             labels, commit_seconds, DB_BUCKETS)
+        self.metrics.inc('db_rows_total', 'Job rows written to the database', labels, rows)
+
+    def update_gauges(self):
+        labels = self.labels()
+        elapsed = time.time() - self.started_at
+        scraped = sum(self.metrics.get('items_scraped_total').values())
+        self.metrics.set('elapsed_seconds', 'Seconds since the spider opened', labels, round(elapsed, 3))
+        self.metrics.set('items_per_second', 'Items scraped per second since the spider opened',
+                         labels, round(scraped / elapsed, 3) if elapsed else 0)
+
+        stats = self.crawler.stats.get_stats()
+        for name, (stat, help_text) in STATS_COUNTERS.items():
+            self.metrics.set(name, help_text, labels, stats.get(stat, 0), kind='counter')
+
+        engine = self.crawler.engine
+        if engine is None or engine.downloader is None:
+            return
+        for key, slot in engine.downloader.slots.items():
+            slot_labels = self.labels(domain=key)
+            self.metrics.set('throttle_delay_seconds', 'Current download delay of a domain', slot_labels, slot.delay)
+            self.metrics.set('throttle_concurrency', 'Current concurrency allowed for a domain',
+                             slot_labels, slot.concurrency)
+            self.metrics.set('downloader_queued', 'Requests waiting for a domain slot', slot_labels, len(slot.queue))
+
+    def export(self):
+        try:
+            self.update_gauges()
+            write_atomic(os.path.join(self.directory, f'{self.crawl}.prom'), self.metrics.render())
+        except Exception as e:
+            logger.error(f"Failed to export telemetry: {e}")
+
+    def summary(self, reason):
+        def by(name, label):
+            return {
+                dict(key)[label]: histogram.summary()
+                for key, histogram in sorted(self.metrics.get(name).items())
+            }
+
+        def total(name):
+            return round(sum(h.sum for h in self.metrics.get(name).values()), 3)
+
+        def count(name, **match):
+            return sum(
+                value for key, value in self.metrics.get(name).items()
+                if all(dict(key).get(k) == v for k, v in match.items())
+            )
+
+        elapsed = time.time() - self.started_at
+        domains = {}
+        for key, value in self.metrics.get('responses_total').items():
+            labels = dict(key)
+            domain = domains.setdefault(labels['domain'], {'responses': 0, 'status': {}})
+            domain['responses'] += value
+            domain['status'][str(labels['status'])] = value
+        for domain, info in domains.items():
+            info['bytes'] = count('response_bytes_total', domain=domain)
+        for name, field in (('download_latency_seconds', 'latency'), ('throttle_wait_seconds', 'throttle_wait')):
+            for domain, histogram in by(name, 'domain').items():
+                domains[domain][field] = histogram
+
+        stats = self.crawler.stats.get_stats()
+        scraped = count('items_scraped_total')
+        return {
+            'spider': self.spider_name,
+            'crawl': self.crawl,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'finish_reason': reason,
+            'elapsed_seconds': round(elapsed, 3),
+            'items': {
+                'scraped': scraped,
+                'per_second': round(scraped / elapsed, 3) if elapsed else 0,
+                'dropped': count('items_dropped_total'),
+                **{name.replace('_total', ''): stats.get(stat, 0) for name, (stat, _) in STATS_COUNTERS.items()},
+            },
+            # Summed over concurrent requests, so these can add up to more than elapsed_seconds
+            'time': {
+                'download_seconds': total('download_latency_seconds'),
+                'throttle_wait_seconds': total('throttle_wait_seconds'),
+                'callback_seconds': total('callback_seconds'),
+                'db_write_seconds': total('db_write_seconds'),
+            },
+            'callbacks': by('callback_seconds', 'callback'),
+            'callback_errors': {dict(key)['callback']: value for key, value in self.metrics.get('callback_errors_total').items()},
+            'domains': domains,
+            'db': {
+                'rows': count('db_rows_total'),
+                'write': next(iter(self.metrics.get('db_write_seconds').values()), Histogram(DB_BUCKETS)).summary(),
+                'commit': next(iter(self.metrics.get('db_commit_seconds').values()), Histogram(DB_BUCKETS)).summary(),
+            },
+        }
+
+    def spider_closed(self, spider, reason):
+        if self.export_task and self.export_task.running:
+            self.export_task.stop()
+        self.export()
+
+        summary = self.summary(reason)
+        path = os.path.join(self.directory, f'{self.crawl}-summary.json')
+        try:
+            write_atomic(path, json.dumps(summary, ensure_ascii=False, indent=2))
+        except OSError as e:
+            logger.error(f"Failed to write {path}: {e}")
+
+        spent = summary['time']
+        logger.info(
+            f"[{spider.name}] Time spent over {summary['elapsed_seconds']:.1f}s, summed over requests: "
+            f"{spent['download_seconds']:.1f}s downloading, {spent['throttle_wait_seconds']:.1f}s queued "
+            f"for throttled slots, {spent['callback_seconds']:.1f}s in callbacks, "
+            f"{spent['db_write_seconds']:.1f}s writing to the database (details in {path})"
+        )
+
+
+def callback_name(request):
+    return getattr(request.callback, '__name__', None) or 'parse'
+
+
+class CallbackTimingMiddleware:
+    """
+    Spider middleware timing how long each callback runs per response.
+
+    Only the time spent inside the callback's generator is counted, not the
+    time the engine takes to handle what it yields. Sits closest to the spider
+    (highest SPIDER_MIDDLEWARES order) and reports to CrawlTelemetry.
+    """
+
+    def __init__(self, telemetry):
+        self.telemetry = telemetry
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        telemetry = getattr(crawler, 'telemetry', None)
+        if telemetry is None:
+            raise NotConfigured
+        return cls(telemetry)
+
+    def process_spider_output(self, response, result, spider=None):
+        elapsed = 0.0
+        iterator = iter(result)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    output = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield output
+        finally:
+            self.telemetry.observe_callback(callback_name(response.request), elapsed)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        elapsed = 0.0
+        iterator = result.__aiter__()
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    output = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield output
+        finally:
+            self.telemetry.observe_callback(callback_name(response.request), elapsed)
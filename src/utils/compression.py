@@ -0,0 +1,31 @@
+import zlib
+
+# The first byte of a stored blob says how the rest is encoded
+PLAIN = b'\x00'
+ZLIB = b'\x01'
+
+# Shorter texts barely shrink, so they are stored as plain UTF-8
+MIN_COMPRESS_BYTES = 256
+ZLIB_LEVEL = 6
+
+
+def compress_text(value):
+    """Encode a text for storage: zlib-compressed, or plain where that doesn't pay off"""
+    if value is None:
+        return None
+    data = value.encode('utf-8')
+    if len(data) >= MIN_COMPRESS_BYTES:
+        compressed = zlib.compress(data, ZLIB_LEVEL)
+        if len(compressed) < len(data):
+            return ZLIB + compressed
+    return PLAIN + data
+
+
+def decompress_text(blob):
+    """Decode a blob written by compress_text; also registered as a SQLite function"""
+    if blob is None:
+        return None
+    blob = bytes(blob)
+    if blob[:1] == ZLIB:
+        return zlib.decompress(blob[1:]).decode('utf-8')
+    return blob[1:].decode('utf-8')
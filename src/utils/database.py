@@ -1,14 +1,119 @@
-from sqlalchemy import create_engine
+from src.utils.compression import decompress_text
+from sqlalchemy import bindparam, create_engine, event, inspect, or_, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
+import logging
 import os
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///jobs.db')
 
-engine = create_engine(DATABASE_URL)
+# Applied to every new SQLite connection. WAL lets the display and Telegram
+# readers run while the storage pipeline writes, and synchronous=NORMAL is
+# durable in WAL mode except against power loss on the last commits. SQLite
+# only enforces foreign keys, and the models' ON DELETE CASCADE, when asked.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'busy_timeout': 5000,             # ms to wait for a writer instead of failing
+    'cache_size': -64000,             # negative means KiB, so 64 MB of page cache
+    'mmap_size': 256 * 1024 * 1024,   # read pages through the OS page cache
+    'temp_store': 'MEMORY',
+}
+
+# Read-only connections (the HTTP API) can't change the journal mode, and
+# query_only makes any write fail instead of waiting for the crawler's lock
+READONLY_PRAGMAS = {
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'query_only': 'ON',
+}
+
+# Connection pool for PostgreSQL. The storage pipeline, the Telegram worker
+# and the API's threads each hold a connection while they work; pre-ping and
+# recycling replace connections the server or a proxy dropped while idle.
+POSTGRES_POOL = {
+    'pool_size': int(os.getenv('DATABASE_POOL_SIZE', 10)),
+    'max_overflow': int(os.getenv('DATABASE_MAX_OVERFLOW', 10)),
+    'pool_timeout': 30,
+    'pool_pre_ping': True,
+    'pool_recycle': 1800,
+}
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None, pragmas=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in (SQLITE_PRAGMAS if pragmas is None else pragmas).items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def register_sqlite_functions(dbapi_connection, connection_record=None):
+    # The search index triggers and view read compressed descriptions (see src/utils/search.py)
+    dbapi_connection.create_function('decompress_text', 1, decompress_text, deterministic=True)
+
+def create_tuned_engine(url=DATABASE_URL, **kwargs):
+    """
+    Create an engine, applying SQLITE_PRAGMAS and registering the SQL
+    functions on connect for SQLite URLs, and pooling PostgreSQL connections
+    with POSTGRES_POOL (kwargs take precedence)
+    """
+    if make_url(url).get_backend_name() == 'postgresql':
+        kwargs = {**POSTGRES_POOL, **kwargs}
+    db_engine = create_engine(url, **kwargs)
+    if db_engine.dialect.name == 'sqlite':
+        event.listen(db_engine, 'connect', apply_sqlite_pragmas)
+        event.listen(db_engine, 'connect', register_sqlite_functions)
+    return db_engine
+
+def create_readonly_engine(url=DATABASE_URL, **kwargs):
+    """
+    Create an engine that can only read. SQLite files are opened with
+    mode=ro, so in WAL mode its readers never hold up the crawler's writes;
+    PostgreSQL sessions start read-only transactions.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == 'postgresql':
+        connect_args = {**kwargs.pop('connect_args', {}), 'options': '-c default_transaction_read_only=on'}
+        return create_tuned_engine(url, connect_args=connect_args, **kwargs)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return create_tuned_engine(url, **kwargs)
+    readonly = url.set(database=f'file:{url.database}?mode=ro').update_query_dict({'uri': 'true'})
+    db_engine = create_engine(readonly, **kwargs)
+    event.listen(db_engine, 'connect', lambda dbapi_connection, record: apply_sqlite_pragmas(
+        dbapi_connection, record, READONLY_PRAGMAS
+    ))
+    event.listen(db_engine, 'connect', register_sqlite_functions)
+    return db_engine
+
+def insert(conn, table):
+    """An INSERT for table in conn's dialect, for its ON CONFLICT clauses"""
+    return (postgresql if conn.dialect.name == 'postgresql' else sqlite).insert(table)
+
+def copy_rows(conn, table_name, columns, rows):
+    """
+    Load rows (tuples in columns order) into a PostgreSQL table with COPY,
+    within conn's transaction. dicts and lists go in as JSONB.
+    """
+    from psycopg.types.json import Jsonb
+    cursor = conn.connection.driver_connection.cursor()
+    try:
+        with cursor.copy(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row([Jsonb(value) if isinstance(value, (dict, list)) else value for value in row])
+    finally:
+        cursor.close()
+
+engine = create_tuned_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine)
 
 Base = declarative_base()
@@ -20,6 +125,138 @@ def get_db():
     finally:
         db.close()
 
+def move_descriptions(bind, batch_size=1000):
+    """
+    Move the descriptions of a database created before they were stored
+    compressed from jobs.description into job_descriptions, then drop the
+    column. Runs in one transaction, so an interrupted move starts over.
+    Returns the number of descriptions moved.
+    """
+    from src.models.job import JobDescription
+    from src.utils.search import drop_search_index
+    JobDescription.__table__.create(bind=bind, checkfirst=True)
+
+    moved = 0
+    last_id = 0
+    with bind.begin() as conn:
+        if bind.dialect.name == 'sqlite':
+            # The old index and its triggers read jobs.description, which blocks
+            # dropping it; migrate_db builds the new index afterwards
+            drop_search_index(conn)
+        while True:
+            rows = conn.execute(
+                text('SELECT id, description FROM jobs WHERE id > :last_id AND description IS NOT NULL '
+                     'ORDER BY id LIMIT :limit'),
+                {'last_id': last_id, 'limit': batch_size}
+            ).all()
+            if not rows:
+                break
+            conn.execute(JobDescription.__table__.insert(), [
+                {'job_id': job_id, 'body': description} for job_id, description in rows
+            ])
+            moved += len(rows)
+            last_id = rows[-1][0]
+        conn.execute(text('ALTER TABLE jobs DROP COLUMN description'))
+
+    if bind.dialect.name == 'sqlite':
+        # Give the space the descriptions took back to the file system
+        with bind.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text('VACUUM'))
+    logger.info(f"Moved {moved} job descriptions to job_descriptions")
+    return moved
+
+def normalize_salaries(bind=engine, batch_size=1000):
+    """
+    Recompute every job's monthly_salary_min/max from its salary fields, for
+    jobs stored before they existed or after editing the exchange rates.
+    Returns the number of jobs with a salary.
+    """
+    from src.models.job import Job
+    from src.utils.salary import normalized_salary
+    jobs = Job.__table__
+    fields = [jobs.c.min_salary, jobs.c.max_salary, jobs.c.currency, jobs.c.salary_period]
+    update = jobs.update().where(jobs.c.id == bindparam('job_id')).values(
+        monthly_salary_min=bindparam('low'), monthly_salary_max=bindparam('high'),
+        # Not a change to the job itself
+        updated_at=jobs.c.updated_at,
+    )
+    count = 0
+    last_id = 0
+    with bind.begin() as conn:
+        while True:
+            rows = conn.execute(
+                select(jobs.c.id, *fields)
+                .where(jobs.c.id > last_id, or_(jobs.c.min_salary.isnot(None), jobs.c.max_salary.isnot(None)))
+                .order_by(jobs.c.id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            values = []
+            for row in rows:
+                salary = normalized_salary(row)
+                values.append({'job_id': row['id'], 'low': salary['monthly_salary_min'],
+                               'high': salary['monthly_salary_max']})
+            conn.execute(update, values)
+            count += len(rows)
+            last_id = rows[-1]['id']
+    return count
+
+def migrate_db(bind=engine):
+    """
+    Bring an existing database up to the current models in place.
+
+    create_all() only creates missing tables, so columns and indexes added to
+    a model later never reach a jobs.db created before them. New columns must
+    be nullable. Descriptions are moved out of the jobs table (see
+    move_descriptions). On SQLite this also sets up the full-text search index
+    (see src/utils/search.py). The same migrations run on PostgreSQL.
+    Returns the names of what was added.
+    """
+    from src.models.job import BACKEND_INDEXES, Base
+    inspector = inspect(bind)
+    created = []
+    if inspector.has_table('jobs') and 'description' in {c['name'] for c in inspector.get_columns('jobs')}:
+        move_descriptions(bind)
+        created.append('job_descriptions')
+        inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                column_type = column.type.compile(dialect=bind.dialect)
+                with bind.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                created.append(f'{table.name}.{column.name}')
+
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            # Indexes for another backend only, like the GIN index on tech_stack
+            only_on = BACKEND_INDEXES.get(index.name)
+            if index.name not in existing and only_on in (None, bind.dialect.name):
+                index.create(bind=bind)
+                created.append(index.name)
+    if 'jobs.monthly_salary_min' in created:
+        normalize_salaries(bind)
+
+    if bind.dialect.name == 'sqlite':
+        from src.utils.search import ensure_search_index
+        if ensure_search_index(bind):
+            created.append('jobs_fts')
+        with bind.begin() as conn:
+            # Refresh planner statistics so the new indexes (and skip-scan over
+            # the low-cardinality leading columns) are actually used
+            conn.execute(text('ANALYZE' if created else 'PRAGMA optimize'))
+    elif created:
+        with bind.begin() as conn:
+            conn.execute(text('ANALYZE'))
+    return created
+
 def init_db():
     from src.models.job import Base
+    import src.models.notification  # noqa: F401 - registers the Telegram tables
     Base.metadata.create_all(bind=engine)
+    created = migrate_db(engine)
+    if created:
+        logger.info(f"Migrated database: added {', '.join(created)}")
@@ -0,0 +1,263 @@
+from src.models.job import Job, JobDescription, JobLshBand
+from src.utils.persian_date import normalize_digits
+from src.utils.tech_stack import PERSIAN_NORMALIZATION
+from sqlalchemy import String, bindparam, cast, func, select, tuple_
+from array import array
+from hashlib import blake2b
+import re
+import time
+import zlib
+
+# Signature layout; changing either invalidates stored signatures and bands
+NUM_HASHES = 64
+BANDS = 16
+# 16 bands of 4 rows make a pair a candidate ~50% of the time at 0.5
+# similarity and >99.9% of the time at 0.8
+ROWS_PER_BAND = NUM_HASHES // BANDS
+SHINGLE_SIZE = 3
+# Texts shorter than this (a title and company without a description) say too
+# little to tell two postings apart, so they are never signed
+MIN_WORDS = 20
+# Postings often share a company boilerplate description, so two jobs are only
+# duplicates if their titles also overlap this much (Jaccard over title words)
+TITLE_THRESHOLD = 0.5
+
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+MIX = 0x9E3779B97F4A7C15
+BIN_BITS = NUM_HASHES.bit_length() - 1
+VALUE_MASK = (1 << 32) - 1
+EMPTY = VALUE_MASK
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def normalize_job_text(title, company, description):
+    """Fold case, Arabic letter variants, digits, ZWNJ and punctuation away"""
+    text = ' '.join(part for part in (title, company, description) if part)
+    for arabic, persian in PERSIAN_NORMALIZATION:
+        text = text.replace(arabic, persian)
+    text = normalize_digits(text.replace('‌', ' ')).lower()
+    return WORD_PATTERN.findall(text)
+
+
+def shingles(words):
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set):
+    """
+    One-permutation MinHash: each shingle is hashed once, the top bits pick one
+    of NUM_HASHES bins and the bin keeps its minimum. Empty bins borrow from the
+    next filled bin so short texts still get a full signature.
+    """
+    bins = [EMPTY] * NUM_HASHES
+    for shingle in shingle_set:
+        # crc32 is an order of magnitude cheaper than a cryptographic hash; the
+        # multiplicative step spreads its bits over the whole 64-bit range
+        value = (zlib.crc32(shingle.encode()) * MIX) & HASH_MASK
+        index = value >> (HASH_BITS - BIN_BITS)
+        value = (value >> 16) & VALUE_MASK
+        if value < bins[index]:
+            bins[index] = value
+
+    if all(value == EMPTY for value in bins):
+        return bins
+    for i in range(NUM_HASHES):
+        step = 1
+        while bins[i] == EMPTY:
+            donor = bins[(i + step) % NUM_HASHES]
+            if donor != EMPTY:
+                # Offset by the distance so borrowed values don't collide by accident
+                bins[i] = (donor + step * 0x9E3779B1) & VALUE_MASK
+            step += 1
+    return bins
+
+
+def job_signature(title, company, description):
+    """MinHash signature of a job's text, or None if the text is too short"""
+    words = normalize_job_text(title, company, description)
+    if len(words) < MIN_WORDS:
+        return None
+    return minhash(shingles(words))
+
+
+def pack(signature):
+    return array('I', signature).tobytes()
+
+
+def unpack(blob):
+    signature = array('I')
+    signature.frombytes(blob)
+    return signature
+
+
+def band_buckets(signature):
+    """(band, bucket) keys of a signature for the LSH index"""
+    keys = []
+    for band in range(BANDS):
+        chunk = array('I', signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]).tobytes()
+        bucket = int.from_bytes(blake2b(chunk, digest_size=8).digest(), 'big', signed=True)
+        keys.append((band, bucket))
+    return keys
+
+
+def title_similarity(a, b):
+    a, b = set(normalize_job_text(a, None, None)), set(normalize_job_text(b, None, None))
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def is_duplicate(signature, title, other_signature, other_title, threshold):
+    """Return the estimated similarity if two jobs are near-duplicates, else None"""
+    score = similarity(signature, other_signature)
+    if score >= threshold and title_similarity(title, other_title) >= TITLE_THRESHOLD:
+        return score
+    return None
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_HASHES
+
+
+def find_duplicate(conn, signature, title, threshold, exclude_id=None):
+    """
+    Look up the stored job most similar to a signature through the LSH bands.
+    Returns (job_id, similarity) for the best candidate at or above the
+    threshold, or None.
+    """
+    keys = band_buckets(signature)
+    candidates = set(conn.execute(
+        select(JobLshBand.job_id).where(tuple_(JobLshBand.band, JobLshBand.bucket).in_(keys))
+    ).scalars())
+    candidates.discard(exclude_id)
+    if not candidates:
+        return None
+
+    best = None
+    rows = conn.execute(
+        select(Job.id, Job.title, Job.minhash).where(Job.id.in_(candidates)).order_by(Job.id)
+    )
+    for job_id, other_title, blob in rows:
+        if not blob:
+            continue
+        score = is_duplicate(signature, title, unpack(blob), other_title, threshold)
+        # Ties go to the oldest job
+        if score is not None and (best is None or score > best[1]):
+            best = (job_id, score)
+    return best
+
+
+def index_signatures(conn, signatures, replace=False):
+    """Store job signatures ({job_id: signature}) and their LSH band keys"""
+    if not signatures:
+        return
+    if replace:
+        conn.execute(JobLshBand.__table__.delete().where(JobLshBand.job_id.in_(list(signatures))))
+    conn.execute(
+        Job.__table__.update().where(Job.id == bindparam('job_id')).values(minhash=bindparam('packed')),
+        [{'job_id': job_id, 'packed': pack(signature)} for job_id, signature in signatures.items()]
+    )
+    conn.execute(JobLshBand.__table__.insert(), [
+        {'job_id': job_id, 'band': band, 'bucket': bucket}
+        for job_id, signature in signatures.items()
+        for band, bucket in band_buckets(signature)
+    ])
+
+
+def cluster_jobs(engine, threshold, batch_size=1000):
+    """
+    Group the stored jobs into near-duplicate clusters.
+
+    Jobs without a signature are signed and indexed first, then jobs sharing an
+    LSH bucket are compared and linked with union-find. Returns the clusters of
+    two or more jobs (lists of ids, largest first) and counts and timings.
+    """
+    start = time.perf_counter()
+    signed = 0
+    while True:
+        # Sign in batches so the descriptions never all sit in memory at once
+        with engine.begin() as conn:
+            unsigned = conn.execute(
+                select(Job.id, Job.title, Job.company, JobDescription.body)
+                .outerjoin(JobDescription, JobDescription.job_id == Job.id)
+                .where(Job.minhash.is_(None)).limit(batch_size)
+            ).all()
+            signatures = {}
+            too_short = []
+            for job_id, title, company, description in unsigned:
+                signature = job_signature(title, company, description)
+                if signature is None:
+                    too_short.append(job_id)
+                else:
+                    signatures[job_id] = signature
+            index_signatures(conn, signatures, replace=True)
+            if too_short:
+                # Mark as processed without giving them any LSH bands
+                conn.execute(Job.__table__.update().where(Job.id.in_(too_short)).values(minhash=b''))
+        signed += len(unsigned)
+        if len(unsigned) < batch_size:
+            break
+    sign_seconds = time.perf_counter() - start
+
+    parent = {}
+
+    def root(job_id):
+        while parent.get(job_id, job_id) != job_id:
+            job_id = parent[job_id]
+        return job_id
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        total = conn.execute(select(func.count(Job.id))).scalar()
+
+        # Candidate pairs share a bucket in at least one band
+        groups = [
+            sorted(int(job_id) for job_id in members.split(','))
+            for members in conn.execute(
+                select(func.aggregate_strings(cast(JobLshBand.job_id, String), ','))
+                .group_by(JobLshBand.band, JobLshBand.bucket)
+                .having(func.count() > 1)
+            ).scalars()
+        ]
+        candidate_ids = sorted({job_id for members in groups for job_id in members})
+        signatures, titles = {}, {}
+        for i in range(0, len(candidate_ids), batch_size):
+            chunk = candidate_ids[i:i + batch_size]
+            for job_id, title, blob in conn.execute(
+                select(Job.id, Job.title, Job.minhash).where(Job.id.in_(chunk))
+            ):
+                signatures[job_id] = unpack(blob)
+                titles[job_id] = title
+
+    compared = set()
+    for members in groups:
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if (a, b) in compared:
+                    continue
+                compared.add((a, b))
+                if is_duplicate(signatures[a], titles[a], signatures[b], titles[b], threshold) is not None:
+                    ra, rb = root(a), root(b)
+                    if ra != rb:
+                        parent[max(ra, rb)] = min(ra, rb)
+    cluster_seconds = time.perf_counter() - start
+
+    # Only jobs linked to another one are listed; everything else is a singleton
+    clusters = {}
+    for job_id in parent:
+        clusters.setdefault(root(job_id), [root(job_id)]).append(job_id)
+    clusters = sorted((sorted(ids) for ids in clusters.values()), key=len, reverse=True)
+
+    return clusters, {
+        'jobs': total,
+        'duplicates': sum(len(ids) - 1 for ids in clusters),
+        'signed': signed,
+        'sign_seconds': sign_seconds,
+        'cluster_seconds': cluster_seconds,
+        'pairs_compared': len(compared),
+    }
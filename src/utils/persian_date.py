@@ -0,0 +1,203 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+import re
+
+# Persian (U+06F0..) and Arabic-Indic (U+0660..) digits to ASCII
+DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+
+RELATIVE_UNITS = {
+    'ثانیه': timedelta(seconds=1),
+    'دقیقه': timedelta(minutes=1),
+    'ساعت': timedelta(hours=1),
+    'روز': timedelta(days=1),
+    'هفته': timedelta(weeks=1),
+    'ماه': timedelta(days=30),
+    'سال': timedelta(days=365),
+}
+
+# Number words, with common colloquial spellings; compounds join them with
+# و, largest first: بیست و دو = 22, صد و پنج = 105
+NUMBER_WORDS = {
+    'یک': 1, 'یه': 1, 'دو': 2, 'سه': 3, 'چهار': 4, 'پنج': 5, 'شش': 6, 'شیش': 6,
+    'هفت': 7, 'هشت': 8, 'نه': 9, 'ده': 10, 'یازده': 11, 'دوازده': 12, 'سیزده': 13,
+    'چهارده': 14, 'پانزده': 15, 'پونزده': 15, 'شانزده': 16, 'شونزده': 16, 'هفده': 17,
+    'هجده': 18, 'هیجده': 18, 'نوزده': 19, 'بیست': 20, 'سی': 30, 'چهل': 40, 'پنجاه': 50,
+    'شصت': 60, 'هفتاد': 70, 'هشتاد': 80, 'نود': 90, 'صد': 100, 'یکصد': 100, 'دویست': 200,
+    'سیصد': 300, 'چهارصد': 400, 'پانصد': 500, 'ششصد': 600, 'هفتصد': 700, 'هشتصد': 800,
+    'پونصد': 500, 'نهصد': 900, 'هزار': 1000,
+}
+
+# Words that stand for an amount that isn't a number: "a few days ago",
+# "half an hour ago", "a day or two ago". Dates with them are left unparsed
+# rather than guessed.
+VAGUE_AMOUNTS = {'چند', 'چندین', 'نیم', 'یکی', 'اندکی', 'دقایقی', 'ساعاتی', 'روزهایی'}
+
+# Arabic letter forms some sites use for Persian ones
+LETTERS = str.maketrans('يكۀ', 'یکه')
+
+NAMED_OFFSETS = {
+    'همین الان': timedelta(0),
+    'لحظاتی پیش': timedelta(0),
+    'امروز': timedelta(0),
+    'دیروز': timedelta(days=1),
+    'پریروز': timedelta(days=2),
+}
+
+JALALI_MONTHS = {
+    name: number for number, name in enumerate(
+        ['فروردین', 'اردیبهشت', 'خرداد', 'تیر', 'مرداد', 'شهریور',
+         'مهر', 'آبان', 'آذر', 'دی', 'بهمن', 'اسفند'], start=1
+    )
+}
+
+# A unit standing on its own (not the end of a longer word) before پیش/قبل;
+# the amount is read from the words before it by relative_amount
+RELATIVE_PATTERN = re.compile(
+    r'(?<![^\W\d])(' + '|'.join(RELATIVE_UNITS) + r')\s*(?:پیش|قبل)(?!\w)'
+)
+# Words are separated by spaces or zero-width non-joiners (بیست‌و‌دو)
+WORD_SEPARATOR = re.compile(r'[\s\u200c]+')
+NUMERIC_DATE_PATTERN = re.compile(r'(\d{4})\s*[/\-.]\s*(\d{1,2})\s*[/\-.]\s*(\d{1,2})')
+NAMED_MONTH_PATTERN = re.compile(
+    r'(\d{1,2})\s+(' + '|'.join(JALALI_MONTHS) + r')\s+(\d{4})'
+)
+
+
+def normalize_digits(text):
+    return text.translate(DIGITS)
+
+
+def jalali_to_gregorian(jy, jm, jd):
+    """Convert a Jalali (Solar Hijri) date to a Gregorian (year, month, day)"""
+    jy += 1595
+    days = -355668 + 365 * jy + (jy // 33) * 8 + ((jy % 33) + 3) // 4 + jd
+    days += (jm - 1) * 31 if jm < 7 else (jm - 7) * 30 + 186
+
+    gy = 400 * (days // 146097)
+    days %= 146097
+    if days > 36524:
+        days -= 1
+        gy += 100 * (days // 36524)
+        days %= 36524
+        if days >= 365:
+            days += 1
+    gy += 4 * (days // 1461)
+    days %= 1461
+    if days > 365:
+        gy += (days - 1) // 365
+        days = (days - 1) % 365
+
+    gd = days + 1
+    leap = (gy % 4 == 0 and gy % 100 != 0) or gy % 400 == 0
+    month_days = [31, 29 if leap else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    gm = 1
+    for length in month_days:
+        if gd <= length:
+            break
+        gd -= length
+        gm += 1
+    return gy, gm, gd
+
+
+def number_from_words(words):
+    """
+    The number written as words joined with و, e.g. ['بیست', 'و', 'دو'],
+    or None unless each part is a number word smaller than the one before
+    """
+    if len(words) % 2 == 0 or any(word != 'و' for word in words[1::2]):
+        return None
+    parts = [NUMBER_WORDS.get(word) for word in words[::2]]
+    if None in parts:
+        return None
+    for larger, smaller in zip(parts, parts[1:]):
+        # Each part has to fit in the place values the one before left free
+        if smaller >= 10 ** (len(str(larger)) - 1) or larger % 10 ** len(str(smaller)):
+            return None
+    return sum(parts)
+
+
+def relative_amount(prefix):
+    """
+    The amount written just before a relative unit: digits, number words,
+    or nothing (1, as in ماه پیش). None when an amount is there but isn't
+    understood, so the date counts as unparsed instead of being misread.
+    """
+    words = [word for word in WORD_SEPARATOR.split(prefix) if word]
+    if not words:
+        return 1
+    if words[-1].isdigit():
+        return int(words[-1])
+    if words[-1] in VAGUE_AMOUNTS or any(c.isdigit() for c in words[-1]):
+        return None
+
+    amount = []
+    while words and (words[-1] in NUMBER_WORDS or words[-1] == 'و'):
+        amount.insert(0, words.pop())
+    if not amount:
+        return 1
+    if words and words[-1] in VAGUE_AMOUNTS:
+        return None
+    return number_from_words(amount)
+
+
+def absolute_date(year, month, day):
+    if year < 1700:
+        if not (1 <= month <= 12 and 1 <= day <= (31 if month <= 6 else 30)):
+            raise ValueError(f"invalid Jalali date {year}/{month}/{day}")
+        year, month, day = jalali_to_gregorian(year, month, day)
+    return datetime(year, month, day)
+
+
+@lru_cache(maxsize=4096)
+def parse_date_text(date_str):
+    """
+    Parse a Persian date string independently of the current time.
+
+    Returns a timedelta to subtract from the reference time for relative
+    dates, a datetime for absolute (Jalali or Gregorian) dates, or None if the
+    string is not recognised.
+    """
+    text = normalize_digits(date_str).translate(LETTERS).strip('() \n\t')
+    if not text:
+        return None
+
+    match = RELATIVE_PATTERN.search(text)
+    if match:
+        count = relative_amount(text[:match.start()])
+        if count is None:
+            return None
+        return RELATIVE_UNITS[match.group(1)] * count
+
+    for phrase, offset in NAMED_OFFSETS.items():
+        if phrase in text:
+            return offset
+
+    try:
+        match = NUMERIC_DATE_PATTERN.search(text)
+        if match:
+            return absolute_date(*map(int, match.groups()))
+
+        match = NAMED_MONTH_PATTERN.search(text)
+        if match:
+            day, month, year = match.groups()
+            return absolute_date(int(year), JALALI_MONTHS[month], int(day))
+    except ValueError:
+        return None
+
+    return None
+
+
+def parse_persian_date(date_str, reference=None):
+    """
+    Convert Persian date text to a datetime, or None if it can't be parsed.
+
+    Pass the same reference time for every row of a response so relative
+    dates on one page agree with each other.
+    """
+    if not date_str:
+        return None
+
+    parsed = parse_date_text(date_str)
+    if parsed is None or isinstance(parsed, datetime):
+        return parsed
+    return (reference or datetime.now()) - parsed
@@ -0,0 +1,82 @@
+from collections import namedtuple
+from itertools import product
+import json
+
+# One search a spider runs: a keywords string and a location string
+SearchQuery = namedtuple('SearchQuery', ['keywords', 'location'])
+
+
+def expand_queries(keywords, locations):
+    """
+    Every keywords x location pair, in order. Either list may be empty, in
+    which case the spiders fill in their own default.
+    """
+    return [SearchQuery(k, l) for k, l in product(keywords or [None], locations or [None])]
+
+
+def load_queries(path):
+    """
+    Read a query file:
+
+        [
+          {"keywords": "python developer", "location": "Berlin"},
+          {"keywords": ["react", "vue"], "location": ["Remote", "Amsterdam"]}
+        ]
+
+    A list for keywords or location expands to every combination. Duplicate
+    pairs are dropped.
+    """
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{path} must contain a list of queries")
+
+    queries = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get('keywords'):
+            raise ValueError(f"Query {entry} in {path} needs keywords")
+        keywords = entry['keywords']
+        locations = entry.get('location')
+        queries.extend(expand_queries(
+            keywords if isinstance(keywords, list) else [keywords],
+            locations if isinstance(locations, list) else [locations] if locations else []
+        ))
+    if not queries:
+        raise ValueError(f"No queries in {path}")
+    return list(dict.fromkeys(queries))
+
+
+class QueryMatches:
+    """
+    The job URLs each query of a crawl matched.
+
+    add() tells the spider whether a URL turned up for the first time in this
+    crawl, so a detail page shared by several queries is only requested once.
+    Every (url, query) match is kept until the storage pipeline takes it with
+    drain(), including matches for jobs that were already stored.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.pending = set()
+
+    def add(self, url, query):
+        """Record that query matched url; returns True the first time url is seen"""
+        if query is not None:
+            self.pending.add((url, query))
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        return True
+
+    def drain(self):
+        """The matches recorded since the last call, as rows for the job_queries table"""
+        pending, self.pending = self.pending, set()
+        return [
+            {'url': url, 'keywords': query.keywords, 'location': query.location}
+            for url, query in pending
+        ]
+
+    def clear(self):
+        self.seen.clear()
+        self.pending.clear()
@@ -0,0 +1,170 @@
+from src.utils.persian_date import normalize_digits
+from src.utils.tech_stack import PERSIAN_NORMALIZATION
+from functools import lru_cache
+import json
+import os
+import re
+
+RATES_PATH = os.path.join(os.path.dirname(__file__), 'exchange_rates.json')
+
+# Toman is how Iranian job boards quote pay; it has no ISO code and is always
+# ten rials
+DERIVED_CURRENCIES = {'IRT': ('IRR', 10)}
+
+# Currency markers, checked in order; the first found wins
+CURRENCY_MARKERS = [
+    ('IRT', ['تومان', 'toman']),
+    ('IRR', ['ریال', 'rial']),
+    ('EUR', ['€']),
+    ('GBP', ['£']),
+    ('USD', ['$']),
+]
+ISO_CURRENCY = re.compile(r'\b(USD|EUR|GBP|CAD|AUD|CHF|AED|TRY|IRR|IRT)\b', re.IGNORECASE)
+# A currency written just before an amount, as in 'from $5,000' or 'up to USD 90k'
+CURRENCY_BEFORE = re.compile(r'(?:[$€£]|' + ISO_CURRENCY.pattern + r')\s*$', re.IGNORECASE)
+
+# Pay period markers, checked in order
+PERIOD_MARKERS = [
+    ('hourly', ['/hr', '/hour', 'per hour', 'an hour', 'hourly', 'ساعتی']),
+    ('daily', ['/day', 'per day', 'a day', 'daily', 'روزانه']),
+    ('weekly', ['/wk', '/week', 'per week', 'a week', 'weekly', 'هفتگی']),
+    ('monthly', ['/mo', '/month', 'per month', 'a month', 'monthly', 'ماهانه', 'ماهیانه', 'در ماه']),
+    ('yearly', ['/yr', '/year', 'per year', 'a year', 'yearly', 'annual', 'annum', 'سالانه', 'سالیانه', 'در سال']),
+]
+
+# Months' worth of each period, at 40 hours and 5 days a week
+MONTHLY_FACTORS = {
+    'hourly': 40 * 52 / 12,
+    'daily': 5 * 52 / 12,
+    'weekly': 52 / 12,
+    'monthly': 1,
+    'yearly': 1 / 12,
+}
+
+SCALES = {
+    'k': 1e3, 'thousand': 1e3, 'هزار': 1e3,
+    'm': 1e6, 'million': 1e6, 'میلیون': 1e6,
+    'میلیارد': 1e9,
+}
+AMOUNT = re.compile(
+    r'(\d+(?:[,٬]\d{3})*(?:[.٫]\d+)?)\s*(' + '|'.join(sorted(SCALES, key=len, reverse=True)) + r')?(?!\w)',
+    re.IGNORECASE
+)
+
+# Wording that marks a single amount as a lower or an upper bound
+FROM_MARKERS = ('از', 'from', 'starting at', 'at least', 'حداقل')
+UP_TO_MARKERS = ('تا', 'up to', 'حداکثر')
+
+
+@lru_cache(maxsize=None)
+def load_rates(path=RATES_PATH):
+    """
+    The local exchange rate table: (reference currency, units of each
+    currency per unit of the reference currency)
+    """
+    with open(path, encoding='utf-8') as f:
+        table = json.load(f)
+    rates = {code.upper(): float(rate) for code, rate in table['rates'].items()}
+    for code, (base, units) in DERIVED_CURRENCIES.items():
+        if base in rates:
+            rates.setdefault(code, rates[base] / units)
+    return table['reference'], rates
+
+
+def reference_currency():
+    return load_rates()[0]
+
+
+def empty_salary():
+    return {'min_salary': None, 'max_salary': None, 'currency': None, 'salary_period': None}
+
+
+def parse_salary(text, currency=None, period=None):
+    """
+    Parse a salary text such as '$150,000/yr - $190,000/yr', '۳۰ - ۴۵ میلیون',
+    'از ۲۰ میلیون تومان' or '35,000,000 - 50,000,000 تومان' into the jobs
+    table's min_salary, max_salary, currency and salary_period. currency and
+    period are assumed when the text doesn't name them. A salary without
+    figures (negotiable, 'توافقی') or in an unknown currency gives all None;
+    one with figures is read even if it is also called negotiable or
+    competitive.
+    """
+    salary = empty_salary()
+    if not text:
+        return salary
+    text = normalize_digits(text)
+    for arabic, persian in PERSIAN_NORMALIZATION:
+        text = text.replace(arabic, persian)
+    lowered = text.lower()
+    currency = detect_currency(lowered) or currency
+    if not currency:
+        return salary
+
+    amounts = []
+    for match in AMOUNT.finditer(text):
+        number = float(match.group(1).replace(',', '').replace('٬', '').replace('٫', '.'))
+        scale = SCALES.get((match.group(2) or '').lower())
+        amounts.append([number, scale, match.start()])
+    amounts = amounts[:2]
+    if not amounts:
+        return salary
+    # '۳۰ - ۴۵ میلیون' and '150-190k': a scale after the range applies to both ends
+    if amounts[-1][1]:
+        for amount in amounts[:-1]:
+            amount[1] = amount[1] or amounts[-1][1]
+    values = [number * (scale or 1) for number, scale, _ in amounts]
+
+    if len(values) == 1:
+        before = CURRENCY_BEFORE.sub('', lowered[:amounts[0][2]]).rstrip()
+        if any(before.endswith(marker) for marker in UP_TO_MARKERS):
+            salary['max_salary'] = values[0]
+        elif any(before.endswith(marker) for marker in FROM_MARKERS):
+            salary['min_salary'] = values[0]
+        else:
+            salary['min_salary'] = salary['max_salary'] = values[0]
+    else:
+        salary['min_salary'], salary['max_salary'] = min(values), max(values)
+
+    salary['currency'] = currency
+    salary['salary_period'] = next(
+        (name for name, markers in PERIOD_MARKERS if any(marker in lowered for marker in markers)), period
+    )
+    return salary
+
+
+def detect_currency(text):
+    for code, markers in CURRENCY_MARKERS:
+        if any(marker in text for marker in markers):
+            return code
+    match = ISO_CURRENCY.search(text)
+    return match.group(1).upper() if match else None
+
+
+def monthly_amount(amount, currency, period):
+    """amount per period in currency, as a monthly amount in the reference currency"""
+    _, rates = load_rates()
+    if amount is None or not currency or currency.upper() not in rates or period not in MONTHLY_FACTORS:
+        return None
+    return round(amount * MONTHLY_FACTORS[period] / rates[currency.upper()], 2)
+
+
+def to_reference(amount, currency):
+    """Convert an amount in currency to the reference currency"""
+    _, rates = load_rates()
+    if currency.upper() not in rates:
+        raise ValueError(f"No exchange rate for {currency} in {RATES_PATH}")
+    return amount / rates[currency.upper()]
+
+
+def normalized_salary(job):
+    """
+    The indexed monthly_salary_min/max columns for a job with min_salary,
+    max_salary, currency and salary_period. A range open on one side uses the
+    other end for both, so range filters only compare one column each.
+    """
+    low = monthly_amount(job.get('min_salary'), job.get('currency'), job.get('salary_period'))
+    high = monthly_amount(job.get('max_salary'), job.get('currency'), job.get('salary_period'))
+    return {
+        'monthly_salary_min': low if low is not None else high,
+        'monthly_salary_max': high if high is not None else low,
+    }
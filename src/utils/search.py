@@ -0,0 +1,142 @@
+from src.utils.tech_stack import PERSIAN_NORMALIZATION
+from sqlalchemy import column, func, literal_column, table, text
+import logging
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'jobs_fts'
+FTS_COLUMNS = ['title', 'company', 'description']
+
+# bm25 weights for FTS_COLUMNS: a hit in the title counts for more than one
+# buried in the description
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+jobs_fts = table(FTS_TABLE, column('rowid'))
+fts = literal_column(FTS_TABLE)
+
+
+def normalized_sql(expression):
+    """Wrap a SQL expression in replace() calls folding Arabic letters to Persian"""
+    for arabic, persian in PERSIAN_NORMALIZATION:
+        expression = f"replace({expression}, '{arabic}', '{persian}')"
+    return expression
+
+
+def normalize_query(query):
+    # Only the letters are folded; FTS5 operators (AND, OR, NOT) are case sensitive
+    for arabic, persian in PERSIAN_NORMALIZATION:
+        query = query.replace(arabic, persian)
+    return query
+
+
+def _values(title, company, description):
+    return ', '.join(normalized_sql(expression) for expression in (title, company, description))
+
+
+def _index(rowid, title, company, description, source=''):
+    """Statement adding one job's text to the index; source adds a FROM ... WHERE clause"""
+    return (
+        f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+        f"SELECT {rowid}, {_values(title, company, description)}{source};"
+    )
+
+
+def _unindex(rowid, title, company, description, source=''):
+    """Statement removing one job's text from the index; the values must be the indexed ones"""
+    return (
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {', '.join(FTS_COLUMNS)}) "
+        f"SELECT 'delete', {rowid}, {_values(title, company, description)}{source};"
+    )
+
+
+def _description(job_id):
+    return f"(SELECT decompress_text(body) FROM job_descriptions WHERE job_id = {job_id})"
+
+
+# The index reads a job's title and company from jobs and its description,
+# decompressed, from job_descriptions; this view joins them for snippet() and
+# for rebuilding. decompress_text is registered on every connection by
+# src/utils/database.py.
+SEARCH_VIEW = 'jobs_search'
+_JOB = ' FROM jobs WHERE id = {}'
+
+# External-content FTS5 index over SEARCH_VIEW, so the text is not stored
+# twice. unicode61 splits on ZWNJ, which turns Persian compounds into phrases
+# on both the indexing and the query side. Each trigger removes the job's
+# previous text from the index and adds the current one.
+SEARCH_DDL = [
+    f"CREATE VIEW {SEARCH_VIEW} AS SELECT jobs.id AS id, jobs.title AS title, jobs.company AS company, "
+    f"decompress_text(job_descriptions.body) AS description "
+    f"FROM jobs LEFT JOIN job_descriptions ON job_descriptions.job_id = jobs.id",
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"{', '.join(FTS_COLUMNS)}, content='{SEARCH_VIEW}', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER jobs_fts_insert AFTER INSERT ON jobs BEGIN "
+    f"{_index('new.id', 'new.title', 'new.company', _description('new.id'))} END",
+    # Descriptions go with their job (foreign keys are not enforced on SQLite)
+    f"CREATE TRIGGER jobs_fts_delete AFTER DELETE ON jobs BEGIN "
+    f"{_unindex('old.id', 'old.title', 'old.company', _description('old.id'))} "
+    f"DELETE FROM job_descriptions WHERE job_id = old.id; END",
+    f"CREATE TRIGGER jobs_fts_update AFTER UPDATE OF title, company ON jobs BEGIN "
+    f"{_unindex('old.id', 'old.title', 'old.company', _description('old.id'))} "
+    f"{_index('new.id', 'new.title', 'new.company', _description('new.id'))} END",
+    f"CREATE TRIGGER job_descriptions_fts_insert AFTER INSERT ON job_descriptions BEGIN "
+    f"{_unindex('id', 'title', 'company', 'NULL', _JOB.format('new.job_id'))} "
+    f"{_index('id', 'title', 'company', 'decompress_text(new.body)', _JOB.format('new.job_id'))} END",
+    f"CREATE TRIGGER job_descriptions_fts_delete AFTER DELETE ON job_descriptions BEGIN "
+    f"{_unindex('id', 'title', 'company', 'decompress_text(old.body)', _JOB.format('old.job_id'))} "
+    f"{_index('id', 'title', 'company', 'NULL', _JOB.format('old.job_id'))} END",
+    f"CREATE TRIGGER job_descriptions_fts_update AFTER UPDATE OF body ON job_descriptions BEGIN "
+    f"{_unindex('id', 'title', 'company', 'decompress_text(old.body)', _JOB.format('old.job_id'))} "
+    f"{_index('id', 'title', 'company', 'decompress_text(new.body)', _JOB.format('new.job_id'))} END",
+]
+SEARCH_TRIGGERS = [
+    'jobs_fts_insert', 'jobs_fts_delete', 'jobs_fts_update',
+    'job_descriptions_fts_insert', 'job_descriptions_fts_delete', 'job_descriptions_fts_update',
+]
+
+
+def drop_search_index(conn):
+    conn.execute(text(f'DROP TABLE IF EXISTS {FTS_TABLE}'))
+    conn.execute(text(f'DROP VIEW IF EXISTS {SEARCH_VIEW}'))
+    for trigger in SEARCH_TRIGGERS:
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+
+
+def ensure_search_index(bind):
+    """
+    Create the FTS5 index, its content view and sync triggers if missing,
+    indexing existing jobs. Returns True if the index was (re)built.
+    """
+    with bind.begin() as conn:
+        names = set(conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view', 'trigger')"
+        )).scalars())
+        if names.issuperset([FTS_TABLE, SEARCH_VIEW, *SEARCH_TRIGGERS]):
+            return False
+
+        # Dropping the jobs table (--reset-db) takes the triggers with it, which
+        # leaves a stale index behind, and indexes built before descriptions
+        # moved to job_descriptions read them from jobs; start over in both cases
+        drop_search_index(conn)
+        for statement in SEARCH_DDL:
+            conn.execute(text(statement))
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+            f"SELECT id, {_values('title', 'company', 'description')} FROM {SEARCH_VIEW}"
+        ))
+    logger.info('Built the full-text search index')
+    return True
+
+
+def search_rank():
+    return func.bm25(fts, *BM25_WEIGHTS)
+
+
+def search_snippet(start='[', end=']', tokens=16):
+    # Column -1 lets FTS5 pick whichever column matched best
+    return func.snippet(fts, -1, start, end, '...', tokens)
+
+
+def search_match(query):
+    return fts.op('MATCH')(normalize_query(query))
@@ -0,0 +1,92 @@
+from sqlalchemy import select, func
+from src.models.job import Job, JobDuplicate
+from src.utils.database import engine
+from datetime import datetime, timedelta
+import hashlib
+import math
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for a target false positive rate"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)), 8192)
+        self.hash_count = max(int(round(-math.log2(error_rate))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class SeenUrlIndex:
+    """
+    Job URLs already stored for one source.
+
+    The Bloom filter answers "definitely new" without touching the database;
+    a positive is confirmed with an exact lookup on the unique url index.
+    With refresh_days set, jobs not updated within that window count as unseen
+    so their detail pages get fetched again.
+    """
+
+    def __init__(self, source, refresh_days=0, error_rate=0.001):
+        self.source = source
+        self.refresh_days = refresh_days
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(1)
+        self.loaded = 0
+        self.false_positives = 0
+
+    def _cutoff(self):
+        if self.refresh_days > 0:
+            return datetime.now() - timedelta(days=self.refresh_days)
+        return None
+
+    def _filter(self, query, model=Job):
+        query = query.where(model.source == self.source)
+        cutoff = self._cutoff()
+        if cutoff is not None:
+            query = query.where(model.updated_at >= cutoff)
+        return query
+
+    def load(self):
+        """
+        Build the filter from the jobs table and the URLs linked to a stored job
+        as duplicates; returns the number of URLs loaded
+        """
+        with engine.connect() as conn:
+            count = sum(
+                conn.execute(self._filter(select(func.count(model.id)), model)).scalar()
+                for model in (Job, JobDuplicate)
+            )
+            self.bloom = BloomFilter(count, self.error_rate)
+            for model in (Job, JobDuplicate):
+                for url in conn.execute(self._filter(select(model.url), model)).scalars():
+                    if url:
+                        self.bloom.add(url)
+        self.loaded = count
+        return count
+
+    def __contains__(self, url):
+        if not url or url not in self.bloom:
+            return False
+
+        with engine.connect() as conn:
+            found = any(
+                conn.execute(self._filter(select(model.id).where(model.url == url), model)).first()
+                for model in (Job, JobDuplicate)
+            )
+        if not found:
+            self.false_positives += 1
+            return False
+        return True
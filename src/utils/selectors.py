@@ -0,0 +1,82 @@
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+
+_translator = HTMLTranslator()
+
+
+def node_of(target):
+    """The lxml element behind a response, a parsel Selector or an element"""
+    selector = getattr(target, 'selector', None)
+    if selector is not None:
+        target = selector
+    return getattr(target, 'root', target)
+
+
+def clean(text):
+    """Strip and collapse the whitespace HTML templates leave inside text nodes"""
+    return ' '.join(text.split())
+
+
+class Query:
+    """
+    A CSS (with ::text and ::attr()) or XPath expression compiled once.
+
+    Spiders declare queries as class attributes, so the CSS is translated and
+    the XPath compiled when the module is imported instead of on every call,
+    and results come back as plain strings and lxml elements rather than
+    Selector objects. Queries can be run on a response or, for extraction
+    scoped to one part of the page, on an element another query returned.
+    """
+
+    def __init__(self, css=None, xpath=None):
+        self.expression = xpath if xpath is not None else _translator.css_to_xpath(css)
+        self.compiled = etree.XPath(self.expression, smart_strings=False)
+
+    def all(self, target):
+        return self.compiled(node_of(target))
+
+    def first(self, target, default=None):
+        results = self.all(target)
+        return results[0] if results else default
+
+    def text(self, target, default=''):
+        """The first non-blank text result, cleaned"""
+        for value in self.all(target):
+            value = clean(value)
+            if value:
+                return value
+        return default
+
+    def texts(self, target):
+        return [value for value in map(clean, self.all(target)) if value]
+
+    def joined(self, target, separator=' '):
+        return separator.join(self.texts(target))
+
+
+class LabeledFields:
+    """
+    Extract several fields from a list of label/value items in one pass.
+
+    Pages often list metadata as items like <li><h4>Salary</h4><span>...</span></li>.
+    Instead of one document-wide :contains() query per field, the items are
+    selected once and each item's label is matched against the field labels
+    (substrings; the first item matching a field wins). Missing fields are ''.
+    """
+
+    def __init__(self, items, label, value, fields, separator=' '):
+        self.items = items
+        self.label = label
+        self.value = value
+        self.fields = fields
+        self.separator = separator
+
+    def extract(self, target):
+        found = {}
+        for item in self.items.all(target):
+            label = self.label.joined(item)
+            for field, needle in self.fields.items():
+                if field not in found and needle in label:
+                    found[field] = self.value.joined(item, self.separator)
+                    break
+        return {field: found.get(field, '') for field in self.fields}
@@ -0,0 +1,93 @@
+from typing import Dict, List
+import json
+import os
+import re
+
+TAXONOMY_PATH = os.path.join(os.path.dirname(__file__), 'tech_taxonomy.json')
+
+# Arabic code points that commonly stand in for their Persian equivalents
+PERSIAN_NORMALIZATION = (('ي', 'ی'), ('ك', 'ک'), ('ى', 'ی'))
+
+
+def load_taxonomy(path=TAXONOMY_PATH):
+    """Load the category -> technology -> aliases taxonomy"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def normalize_text(text):
+    # str.replace is an order of magnitude faster than str.translate here
+    for arabic, persian in PERSIAN_NORMALIZATION:
+        text = text.replace(arabic, persian)
+    # A zero-width non-joiner (ZWNJ) separates the parts of a word like a
+    # space, as in 'ری‌اکت', so both spellings match the same alias
+    return text.replace('\u200c', ' ').lower()
+
+
+def trie_pattern(words):
+    """
+    Build a regex alternation factored on common prefixes, so the engine walks
+    one branch per character instead of retrying every alias at each position
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            return f'(?:{body})?'
+        return body
+
+    return build(trie)
+
+
+class TechStackMatcher:
+    """
+    Detects technologies in free text with a single compiled regex.
+
+    All aliases from the taxonomy go into one prefix-factored alternation whose
+    optional suffixes are greedy, so 'react.js' wins over 'react' and
+    'جاوااسکریپت' over 'جاوا'. Matches must not touch another word character,
+    which keeps 'js' out of 'json' and 'java' out of 'javascript'.
+    """
+
+    def __init__(self, taxonomy: Dict[str, Dict[str, List[str]]]):
+        self.categories = list(taxonomy)
+        self.aliases = {}
+        self.order = {}
+        for category, technologies in taxonomy.items():
+            for tech, aliases in technologies.items():
+                self.order[(category, tech)] = len(self.order)
+                for alias in aliases:
+                    self.aliases[normalize_text(alias)] = (category, tech)
+
+        # The first-character lookahead lets most positions fail before the trie is entered
+        first_chars = ''.join(sorted({re.escape(alias[0]) for alias in self.aliases}))
+        self.pattern = re.compile(
+            rf'(?<![\w+#.])(?=[{first_chars}])(?:{trie_pattern(self.aliases)})(?![\w+#])'
+        )
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        found = {category: [] for category in self.categories}
+        if not text:
+            return found
+
+        hits = {self.aliases[m.group(0)] for m in self.pattern.finditer(normalize_text(text))}
+        for category, tech in sorted(hits, key=self.order.__getitem__):
+            found[category].append(tech)
+        return found
+
+
+matcher = TechStackMatcher(load_taxonomy())
+
+
+def detect_tech_stack(text: str) -> Dict[str, List[str]]:
+    """Return the technologies mentioned in text, grouped by category"""
+    return matcher.match(text)
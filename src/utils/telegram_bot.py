@@ -1,7 +1,14 @@
 from telegram import Update
+from telegram.error import RetryAfter, Forbidden, BadRequest
 from telegram.ext import Application, CommandHandler, ContextTypes
+from sqlalchemy import select, update, delete, func
+from src.models.notification import TelegramSubscriber, TelegramOutbox
+from src.utils.database import SessionLocal
+from datetime import datetime, timedelta
 import asyncio
+import html
 import os
+import time
 from dotenv import load_dotenv
 import logging
 
@@ -15,21 +22,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
 class JobTelegramBot:
     def __init__(self):
         self.token = os.getenv('TELEGRAM_BOT_TOKEN')
         if not self.token:
             raise ValueError("TELEGRAM_BOT_TOKEN environment variable is not set")
         self.chat_ids = set()
-        self.application = Application.builder().token(self.token).build()
-        
+
+        builder = Application.builder().token(self.token)
+        # Point the bot at a local fake Bot API, e.g. for tests
+        base_url = os.getenv('TELEGRAM_API_BASE_URL')
+        if base_url:
+            builder = builder.base_url(base_url)
+        self.application = builder.build()
+
         # Add command handlers
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Send a message when the command /start is issued."""
-        self.chat_ids.add(update.effective_chat.id)
+        chat_id = update.effective_chat.id
+        self.chat_ids.add(chat_id)
+        await asyncio.to_thread(add_subscriber, chat_id)
         await update.message.reply_text(
             'Welcome to Job Scraper Bot! 🤖\n'
             'You will receive notifications about new job postings.\n'
@@ -44,67 +62,359 @@ class JobTelegramBot:
             '/help - Show this help message'
         )
 
-    async def send_job_notification(self, job_data: dict) -> None:
-        """Send a job notification to all registered users."""
-        if not self.chat_ids:
-            logger.warning("No chat IDs registered to send notifications to")
-            return
-
-        message = self._format_job_message(job_data)
-        
-        for chat_id in self.chat_ids:
-            try:
-                await self.application.bot.send_message(
-                    chat_id=chat_id,
-                    text=message,
-                    parse_mode='HTML'
-                )
-            except Exception as e:
-                logger.error(f"Failed to send message to chat {chat_id}: {e}")
-
-    def _format_job_message(self, job_data: dict) -> str:
-        """Format job data into a readable message."""
-        message = (
-            f"🔍 <b>New Job Found!</b>\n\n"
-            f"📋 <b>Title:</b> {job_data['title']}\n"
-            f"🏢 <b>Company:</b> {job_data['company']}\n"
-            f"📍 <b>Location:</b> {job_data['location']}\n"
-        )
-
-        if job_data.get('metadata'):
-            metadata = job_data['metadata']
-            if isinstance(metadata, str):
-                import json
-                try:
-                    metadata = json.loads(metadata)
-                except json.JSONDecodeError:
-                    metadata = {}
-
-            if metadata.get('employment_type'):
-                message += f"💼 <b>Employment Type:</b> {metadata['employment_type']}\n"
-            if metadata.get('experience'):
-                message += f"⭐ <b>Experience:</b> {metadata['experience']}\n"
-            if metadata.get('salary'):
-                message += f"💰 <b>Salary:</b> {metadata['salary']}\n"
-            if metadata.get('tech_stack'):
-                tech_stack = metadata['tech_stack']
-                if isinstance(tech_stack, dict):
-                    for category, techs in tech_stack.items():
-                        if techs:
-                            message += f"🔧 <b>{category.title()}:</b> {', '.join(techs)}\n"
-                elif isinstance(tech_stack, list):
-                    message += f"🔧 <b>Tech Stack:</b> {', '.join(tech_stack)}\n"
-
-        message += f"\n🔗 <b>Apply here:</b> {job_data['url']}"
-        return message
-
     async def start_bot(self):
         """Start the Telegram bot."""
         await self.application.initialize()
         await self.application.start()
+        # Poll for /start and /help so new chats can subscribe while we run
+        await self.application.updater.start_polling()
+        self.chat_ids.update(await asyncio.to_thread(load_subscribers))
         logger.info("Telegram bot started successfully")
 
     async def stop_bot(self):
         """Stop the Telegram bot."""
+        if self.application.updater.running:
+            await self.application.updater.stop()
         await self.application.stop()
+        await self.application.shutdown()
         logger.info("Telegram bot stopped")
+
+
+def add_subscriber(chat_id):
+    db = SessionLocal()
+    try:
+        if db.get(TelegramSubscriber, chat_id) is None:
+            db.add(TelegramSubscriber(chat_id=chat_id))
+            db.commit()
+    finally:
+        db.close()
+
+
+def remove_subscriber(chat_id):
+    db = SessionLocal()
+    try:
+        db.execute(delete(TelegramSubscriber).where(TelegramSubscriber.chat_id == chat_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def load_subscribers():
+    db = SessionLocal()
+    try:
+        return set(db.execute(select(TelegramSubscriber.chat_id)).scalars())
+    finally:
+        db.close()
+
+
+def format_job_message(job_data: dict) -> str:
+    """Format job data into a readable message."""
+    def escape(value):
+        return html.escape(str(value)) if value else 'Not specified'
+
+    message = (
+        f"🔍 <b>New Job Found!</b>\n\n"
+        f"📋 <b>Title:</b> {escape(job_data.get('title'))}\n"
+        f"🏢 <b>Company:</b> {escape(job_data.get('company'))}\n"
+        f"📍 <b>Location:</b> {escape(job_data.get('location'))}\n"
+    )
+
+    if job_data.get('work_type') and job_data['work_type'] != 'unknown':
+        message += f"💼 <b>Work Type:</b> {escape(job_data['work_type'].replace('_', ' ').title())}\n"
+
+    if job_data.get('min_salary') or job_data.get('max_salary'):
+        amounts = [f"{job_data[key]:,.0f}" for key in ('min_salary', 'max_salary') if job_data.get(key)]
+        salary = f"{job_data.get('currency') or ''} {' - '.join(amounts)}".strip()
+        if job_data.get('salary_period'):
+            salary += f" per {job_data['salary_period']}"
+        message += f"💰 <b>Salary:</b> {escape(salary)}\n"
+
+    tech_stack = job_data.get('tech_stack')
+    if isinstance(tech_stack, dict):
+        for category, techs in tech_stack.items():
+            if techs:
+                message += f"🔧 <b>{escape(category.title())}:</b> {escape(', '.join(techs))}\n"
+
+    message += f"\n🔗 <b>Apply here:</b> {escape(job_data.get('url'))}"
+    return message
+
+
+def format_digest_message(jobs: list) -> str:
+    """Coalesce several jobs into one short message."""
+    lines = [f"🔍 <b>{len(jobs)} New Jobs Found!</b>\n"]
+    for job_data in jobs:
+        title = html.escape(str(job_data.get('title') or ''))
+        company = html.escape(str(job_data.get('company') or ''))
+        url = html.escape(str(job_data.get('url') or ''), quote=True)
+        lines.append(f"• <a href=\"{url}\">{title}</a> — {company}")
+    return '\n'.join(lines)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def wait_time(self):
+        """Seconds until a token is available (0 if one is available now)"""
+        now = self._refill()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def block(self, seconds):
+        """Stop handing out tokens for a while, e.g. after a 429 RetryAfter"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class TelegramDeliveryWorker:
+    """
+    Delivers queued job notifications from the telegram_outbox table.
+
+    A single worker applies a global and a per-chat token bucket (Telegram
+    allows ~30 messages/sec overall and ~1/sec per chat), honours RetryAfter
+    (without counting it against max_attempts, so a flood wait never drops a
+    message), and retries other failures with exponential backoff. With digest_size > 1,
+    up to that many pending jobs for a chat are sent as one message.
+    """
+
+    def __init__(self, bot, digest_size=1, global_rate=25.0, chat_rate=1.0,
+                 max_attempts=5, base_backoff=5.0, batch_size=200, poll_interval=2.0):
+        self.bot = bot
+        self.digest_size = max(1, digest_size)
+        self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate))
+        self.chat_rate = chat_rate
+        self.chat_buckets = {}
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stopping = False
+        self.counts = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    def chat_bucket(self, chat_id):
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, 1.0)
+        return self.chat_buckets[chat_id]
+
+    # Database access runs in a thread so the event loop (shared with the
+    # crawler's reactor) never blocks on SQLite
+
+    def _expand_broadcasts(self):
+        """
+        Turn each broadcast row into one pending row per subscriber. With no
+        subscribers yet, broadcasts stay pending for the first one.
+        """
+        db = SessionLocal()
+        try:
+            broadcasts = db.execute(
+                select(TelegramOutbox)
+                .where(TelegramOutbox.status == 'pending', TelegramOutbox.chat_id.is_(None))
+                .order_by(TelegramOutbox.id)
+                .limit(self.batch_size)
+            ).scalars().all()
+            if not broadcasts:
+                return 0
+
+            chat_ids = db.execute(select(TelegramSubscriber.chat_id)).scalars().all()
+            if not chat_ids:
+                return 0
+            for row in broadcasts:
+                for chat_id in chat_ids:
+                    db.add(TelegramOutbox(
+                        chat_id=chat_id, job_url=row.job_url, payload=row.payload,
+                        status='pending', attempts=0, next_attempt_at=datetime.now()
+                    ))
+                row.status = 'expanded'
+            db.commit()
+            return len(broadcasts)
+        finally:
+            db.close()
+
+    def _due_messages(self):
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(TelegramOutbox.id, TelegramOutbox.chat_id, TelegramOutbox.payload,
+                       TelegramOutbox.attempts)
+                .where(
+                    TelegramOutbox.status == 'pending',
+                    TelegramOutbox.chat_id.is_not(None),
+                    TelegramOutbox.next_attempt_at <= datetime.now(),
+                )
+                .order_by(TelegramOutbox.id)
+                .limit(self.batch_size)
+            ).all()
+        finally:
+            db.close()
+
+        by_chat = {}
+        for row in rows:
+            by_chat.setdefault(row.chat_id, []).append(row)
+        return by_chat
+
+    def _mark_sent(self, ids):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(TelegramOutbox).where(TelegramOutbox.id.in_(ids))
+                .values(status='sent', sent_at=datetime.now(), last_error=None)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _mark_failed_attempt(self, rows, error, delay=None, permanent=False):
+        db = SessionLocal()
+        try:
+            for row in rows:
+                attempts = row.attempts + 1
+                failed = permanent or attempts >= self.max_attempts
+                wait = delay if delay is not None else self.base_backoff * 2 ** row.attempts
+                db.execute(
+                    update(TelegramOutbox).where(TelegramOutbox.id == row.id).values(
+                        attempts=attempts,
+                        status='failed' if failed else 'pending',
+                        next_attempt_at=datetime.now() + timedelta(seconds=wait),
+                        last_error=str(error)[:1000],
+                    )
+                )
+                self.counts['failed' if failed else 'retried'] += 1
+            db.commit()
+        finally:
+            db.close()
+
+    def _postpone(self, rows, error, delay):
+        """Try again after a flood wait, which isn't the message's fault and doesn't count as an attempt"""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(TelegramOutbox).where(TelegramOutbox.id.in_([row.id for row in rows])).values(
+                    next_attempt_at=datetime.now() + timedelta(seconds=delay),
+                    last_error=str(error)[:1000],
+                )
+            )
+            db.commit()
+            self.counts['retried'] += len(rows)
+        finally:
+            db.close()
+
+    def _pending_count(self):
+        """Rows left to deliver; broadcasts only count once someone has subscribed"""
+        db = SessionLocal()
+        try:
+            query = select(func.count(TelegramOutbox.id)).where(TelegramOutbox.status == 'pending')
+            if db.execute(select(TelegramSubscriber.chat_id).limit(1)).first() is None:
+                query = query.where(TelegramOutbox.chat_id.is_not(None))
+            return db.execute(query).scalar()
+        finally:
+            db.close()
+
+    async def send(self, chat_id, rows):
+        if len(rows) == 1:
+            text = format_job_message(rows[0].payload or {})
+        else:
+            text = format_digest_message([row.payload or {} for row in rows])
+
+        try:
+            await self.bot.send_message(
+                chat_id=chat_id, text=text[:MAX_MESSAGE_LENGTH], parse_mode='HTML',
+                disable_web_page_preview=len(rows) > 1
+            )
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            seconds = retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+            logger.warning(f"Telegram flood limit hit, pausing for {seconds:.0f}s")
+            # A 429 throttles the whole bot, not just this chat
+            self.global_bucket.block(seconds)
+            await asyncio.to_thread(self._postpone, rows, e, seconds)
+        except Forbidden as e:
+            logger.info(f"Chat {chat_id} blocked the bot; unsubscribing")
+            await asyncio.to_thread(remove_subscriber, chat_id)
+            await asyncio.to_thread(self._mark_failed_attempt, rows, e, permanent=True)
+        except BadRequest as e:
+            logger.error(f"Telegram rejected message for chat {chat_id}: {e}")
+            await asyncio.to_thread(self._mark_failed_attempt, rows, e, permanent=True)
+        except Exception as e:
+            logger.error(f"Failed to send message to chat {chat_id}: {e}")
+            await asyncio.to_thread(self._mark_failed_attempt, rows, e)
+        else:
+            await asyncio.to_thread(self._mark_sent, [row.id for row in rows])
+            self.counts['sent'] += len(rows)
+
+    async def deliver_once(self):
+        """
+        Send whatever is due and allowed by the rate limits.
+        Returns how long to wait before the next round.
+        """
+        await asyncio.to_thread(self._expand_broadcasts)
+        by_chat = await asyncio.to_thread(self._due_messages)
+        if not by_chat:
+            return self.poll_interval
+
+        sends = []
+        wait = self.poll_interval
+        for chat_id, rows in by_chat.items():
+            bucket = self.chat_bucket(chat_id)
+            delay = max(bucket.wait_time(), self.global_bucket.wait_time())
+            if delay > 0:
+                wait = min(wait, delay)
+                continue
+            bucket.take()
+            self.global_bucket.take()
+            sends.append(self.send(chat_id, rows[:self.digest_size]))
+
+        if sends:
+            await asyncio.gather(*sends)
+            return 0
+        return wait
+
+    async def run(self):
+        """Deliver until stop() is called"""
+        logger.info("Telegram delivery worker started")
+        while not self.stopping:
+            try:
+                wait = await self.deliver_once()
+            except Exception as e:
+                logger.error(f"Telegram delivery round failed: {e}")
+                wait = self.poll_interval
+            if wait:
+                await asyncio.sleep(wait)
+
+    async def drain(self, timeout=60.0):
+        """Deliver until the outbox is empty or the timeout expires"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            wait = await self.deliver_once()
+            if wait and not await asyncio.to_thread(self._pending_count):
+                break
+            if wait:
+                await asyncio.sleep(min(wait, max(0.0, deadline - time.monotonic())))
+
+        remaining = await asyncio.to_thread(self._pending_count)
+        logger.info(
+            f"Telegram delivery: {self.counts['sent']} sent, {self.counts['retried']} retried, "
+            f"{self.counts['failed']} failed, {remaining} still queued"
+        )
+        return remaining
+
+    def stop(self):
+        self.stopping = True